@@ -1,8 +1,9 @@
 """Primary script to run to convert an entire session for of data using the NWBConverter."""
 
 from pathlib import Path
-from typing import Union
+from typing import Literal, Union
 from neuroconv.utils import load_dict_from_file, dict_deep_update
+from higley_lab_to_nwb.tools import atomic_nwbfile_path
 from higley_lab_to_nwb.benisty_2024 import Benisty2024NWBConverter
 from higley_lab_to_nwb.interfaces.spike2signals_interface import get_streams
 import os
@@ -30,7 +31,12 @@ def _get_sampling_frequency_and_image_size(folder_path: Union[str, Path]):
 
 
 def session_to_nwb(
-    folder_path: Union[str, Path], output_dir_path: Union[str, Path], session_id: str, stub_test: bool = False
+    folder_path: Union[str, Path],
+    output_dir_path: Union[str, Path],
+    session_id: str,
+    stub_test: bool = False,
+    profile: bool = False,
+    backend: Literal["hdf5", "zarr"] = "hdf5",
 ):
 
     output_dir_path = Path(output_dir_path)
@@ -38,7 +44,8 @@ def session_to_nwb(
         output_dir_path = output_dir_path / "nwb_stub"
     output_dir_path.mkdir(parents=True, exist_ok=True)
 
-    nwbfile_path = output_dir_path / f"{session_id}.nwb"
+    nwbfile_suffix = ".nwb.zarr" if backend == "zarr" else ".nwb"
+    nwbfile_path = output_dir_path / f"{session_id}{nwbfile_suffix}"
 
     source_data = dict()
     conversion_options = dict()
@@ -118,6 +125,7 @@ def session_to_nwb(
         dict(
             CIDANSegmentation=dict(
                 include_roi_acceptance=False,
+                mask_type="pixel",
                 plane_segmentation_name=plane_segmentation_name,
                 stub_test=stub_test,
             )
@@ -149,7 +157,9 @@ def session_to_nwb(
     ophys_metadata_path = Path(__file__).parent / "metadata" / "benisty_2024_ophys_2p_only_metadata.yaml"
     ophys_metadata = load_dict_from_file(ophys_metadata_path)
 
-    converter = Benisty2024NWBConverter(source_data=source_data, ophys_metadata=ophys_metadata)
+    converter = Benisty2024NWBConverter(
+        source_data=source_data, ophys_metadata=ophys_metadata, profile=profile, backend=backend
+    )
 
     # Add datetime to conversion
     metadata = converter.get_metadata()
@@ -163,9 +173,21 @@ def session_to_nwb(
     metadata = dict_deep_update(metadata, editable_metadata)
 
     # Run conversion
-    converter.run_conversion(
-        metadata=metadata, nwbfile_path=nwbfile_path, conversion_options=conversion_options, overwrite=True
-    )
+    # Write to a temporary file first, so that an interrupted conversion never leaves a partial NWB file behind
+    with atomic_nwbfile_path(nwbfile_path) as temporary_nwbfile_path:
+        converter.run_conversion(
+            metadata=metadata,
+            nwbfile_path=temporary_nwbfile_path,
+            conversion_options=conversion_options,
+            overwrite=True,
+        )
+
+    if profile:
+        profile_report_path = output_dir_path / f"{session_id}_profile.json"
+        converter.profiler.save_report(file_path=profile_report_path)
+        converter.profiler.print_report()
+
+    return nwbfile_path
 
 
 if __name__ == "__main__":
@@ -1,24 +1,46 @@
-"""Primary script to run to convert an entire session for of data using the NWBConverter."""
+"""Primary script to run to convert all the sessions of the dataset in parallel using the NWBConverter."""
 
 from pathlib import Path
 import os
-from .benisty_2024_convert_2p_only_session import session_to_nwb
+from higley_lab_to_nwb.benisty_2024.benisty_2024_convert_2p_only_session import session_to_nwb
+from higley_lab_to_nwb.tools import run_sessions_in_parallel
 
 
+if __name__ == "__main__":
+    # Parameters for conversion
+    root_path = Path("/media/amtra/Samsung_T5/CN_data")
+    data_dir_path = root_path / "Higley-CN-data-share"
+    output_dir_path = root_path / "Higley-conversion_nwb/"
+    stub_test = True
+    # "zarr" writes each NWB file as a Zarr folder, e.g. for the archival on an object store
+    backend = "hdf5"
+    # Parameters for the parallel conversion
+    max_workers = 4
+    memory_budget_gb = 64.0
+    session_memory_gb = 8.0
 
-# Parameters for conversion
-root_path = Path("/media/amtra/Samsung_T5/CN_data")
-data_dir_path = root_path / "Higley-CN-data-share"
-output_dir_path = root_path / "Higley-conversion_nwb/"
+    session_ids = os.listdir(data_dir_path)
+    session_to_kwargs = dict()
+    for session_id in session_ids:
+        session_folder = data_dir_path / Path(session_id)
+        if os.path.isdir(session_folder):
+            session_to_kwargs[session_id] = dict(
+                folder_path=session_folder,
+                output_dir_path=output_dir_path,
+                session_id=session_id,
+                stub_test=stub_test,
+                backend=backend,
+            )
 
-session_ids = os.listdir(data_dir_path)
-stub_test = True
-for session_id in session_ids:
-    session_folder = data_dir_path / Path(session_id)
-    if os.path.isdir(session_folder):
-        session_to_nwb(
-            folder_path=session_folder,
-            output_dir_path=output_dir_path,
-            session_id=session_id,
-            stub_test=stub_test,
-        )
+    run_sessions_in_parallel(
+        convert_session=session_to_nwb,
+        session_to_kwargs=session_to_kwargs,
+        max_workers=max_workers,
+        memory_budget_gb=memory_budget_gb,
+        default_session_memory_gb=session_memory_gb,
+        log_folder_path=output_dir_path / "logs",
+        manifest_file_path=output_dir_path / "conversion_manifest.json",
+        session_to_source_paths={
+            session_id: [session_kwargs["folder_path"]] for session_id, session_kwargs in session_to_kwargs.items()
+        },
+    )
@@ -1,8 +1,17 @@
 """Primary script to run to convert an entire session for of data using the NWBConverter."""
 
+from functools import partial
 from pathlib import Path
-from typing import Union
+from typing import Literal, Optional, Union
 from neuroconv.utils import load_dict_from_file, dict_deep_update
+from higley_lab_to_nwb.tools import (
+    atomic_nwbfile_path,
+    estimate_conversion,
+    load_throughputs,
+    print_estimate,
+    print_verification,
+    run_concurrently,
+)
 from higley_lab_to_nwb.interfaces.spike2signals_interface import get_streams
 from higley_lab_to_nwb.benisty_2024 import Benisty2024NWBConverter
 from higley_lab_to_nwb.benisty_2024.utils import (
@@ -18,6 +27,16 @@ def dual_imaging_session_to_nwb(
     subject_id: str,
     session_id: str,
     stub_test: bool = False,
+    pipelined_write: bool = True,
+    profile: bool = False,
+    masked_dff: bool = False,
+    quantized_dff: bool = False,
+    append: bool = False,
+    verify: bool = False,
+    output_layout: Literal["single_file", "multi_file"] = "single_file",
+    backend: Literal["hdf5", "zarr"] = "hdf5",
+    dry_run: bool = False,
+    benchmark_report_file_path: Optional[Union[str, Path]] = None,
 ):
     folder_path = data_dir_path / f"{subject_id}_1p"
 
@@ -26,14 +45,31 @@ def dual_imaging_session_to_nwb(
         output_dir_path = output_dir_path / "nwb_stub"
     output_dir_path.mkdir(parents=True, exist_ok=True)
 
-    nwbfile_path = output_dir_path / f"{session_id}_{subject_id}.nwb"
+    nwbfile_suffix = ".nwb.zarr" if backend == "zarr" else ".nwb"
+    nwbfile_path = output_dir_path / f"{session_id}_{subject_id}{nwbfile_suffix}"
 
     source_data = dict()
     conversion_options = dict()
 
-    # Add Analog signals from Spike2
+    # Read the Spike2 streams and the processed signals concurrently, they are independent until the alignment
     file_path = list(folder_path.glob(f"{session_id}*.smr"))[0]
-    stream_ids, stream_names = get_streams(file_path=file_path)
+    wheel_timestamps_file_path = folder_path / f"{session_id}_wheelbinary.mat"
+    wheel_speed_file_path = folder_path / f"{session_id}_wheelspeed.mat"
+    mat_file_path = folder_path / f"{session_id}.mat"
+    csv_file_path = folder_path / f"{session_id}.csv"
+    source_loaders = dict(
+        streams=partial(get_streams, file_path=file_path),
+        wheel_speed=partial(get_wheelspeed_trace_from_mat, file_path=wheel_speed_file_path),
+        wheel_times=partial(get_wheel_times_from_mat, file_path=wheel_timestamps_file_path),
+    )
+    if csv_file_path.is_file():
+        source_loaders["visual_stimulus_times"] = partial(
+            get_event_times_from_mat, file_path=str(mat_file_path), stream_name="diode"
+        )
+    loaded_sources = run_concurrently(tasks=source_loaders)
+
+    # Add Analog signals from Spike2
+    stream_ids, stream_names = loaded_sources["streams"]
 
     # Define each smr signal name
     # in the .log file 2p acquisition sync with "EyeCam"
@@ -59,10 +95,8 @@ def dual_imaging_session_to_nwb(
     conversion_options.update(dict(Spike2Signals=dict(stub_test=stub_test)))
 
     # Add Processed Behavioral Signals
-    wheel_timestamps_file_path = folder_path / f"{session_id}_wheelbinary.mat"
-    wheel_speed_file_path = folder_path / f"{session_id}_wheelspeed.mat"
-    wheel_speed_data, sampling_frequency = get_wheelspeed_trace_from_mat(file_path=wheel_speed_file_path)
-    wheel_on_times, wheel_off_times = get_wheel_times_from_mat(file_path=wheel_timestamps_file_path)
+    wheel_speed_data, sampling_frequency = loaded_sources["wheel_speed"]
+    wheel_on_times, wheel_off_times = loaded_sources["wheel_times"]
     source_data.update(
         dict(
             ProcessedWheelSignalInterface=dict(
@@ -75,11 +109,9 @@ def dual_imaging_session_to_nwb(
     )
     conversion_options.update(dict(ProcessedWheelSignalInterface=dict(stub_test=stub_test)))
 
-    mat_file_path = folder_path / f"{session_id}.mat"
     # Add Visual Stimulus
-    csv_file_path = folder_path / f"{session_id}.csv"
     if csv_file_path.is_file():
-        start_times, stop_times = get_event_times_from_mat(file_path=str(mat_file_path), stream_name="diode")
+        start_times, stop_times = loaded_sources["visual_stimulus_times"]
         source_data.update(
             dict(
                 VisualStimulusInterface=dict(
@@ -123,7 +155,15 @@ def dual_imaging_session_to_nwb(
         )
     )
     conversion_options.update(
-        dict(OnePhotonImaging=dict(stub_test=stub_test, photon_series_type="OnePhotonSeries", photon_series_index=0))
+        dict(
+            OnePhotonImaging=dict(
+                stub_test=stub_test,
+                photon_series_type="OnePhotonSeries",
+                photon_series_index=0,
+                pipelined_write=pipelined_write,
+                add_summary_images=pipelined_write,
+            )
+        )
     )
 
     channel_first_frame_index = 1
@@ -141,7 +181,11 @@ def dual_imaging_session_to_nwb(
     conversion_options.update(
         dict(
             OnePhotonImagingIsosbestic=dict(
-                stub_test=stub_test, photon_series_type="OnePhotonSeries", photon_series_index=1
+                stub_test=stub_test,
+                photon_series_type="OnePhotonSeries",
+                photon_series_index=1,
+                pipelined_write=pipelined_write,
+                add_summary_images=pipelined_write,
             )
         )
     )
@@ -166,6 +210,9 @@ def dual_imaging_session_to_nwb(
                 photon_series_type="OnePhotonSeries",
                 photon_series_index=2,
                 parent_container="processing/ophys",
+                pipelined_write=pipelined_write,
+                masked_pixels=masked_dff,
+                quantized=quantized_dff,
             )
         )
     )
@@ -187,6 +234,9 @@ def dual_imaging_session_to_nwb(
                 photon_series_type="OnePhotonSeries",
                 photon_series_index=3,
                 parent_container="processing/ophys",
+                pipelined_write=pipelined_write,
+                masked_pixels=masked_dff,
+                quantized=quantized_dff,
             )
         )
     )
@@ -208,6 +258,8 @@ def dual_imaging_session_to_nwb(
                 photon_series_type="OnePhotonSeries",
                 photon_series_index=4,
                 parent_container="processing/ophys",
+                pipelined_write=pipelined_write,
+                quantized=quantized_dff,
             )
         )
     )
@@ -253,7 +305,25 @@ def dual_imaging_session_to_nwb(
     ophys_metadata_path = Path(__file__).parent / "metadata" / "benisty_2024_dual_ophys_metadata.yaml"
     ophys_metadata = load_dict_from_file(ophys_metadata_path)
 
-    converter = Benisty2024NWBConverter(source_data=source_data, ophys_metadata=ophys_metadata)
+    # Estimate the size and duration of the conversion from the headers of the source files, without converting
+    if dry_run:
+        throughputs = load_throughputs(benchmark_report_file_path) if benchmark_report_file_path else None
+        estimate = estimate_conversion(
+            source_data=source_data,
+            data_interface_classes=Benisty2024NWBConverter.data_interface_classes,
+            conversion_options=conversion_options,
+            throughputs=throughputs,
+        )
+        print_estimate(estimate)
+        return estimate
+
+    converter = Benisty2024NWBConverter(
+        source_data=source_data,
+        ophys_metadata=ophys_metadata,
+        profile=profile,
+        output_layout=output_layout,
+        backend=backend,
+    )
 
     # Add datetime to conversion
 
@@ -266,10 +336,36 @@ def dual_imaging_session_to_nwb(
     editable_metadata = load_dict_from_file(editable_metadata_path)
     metadata = dict_deep_update(metadata, editable_metadata)
 
-    # Run conversion
-    converter.run_conversion(
-        metadata=metadata, nwbfile_path=nwbfile_path, conversion_options=conversion_options, overwrite=True
-    )
+    # Add or replace only the interfaces whose sources changed since the existing NWB file was written
+    if append and nwbfile_path.is_file():
+        interface_names = converter.append_changed_interfaces(
+            nwbfile_path=nwbfile_path, metadata=metadata, conversion_options=conversion_options
+        )
+        print(f"Interfaces added or replaced in {nwbfile_path}: {interface_names}")
+    else:
+        # Run conversion
+        # Write to a temporary file first, so that an interrupted conversion never leaves a partial NWB file behind
+        with atomic_nwbfile_path(nwbfile_path) as temporary_nwbfile_path:
+            converter.run_conversion(
+                metadata=metadata,
+                nwbfile_path=temporary_nwbfile_path,
+                conversion_options=conversion_options,
+                overwrite=True,
+            )
+
+    # Compare a random sample of the chunks of the series written with their sources, raising on a mismatch
+    if verify:
+        verification = converter.verify_conversion(
+            nwbfile_path=nwbfile_path, metadata=metadata, conversion_options=conversion_options
+        )
+        print_verification(verification)
+
+    if profile:
+        profile_report_path = output_dir_path / f"{session_id}_{subject_id}_profile.json"
+        converter.profiler.save_report(file_path=profile_report_path)
+        converter.profiler.print_report()
+
+    return nwbfile_path
 
 
 if __name__ == "__main__":
@@ -1,10 +1,6 @@
 """Primary NWBConverter class for this dataset."""
 
-from typing import Dict
-from neuroconv import NWBConverter
 from neuroconv.utils import DeepDict
-from pynwb import NWBFile
-from neuroconv.tools.nwb_helpers import make_or_load_nwbfile
 from neuroconv.datainterfaces import ScanImageMultiFileImagingInterface, Suite2pSegmentationInterface
 from higley_lab_to_nwb.interfaces import (
     ExternalStimuliInterface,
@@ -17,9 +13,10 @@ from higley_lab_to_nwb.interfaces import (
     FacemapPythonInterface,
 )
 from neuroconv.datainterfaces import VideoInterface
+from higley_lab_to_nwb.higley_lab_nwbconverter import HigleyLabNWBConverter
 
 
-class Benisty2024NWBConverter(NWBConverter):
+class Benisty2024NWBConverter(HigleyLabNWBConverter):
     """Primary conversion class."""
 
     data_interface_classes = dict(
@@ -39,10 +36,6 @@ class Benisty2024NWBConverter(NWBConverter):
         HemodynamicCorrectedOnePhotonImaging=ProcessedImagingInterface,
     )
 
-    def __init__(self, source_data: Dict[str, dict], ophys_metadata: Dict[str, dict], verbose: bool = True):
-        super().__init__(source_data, verbose)
-        self.ophys_metadata = ophys_metadata
-
     def get_metadata(self) -> DeepDict:
         metadata = super().get_metadata()
         if "Suite2pSegmentation" in self.data_interface_objects.keys():
@@ -71,34 +64,6 @@ class Benisty2024NWBConverter(NWBConverter):
 
         return metadata
 
-    def run_conversion(  # until [Issue #908](https://github.com/catalystneuro/neuroconv/issues/908) is fixed
-        self,
-        nwbfile_path: str = None,
-        nwbfile: NWBFile = None,
-        metadata: Dict = None,
-        overwrite: bool = False,
-        conversion_options: Dict = None,
-    ) -> None:
-        if metadata is None:
-            metadata = self.get_metadata()
-
-        self.validate_metadata(metadata=metadata)
-
-        self.validate_conversion_options(conversion_options=conversion_options)
-
-        self.temporally_align_data_interfaces()
-
-        with make_or_load_nwbfile(
-            nwbfile_path=nwbfile_path,
-            nwbfile=nwbfile,
-            metadata=metadata,
-            overwrite=overwrite,
-            verbose=self.verbose,
-        ) as nwbfile_out:
-            self.add_to_nwbfile(nwbfile_out, metadata, conversion_options)
-
-        return
-
     def temporally_align_data_interfaces(self):
         ttlsignal_interface = self.data_interface_objects["Spike2Signals"]
 
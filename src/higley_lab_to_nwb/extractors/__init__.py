@@ -1,7 +1,34 @@
-from .cidansegmentation_extractor import CidanSegmentationExtractor
-from .mesoscopic_imaging_extractor import (
-    MesoscopicImagingMultiTiffStackExtractor,
-    MesoscopicImagingMultiTiffSingleFrameExtractor,
+"""The extractors, imported on first access so that importing the package doesn't import their dependencies."""
+
+from typing import TYPE_CHECKING
+
+from ..lazy_imports import attach_lazy_imports
+
+# the public names of the package and the module defining them, imported on first access
+_NAME_TO_MODULE = dict(
+    CidanSegmentationExtractor=".cidansegmentation_extractor",
+    MesoscopicImagingMultiTiffStackExtractor=".mesoscopic_imaging_extractor",
+    MesoscopicImagingMultiTiffSingleFrameExtractor=".mesoscopic_imaging_extractor",
+    get_tiff_header_info=".mesoscopic_imaging_extractor",
+    ProcessedImagingExtractor=".processed_imaging_extractor",
+    get_masked_pixel_coordinates=".processed_imaging_extractor",
+    ParcellsSegmentationExtractor=".parcells_segmentation_extractor",
+    QuantizedImagingExtractor=".quantized_imaging_extractor",
+    get_quantization_parameters=".quantized_imaging_extractor",
+    quantize=".quantized_imaging_extractor",
 )
-from .processed_imaging_extractor import ProcessedImagingExtractor
-from .parcells_segmentation_extractor import ParcellsSegmentationExtractor
+__all__ = list(_NAME_TO_MODULE)
+
+__getattr__, __dir__ = attach_lazy_imports(package_name=__name__, name_to_module=_NAME_TO_MODULE)
+
+
+if TYPE_CHECKING:
+    from .cidansegmentation_extractor import CidanSegmentationExtractor
+    from .mesoscopic_imaging_extractor import (
+        MesoscopicImagingMultiTiffStackExtractor,
+        MesoscopicImagingMultiTiffSingleFrameExtractor,
+        get_tiff_header_info,
+    )
+    from .processed_imaging_extractor import ProcessedImagingExtractor, get_masked_pixel_coordinates
+    from .parcells_segmentation_extractor import ParcellsSegmentationExtractor
+    from .quantized_imaging_extractor import QuantizedImagingExtractor, get_quantization_parameters, quantize
@@ -6,13 +6,14 @@ CidanSegmentationExtractor
     A segmentation extractor for Higley Lab using CIDAN software.
 """
 
-import scipy.io
 import json
 import numpy as np
 from neuroconv.utils import FilePathType
-from roiextractors.extraction_tools import _image_mask_extractor
 from roiextractors.segmentationextractor import SegmentationExtractor
 
+from .mat_file_utils import read_mat_variables
+from .sparse_pixel_masks import SparsePixelMasks
+
 
 class CidanSegmentationExtractor(SegmentationExtractor):
     """A segmentation extractor for CIDAN."""
@@ -49,36 +50,41 @@ class CidanSegmentationExtractor(SegmentationExtractor):
 
         self._sampling_frequency = sampling_frequency
 
-        mat_contents = scipy.io.loadmat(self.mat_file_path)
-        self._roi_response_denoised = np.array(mat_contents["deltafoverf"]).T
-        
+        # traces are (frames, rois) views on disk, only the requested frames/rois windows are read
+        mat_contents = read_mat_variables(file_path=self.mat_file_path, lazy_variable_names=["deltafoverf"])
+        self._roi_response_denoised = mat_contents["deltafoverf"]
+
         self._image_size = image_size
-        self._image_masks = _image_mask_extractor(
-            self.get_roi_pixel_masks(),
-            self.get_roi_ids(),
-            self.get_image_size(),
+        # roi_list.json is parsed once, dense image masks are built lazily only for the requested ROIs
+        with open(self.roi_list_file_path) as file:
+            roi_list = json.load(file)
+        self._image_masks = SparsePixelMasks.from_coordinates(
+            coordinates=[roi["coordinates"] for roi in roi_list], image_size=image_size
         )
-        
+        self._roi_id_to_index = {roi_id: roi_index for roi_index, roi_id in enumerate(self.get_roi_ids())}
+
         with open(self.parameters_file_path) as file:
             self.parameters_dict = json.load(file)
             # keep only paramenters that describe the segmentation algorithm
             self.parameters_dict.pop("dataset_params")
             self.parameters_dict.pop("global_params")
 
+    def _get_roi_indices(self, roi_ids=None):
+        if roi_ids is None:
+            return range(self.get_num_rois())
+        unknown_roi_ids = [roi_id for roi_id in roi_ids if roi_id not in self._roi_id_to_index]
+        if unknown_roi_ids:
+            raise ValueError(f"The roi ids {unknown_roi_ids} are not roi ids of the segmentation.")
+        return [self._roi_id_to_index[roi_id] for roi_id in roi_ids]
+
     def get_roi_pixel_masks(self, roi_ids=None):
-        pixel_mask = []
-        with open(self.roi_list_file_path) as file:
-            roi_list = json.load(file)
-            for roi in roi_list:
-                pixel_mask.append(np.stack([[x, y, 1] for [x, y] in roi["coordinates"]]))
+        return self._image_masks.get_pixel_masks(roi_indices=self._get_roi_indices(roi_ids=roi_ids))
 
-        if roi_ids is None:
-            roi_idx_ = range(self.get_num_rois())
-        else:
-            roi_idx = [np.where(np.array(i) == self.get_roi_ids())[0] for i in roi_ids]
-            ele = [i for i, j in enumerate(roi_idx) if j.size == 0]
-            roi_idx_ = [j[0] for i, j in enumerate(roi_idx) if i not in ele]
-        return [pixel_mask[i] for i in roi_idx_]
+    def get_roi_image_masks(self, roi_ids=None):
+        return self._image_masks.get_image_masks(roi_indices=self._get_roi_indices(roi_ids=roi_ids))
+
+    def get_roi_locations(self, roi_ids=None):
+        return self._image_masks.get_roi_locations(roi_indices=self._get_roi_indices(roi_ids=roi_ids))
 
     def get_accepted_list(self):
         return self.get_roi_ids()
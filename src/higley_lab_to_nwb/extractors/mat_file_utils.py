@@ -0,0 +1,264 @@
+"""Lazy access to the variables stored in MATLAB files.
+
+Functions
+---------
+read_mat_variables
+    Read the variables of a MATLAB file in a single pass, leaving the large numeric ones on disk.
+get_mat_variable_info
+    Return the shape and dtype of the variables of a MATLAB file, reading only their headers.
+
+Classes
+-------
+H5DatasetView
+    A picklable, lazily opened view of a dataset in a MATLAB v7.3 (HDF5) file.
+"""
+
+import weakref
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import h5py
+import numpy as np
+from neuroconv.utils import FilePathType
+
+# MATLAB v5 numeric classes and the corresponding numpy dtypes (see scipy.io.matlab._mio5_params.mclass_info)
+_MAT_V5_CLASS_DTYPES = {6: "f8", 7: "f4", 8: "i1", 9: "u1", 10: "i2", 11: "u2", 12: "i4", 13: "u4", 14: "i8", 15: "u8"}
+# MATLAB v5 data types and the corresponding numpy dtypes (see scipy.io.matlab._mio5_params.mdtypes_template)
+_MAT_V5_DTYPES = {1: "i1", 2: "u1", 3: "i2", 4: "u2", 5: "i4", 6: "u4", 7: "f4", 9: "f8", 12: "i8", 13: "u8"}
+# MATLAB class names (as reported by scipy.io.whosmat) and the corresponding numpy dtypes
+_MAT_CLASS_DTYPES = dict(
+    double="f8",
+    single="f4",
+    int8="i1",
+    uint8="u1",
+    int16="i2",
+    uint16="u2",
+    int32="i4",
+    uint32="u4",
+    int64="i8",
+    uint64="u8",
+    logical="u1",
+)
+
+
+class H5DatasetView:
+    """A lazily opened view of a dataset in an HDF5 file.
+
+    Only the requested selection is read from disk. The file is opened on first access and the handle is dropped
+    when the object is pickled, so the view can be sent to worker processes.
+    """
+
+    def __init__(self, file_path: FilePathType, dataset_name: str):
+        self.file_path = str(file_path)
+        self.dataset_name = dataset_name
+        self._file = None
+        with h5py.File(self.file_path, "r") as file:
+            dataset = file[dataset_name]
+            self.shape = dataset.shape
+            self.dtype = dataset.dtype
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def _get_dataset(self) -> h5py.Dataset:
+        if self._file is None:
+            self._file = h5py.File(self.file_path, "r")
+            # closed when the view is collected, or at exit before the globals of h5py are cleared
+            weakref.finalize(self, self._file.close)
+        return self._file[self.dataset_name]
+
+    def __getitem__(self, selection) -> np.ndarray:
+        return self._get_dataset()[selection]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = self._get_dataset()[()]
+        return array if dtype is None else array.astype(dtype)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_file"] = None
+        return state
+
+
+def _read_hdf5_mat_object(file: h5py.File, h5_object: Union[h5py.Group, h5py.Dataset]):
+    """Read a MATLAB v7.3 variable into memory, resolving the object references of cells and structs."""
+    if isinstance(h5_object, h5py.Group):
+        return {name: _read_hdf5_mat_object(file, h5_object[name]) for name in h5_object.keys()}
+    if h5_object.dtype == h5py.ref_dtype:
+        references = h5_object[()]
+        values = np.empty(references.shape, dtype=object)
+        for index, reference in np.ndenumerate(references):
+            values[index] = _read_hdf5_mat_object(file, file[reference])
+        return values
+    return h5_object[()]
+
+
+def _read_mat_v5_data_element(mat_stream, byte_order: str) -> Tuple[int, int, int]:
+    """Read the tag of the data element at the current position, return (mdtype, byte_count, data offset)."""
+    tag = np.frombuffer(mat_stream.read(8), dtype=f"{byte_order}u4")
+    mdtype, byte_count = int(tag[0]), int(tag[1])
+    if mdtype >> 16:  # small data element format, the data is packed in the tag itself
+        return mdtype & 0xFFFF, mdtype >> 16, mat_stream.tell() - 4
+    return mdtype, byte_count, mat_stream.tell()
+
+
+def _load_mat_v5_variables(
+    file_path: FilePathType, variable_names: Iterable[str], lazy_variable_names: Iterable[str]
+) -> Dict[str, np.ndarray]:
+    """Read the variables of a MATLAB v5 file in memory with `scipy.io.loadmat`, the lazy ones in their MATLAB class."""
+    from scipy.io import loadmat
+
+    lazy_variable_names = list(lazy_variable_names)
+    variable_names = [name for name in variable_names if name not in lazy_variable_names]
+    variables = dict()
+    if variable_names:
+        variables.update(loadmat(file_path, variable_names=variable_names))
+    if lazy_variable_names:
+        variables.update(loadmat(file_path, variable_names=lazy_variable_names, mat_dtype=True))
+    return {name: value for name, value in variables.items() if not name.startswith("__")}
+
+
+def _read_mat_v5_variables(
+    file_path: FilePathType, variable_names: Iterable[str], lazy_variable_names: Iterable[str]
+) -> Dict[str, np.ndarray]:
+    try:
+        # the reader of the variables one at a time is not part of the public API of scipy
+        from scipy.io.matlab._mio5 import MatFile5Reader
+    except ImportError:
+        return _load_mat_v5_variables(
+            file_path=file_path, variable_names=variable_names, lazy_variable_names=lazy_variable_names
+        )
+
+    variable_names = set(variable_names) | set(lazy_variable_names)
+    lazy_variable_names = set(lazy_variable_names)
+    variables = dict()
+    memmap_offsets = dict()
+    with open(file_path, "rb") as mat_stream:
+        reader = MatFile5Reader(mat_stream)
+        reader.initialize_read()
+        reader.read_file_header()
+        byte_order = "<" if reader.byte_order in ("<", "little") else ">"
+        while not reader.end_of_stream() and len(variables) + len(memmap_offsets) < len(variable_names):
+            is_compressed = int(np.frombuffer(mat_stream.read(4), dtype=f"{byte_order}u4")[0]) == 15
+            mat_stream.seek(-4, 1)
+            header, next_position = reader.read_var_header()
+            name = header.name.decode("latin1") if header.name is not None else ""
+            if name not in variable_names:
+                mat_stream.seek(next_position)
+                continue
+            class_dtype = _MAT_V5_CLASS_DTYPES.get(header.mclass) if name in lazy_variable_names else None
+            # uncompressed real numeric variables are memory mapped in place of being read
+            if class_dtype is not None and not is_compressed:
+                data_position = mat_stream.tell()
+                mdtype, byte_count, data_offset = _read_mat_v5_data_element(mat_stream, byte_order=byte_order)
+                dims = tuple(int(dim) for dim in header.dims)
+                dtype = _MAT_V5_DTYPES.get(mdtype)
+                # complex variables have their imaginary part stored after the (8 bytes aligned) real part
+                is_real = data_offset + -(-byte_count // 8) * 8 == next_position
+                if is_real and dtype is not None and byte_count == np.dtype(dtype).itemsize * np.prod(dims):
+                    memmap_offsets[name] = (data_offset, byte_order + dtype, dims, class_dtype)
+                    mat_stream.seek(next_position)
+                    continue
+                # not a plain numeric data element, fall back on reading the variable
+                mat_stream.seek(data_position)
+            variables[name] = reader.read_var_array(header)
+            if class_dtype is not None and variables[name].dtype.kind != "c":
+                variables[name] = variables[name].astype(class_dtype, copy=False)
+            mat_stream.seek(next_position)
+
+    for name, (data_offset, dtype, dims, class_dtype) in memmap_offsets.items():
+        variables[name] = np.memmap(file_path, dtype=dtype, mode="r", offset=data_offset, shape=dims, order="F")
+        # MATLAB stores the values in the smallest type holding them (e.g. a double matrix of small integers as
+        # uint8), such variables are read in memory in their MATLAB class
+        if variables[name].dtype != np.dtype(class_dtype):
+            variables[name] = variables[name].astype(class_dtype)
+
+    return variables
+
+
+def read_mat_variables(
+    file_path: FilePathType, variable_names: Iterable[str] = (), lazy_variable_names: Iterable[str] = ()
+) -> Dict[str, Union[np.ndarray, H5DatasetView]]:
+    """Read the variables of a MATLAB file with a single open of the file.
+
+    The numeric variables listed in `lazy_variable_names` are not loaded in memory: for v7.3 (HDF5) files they are
+    returned as H5DatasetView and for uncompressed v5 files as read-only memory maps. Compressed v5 variables can't be
+    memory mapped and are read in memory as a fallback.
+    Lazy variables are always returned with their MATLAB dimensions reversed (the h5py convention), e.g. a
+    (rois x frames) MATLAB matrix is returned as a (frames, rois) array, without any copy.
+
+    Parameters
+    ----------
+    file_path: str or Path
+        The path to the .mat file.
+    variable_names: list of str
+        The names of the variables to read in memory.
+    lazy_variable_names: list of str
+        The names of the numeric variables to access lazily.
+
+    Returns
+    -------
+    variables: dict
+        The variables by name, the other variables are read as with `scipy.io.loadmat` for v5 files and as nested
+        dicts and object arrays for v7.3 files.
+    """
+    file_path = Path(file_path)
+    if h5py.is_hdf5(file_path):
+        with h5py.File(file_path, "r") as file:
+            variables = {name: _read_hdf5_mat_object(file, file[name]) for name in variable_names}
+        variables.update({name: H5DatasetView(file_path=file_path, dataset_name=name) for name in lazy_variable_names})
+        return variables
+
+    variables = _read_mat_v5_variables(
+        file_path=file_path, variable_names=variable_names, lazy_variable_names=lazy_variable_names
+    )
+    for name in lazy_variable_names:
+        variables[name] = variables[name].T
+    return variables
+
+
+def get_mat_variable_info(file_path: FilePathType) -> Dict[str, Tuple[Tuple[int, ...], Optional[np.dtype]]]:
+    """Return the shape and dtype of the variables of a MATLAB file, reading only their headers.
+
+    For v7.3 (HDF5) files every dataset is reported by its path, including the elements of cells and structs stored in
+    "#refs#", with the h5py shape (the MATLAB dimensions reversed). For v5 files the top level variables are reported
+    with their MATLAB dimensions, see `scipy.io.whosmat`.
+
+    Parameters
+    ----------
+    file_path: str or Path
+        The path to the .mat file.
+
+    Returns
+    -------
+    variable_info: dict
+        The (shape, dtype) of each variable, by name. The dtype is None for the non-numeric variables (cells,
+        structs, strings, object references).
+    """
+    file_path = Path(file_path)
+    variable_info = dict()
+    if h5py.is_hdf5(file_path):
+
+        def add_dataset_info(name: str, h5_object) -> None:
+            if isinstance(h5_object, h5py.Dataset):
+                dtype = h5_object.dtype if h5_object.dtype.kind in "biuf" else None
+                variable_info[name] = (h5_object.shape, dtype)
+
+        with h5py.File(file_path, "r") as file:
+            file.visititems(add_dataset_info)
+        return variable_info
+
+    from scipy.io import whosmat
+
+    for name, shape, class_name in whosmat(file_path):
+        dtype = _MAT_CLASS_DTYPES.get(class_name)
+        variable_info[name] = (tuple(shape), np.dtype(dtype) if dtype is not None else None)
+    return variable_info
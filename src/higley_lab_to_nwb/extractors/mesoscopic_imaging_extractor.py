@@ -1,3 +1,4 @@
+from importlib import import_module
 from pathlib import Path
 from typing import Tuple, Literal, Optional
 from warnings import warn
@@ -6,7 +7,50 @@ from roiextractors.extraction_tools import PathType, ArrayType, DtypeType, get_p
 from roiextractors.imagingextractor import ImagingExtractor
 from roiextractors.multiimagingextractor import MultiImagingExtractor
 from natsort import natsorted
-import tifffile
+
+# the number of columns of each half of the split field of view of the single frame TIFF files
+_FRAME_SIDE_NUM_COLUMNS = 512
+
+
+def _get_tifffile():
+    """Import tifffile, also from the reader threads of a spawned worker process.
+
+    `get_package` returns the module found in `sys.modules`, which is only partially initialized while another thread
+    imports it, whereas `import_module` waits for that import to complete.
+    """
+    try:
+        return import_module("tifffile")
+    except ImportError:
+        return get_package(package_name="tifffile")
+
+
+def get_tiff_header_info(file_path: PathType) -> Tuple[int, Tuple[int, ...], np.dtype]:
+    """Return the number of pages, the shape and the dtype of the first page of a TIFF file, from its tags only.
+
+    The pages are counted from the shape of the first series of the file, not from its IFDs: the ImageJ stacks can
+    store a single IFD for all their pages.
+
+    Parameters
+    ----------
+    file_path : PathType
+        Path to the TIFF file.
+
+    Returns
+    -------
+    num_pages: int
+        The number of pages (frames) of the file.
+    page_shape: tuple of int
+        The shape of the first page.
+    dtype: np.dtype
+        The dtype of the first page.
+    """
+    tifffile = _get_tifffile()
+    with tifffile.TiffFile(file_path) as tiff_file:
+        series = tiff_file.series[0]
+        shape, axes, dtype = tuple(series.shape), series.axes, np.dtype(series.dtype)
+    if axes.endswith("YX"):
+        return int(np.prod(shape[:-2])), shape[-2:], dtype
+    return shape[0], shape[1:], dtype
 
 
 class MesoscopicImagingMultiTiffStackExtractor(MultiImagingExtractor):
@@ -88,8 +132,6 @@ class MesoscopicImagingTiffStackExtractor(ImagingExtractor):
         Notes
         -----
         """
-        tifffile = get_package(package_name="tifffile")
-
         super().__init__()
         self.file_path = Path(file_path)
         self._sampling_frequency = sampling_frequency
@@ -97,23 +139,33 @@ class MesoscopicImagingTiffStackExtractor(ImagingExtractor):
         self.channel_first_frame_index = channel_first_frame_index
         self._channel_names = [f"Channel{i}" for i in range(number_of_channels)]
 
+        # the properties are read from the TIFF tags, the pixels are mapped on the first access to the frames
+        self._total_num_frames, page_shape, self._dtype = get_tiff_header_info(file_path=self.file_path)
+        if len(page_shape) == 2:
+            self._num_rows, self._num_columns = page_shape
+            self._num_frames = self._total_num_frames // self._num_channels
+        else:
+            raise NotImplementedError("Extractor cannot handle 4D Tiff data.")
+        self._raw_video = None
+        self._times = None
+
+    def _get_raw_video(self) -> np.ndarray:
+        """Return the (pages, rows, columns) array of the TIFF file, memory-mapped on the first call."""
+        if self._raw_video is not None:
+            return self._raw_video
+
+        tifffile = _get_tifffile()
         try:
-            self._raw_video = tifffile.memmap(self.file_path, mode="r")
+            raw_video = tifffile.memmap(self.file_path, mode="r")
         except ValueError:
             warn(
                 "memmap of TIFF file could not be established. Reading entire matrix into memory. "
                 "Consider using the ScanImageTiffExtractor for lazy data access."
             )
             with tifffile.TiffFile(self.file_path) as tif:
-                self._raw_video = tif.asarray()
-
-        shape = self._raw_video.shape
-        if len(shape) == 3:
-            self._total_num_frames, self._num_rows, self._num_columns = shape
-            self._num_frames = self._total_num_frames // self._num_channels
-        else:
-            raise NotImplementedError("Extractor cannot handle 4D Tiff data.")
-        self._times = None
+                raw_video = tif.asarray()
+        self._raw_video = raw_video.reshape(self._total_num_frames, self._num_rows, self._num_columns)
+        return self._raw_video
 
     def get_frames(self, frame_idxs: ArrayType) -> np.ndarray:
         """Get specific video frames from indices (not necessarily continuous).
@@ -154,7 +206,7 @@ class MesoscopicImagingTiffStackExtractor(ImagingExtractor):
         """
         self.check_frame_inputs(frame)
         raw_index = self.frame_to_raw_index(frame)
-        return self._raw_video[raw_index : raw_index + 1]
+        return self._get_raw_video()[raw_index : raw_index + 1]
 
     def get_video(self, start_frame=None, end_frame=None) -> np.ndarray:
         """Get the video frames.
@@ -181,7 +233,7 @@ class MesoscopicImagingTiffStackExtractor(ImagingExtractor):
         raw_start = self.frame_to_raw_index(start_frame)
         raw_end_inclusive = self.frame_to_raw_index(end_frame_inclusive)
         raw_end = raw_end_inclusive + 1
-        video = self._raw_video[raw_start : raw_end : self._num_channels, ...]
+        video = self._get_raw_video()[raw_start : raw_end : self._num_channels, ...]
         return video
 
     def get_image_size(self) -> Tuple[int, int]:
@@ -200,7 +252,7 @@ class MesoscopicImagingTiffStackExtractor(ImagingExtractor):
         return self._channel_names
 
     def get_dtype(self) -> DtypeType:
-        return self.get_frames([0]).dtype
+        return self._dtype
 
     def check_frame_inputs(self, frame) -> None:
         """Check that the frame index is valid. Raise ValueError if not.
@@ -283,6 +335,16 @@ class MesoscopicImagingMultiTiffSingleFrameExtractor(ImagingExtractor):
         self._num_channels = number_of_channels
         self._channel_names = [f"Channel{i}" for i in range(number_of_channels)]
 
+        # the frame size and dtype are read from the tags of the first TIFF file, the frames are (columns, rows)
+        self._image_size, self._dtype = None, None
+        if self._selected_tiff_file_paths:
+            _, (num_rows, num_columns), self._dtype = get_tiff_header_info(file_path=self._selected_tiff_file_paths[0])
+            if self.frame_side == "left":
+                side_num_columns = min(num_columns, _FRAME_SIDE_NUM_COLUMNS)
+            else:
+                side_num_columns = max(num_columns - _FRAME_SIDE_NUM_COLUMNS, 0)
+            self._image_size = (side_num_columns, num_rows)
+
     def get_frames(self, frame_idxs: ArrayType, channel: Optional[int] = 0) -> np.ndarray:
         """Get specific video frames from indices (not necessarily continuous).
 
@@ -342,17 +404,18 @@ class MesoscopicImagingMultiTiffSingleFrameExtractor(ImagingExtractor):
         if end_frame is None:
             end_frame = self._num_frames
 
+        tifffile = _get_tifffile()
         if self.frame_side == "left":
             video = np.stack(
                 [
-                    tifffile.memmap(file_path, mode="r")[:, :512]
+                    tifffile.memmap(file_path, mode="r")[:, :_FRAME_SIDE_NUM_COLUMNS]
                     for file_path in self._selected_tiff_file_paths[start_frame:end_frame]
                 ]
             )
         elif self.frame_side == "right":
             video = np.stack(
                 [
-                    tifffile.memmap(file_path, mode="r")[:, 512:]
+                    tifffile.memmap(file_path, mode="r")[:, _FRAME_SIDE_NUM_COLUMNS:]
                     for file_path in self._selected_tiff_file_paths[start_frame:end_frame]
                 ]
             )
@@ -360,8 +423,7 @@ class MesoscopicImagingMultiTiffSingleFrameExtractor(ImagingExtractor):
         return video.transpose((0, 2, 1))
 
     def get_image_size(self) -> tuple[int, int]:
-        frame = self._get_single_frame(frame=0)
-        return frame.shape[1], frame.shape[2]
+        return self._image_size
 
     def get_num_frames(self) -> int:
         return self._num_frames
@@ -376,7 +438,7 @@ class MesoscopicImagingMultiTiffSingleFrameExtractor(ImagingExtractor):
         return self._channel_names
 
     def get_dtype(self) -> DtypeType:
-        return self.get_frames([0]).dtype
+        return self._dtype
 
     def check_frame_inputs(self, frame) -> None:
         """Check that the frame index is valid. Raise ValueError if not.
@@ -6,17 +6,19 @@ ParcellsSegmentationExtractor
     A segmentation extractor for Higley Lab parcellation output.
 """
 
-from scipy.io import loadmat
 import numpy as np
 from neuroconv.utils import FilePathType
-from roiextractors.extraction_tools import _image_mask_extractor
 from roiextractors.segmentationextractor import SegmentationExtractor
 
+from .mat_file_utils import read_mat_variables
+from .sparse_pixel_masks import SparsePixelMasks
 
-def _get_pixel_coordinate(pixel_num, n_cols: int, n_rows: int) -> np.ndarray:
-    row = (pixel_num - 1) % n_cols
-    col = (pixel_num - 1) // n_cols
-    return [n_rows - row[0], n_cols - col[0], 1]
+
+def _get_pixel_coordinates(pixel_nums: np.ndarray, n_cols: int, n_rows: int) -> np.ndarray:
+    """Convert (1-based, MATLAB) linear pixel indices to (number_of_pixels, 2) [row, column] coordinates."""
+    rows = (pixel_nums - 1) % n_cols
+    cols = (pixel_nums - 1) // n_cols
+    return np.column_stack((n_rows - rows, n_cols - cols))
 
 
 class ParcellsSegmentationExtractor(SegmentationExtractor):
@@ -46,42 +48,57 @@ class ParcellsSegmentationExtractor(SegmentationExtractor):
 
         self._sampling_frequency = sampling_frequency
 
-        parcels_time_trace = loadmat(file_path, variable_names=["parcels_time_trace"])
-        self._roi_response_raw = parcels_time_trace["parcels_time_trace"].T
+        # both variables are read in a single pass over the file, the traces are kept on disk as a (frames, rois) view
+        mat_contents = read_mat_variables(
+            file_path=file_path, variable_names=["parcels_gal"], lazy_variable_names=["parcels_time_trace"]
+        )
+        self._roi_response_raw = mat_contents["parcels_time_trace"]
 
         self._image_size = image_size
 
-        parcels_gal = loadmat(file_path, variable_names=["parcels_gal"])
-        self._pixel_list_per_roi = np.array(parcels_gal["parcels_gal"][0]["ROI_list"][0]["pixel_list"][0])
+        parcels_gal = mat_contents["parcels_gal"]
+        if isinstance(parcels_gal, dict):  # v7.3 file
+            roi_list = parcels_gal["ROI_list"]
+            roi_list = roi_list.flat[0] if isinstance(roi_list, np.ndarray) else roi_list
+            self._pixel_list_per_roi = roi_list["pixel_list"].ravel()
+        else:
+            self._pixel_list_per_roi = np.array(parcels_gal[0]["ROI_list"][0]["pixel_list"][0])
 
         assert len(self._pixel_list_per_roi) == self._roi_response_raw.shape[1], (
             f"Number of ROIs in 'parcels_gal' ({len(self._pixel_list_per_roi)}) must match the number of fluorescent "
             f"traces in 'parcels_time_trace' ({self._roi_response_raw.shape[1]})"
         )
 
-        self.pixel_masks = []
-        for pixel_list in self._pixel_list_per_roi:
-            self.pixel_masks.append(
-                [
-                    _get_pixel_coordinate(pixel_num=pixel_num, n_cols=self._image_size[1], n_rows=self._image_size[0])
-                    for pixel_num in pixel_list
-                ]
-            )
-
-        self._image_masks = _image_mask_extractor(
-            self.get_roi_pixel_masks(),
-            self.get_roi_ids(),
-            self.get_image_size(),
+        # the pixel lists of all the parcels are converted in one vectorized pass,
+        # dense image masks are built lazily only for the requested ROIs
+        pixel_nums_per_roi = [np.asarray(pixel_list, dtype=np.int64).ravel() for pixel_list in self._pixel_list_per_roi]
+        coordinates = _get_pixel_coordinates(
+            pixel_nums=np.concatenate(pixel_nums_per_roi) if pixel_nums_per_roi else np.zeros(0, dtype=np.int64),
+            n_cols=self._image_size[1],
+            n_rows=self._image_size[0],
         )
+        roi_offsets = np.cumsum([len(pixel_nums) for pixel_nums in pixel_nums_per_roi])[:-1]
+        self._image_masks = SparsePixelMasks.from_coordinates(
+            coordinates=np.split(coordinates, roi_offsets), image_size=self._image_size
+        )
+        self._roi_id_to_index = {roi_id: roi_index for roi_index, roi_id in enumerate(self.get_roi_ids())}
 
-    def get_roi_pixel_masks(self, roi_ids=None):
+    def _get_roi_indices(self, roi_ids=None):
         if roi_ids is None:
-            roi_idx_ = range(self.get_num_rois())
-        else:
-            roi_idx = [np.where(np.array(i) == self.get_roi_ids())[0] for i in roi_ids]
-            ele = [i for i, j in enumerate(roi_idx) if j.size == 0]
-            roi_idx_ = [j[0] for i, j in enumerate(roi_idx) if i not in ele]
-        return [self.pixel_masks[i] for i in roi_idx_]
+            return range(self.get_num_rois())
+        unknown_roi_ids = [roi_id for roi_id in roi_ids if roi_id not in self._roi_id_to_index]
+        if unknown_roi_ids:
+            raise ValueError(f"The roi ids {unknown_roi_ids} are not roi ids of the segmentation.")
+        return [self._roi_id_to_index[roi_id] for roi_id in roi_ids]
+
+    def get_roi_pixel_masks(self, roi_ids=None):
+        return self._image_masks.get_pixel_masks(roi_indices=self._get_roi_indices(roi_ids=roi_ids))
+
+    def get_roi_image_masks(self, roi_ids=None):
+        return self._image_masks.get_image_masks(roi_indices=self._get_roi_indices(roi_ids=roi_ids))
+
+    def get_roi_locations(self, roi_ids=None):
+        return self._image_masks.get_roi_locations(roi_indices=self._get_roi_indices(roi_ids=roi_ids))
 
     def get_accepted_list(self):
         return self.get_roi_ids()
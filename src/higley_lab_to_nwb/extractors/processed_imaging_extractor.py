@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Tuple, Literal
+from typing import Literal, Optional, Tuple
 import numpy as np
 from roiextractors.extraction_tools import PathType, DtypeType, get_package
 from roiextractors.imagingextractor import ImagingExtractor
@@ -17,7 +17,7 @@ def _load_data_from_dual_imaging_configuration(file_path: str, process_type: str
         mask = file["mask"][:]
         num_rows, num_columns = mask.shape
 
-    return np.nan_to_num(pixels_matrix), num_rows, num_columns, mask
+    return np.nan_to_num(pixels_matrix, copy=False), num_rows, num_columns, mask
 
 
 def _load_data_from_1p_imaging_configuration(file_path: str, process_type: str) -> np.ndarray:
@@ -29,7 +29,18 @@ def _load_data_from_1p_imaging_configuration(file_path: str, process_type: str)
         num_rows = int(file["R"][:])
         num_columns = int(file["C"][:])
 
-    return np.nan_to_num(pixels_matrix), num_rows, num_columns
+    return np.nan_to_num(pixels_matrix, copy=False), num_rows, num_columns
+
+
+def get_masked_pixel_coordinates(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the (rows, columns) of the pixels of the columns of a pixels matrix, in the order of the MATLab files.
+
+    The pixels matrix holds the pixel traces of the non-zero elements of the frame mask (or of all the pixels when the
+    mask is full), starting from the last row and the last column of the frame.
+    """
+    num_rows, num_columns = mask.shape
+    flipped_rows, flipped_columns = np.nonzero(mask[::-1, ::-1])
+    return num_rows - 1 - flipped_rows, num_columns - 1 - flipped_columns
 
 
 class ProcessedImagingExtractor(ImagingExtractor):
@@ -80,7 +91,7 @@ class ProcessedImagingExtractor(ImagingExtractor):
             )
 
         self._num_frames, number_of_pixels = self._pixels_matrix.shape
-        self._dtype = self._pixels_matrix[0].dtype
+        self._dtype = self._pixels_matrix.dtype
         if number_of_pixels == self._num_rows * self._num_columns:
             self._mask = None
 
@@ -90,20 +101,15 @@ class ProcessedImagingExtractor(ImagingExtractor):
                 f"not match the frame dimension {self._num_rows} * {self._num_columns} or the non-zero elements in "
                 f"the frame mask {np.count_nonzero(self.mask)}."
             )
+        else:
+            self._mask = self.mask
+        self._pixel_rows, self._pixel_columns = get_masked_pixel_coordinates(
+            mask=self._mask if self._mask is not None else np.ones((self._num_rows, self._num_columns), dtype=bool)
+        )
 
     def _get_single_frame(self, frame_idx: int) -> np.ndarray:
-        frame = np.zeros((self._num_rows, self._num_columns))
-        i = 0
-        for r in range(self._num_rows):
-            for c in range(self._num_columns):
-                # "dff_blue" and "dff_uv" pixel matrix contains the pixel trace for only the non-zero elements of the
-                # mask (different pixel indexing)
-                if self._mask is not None and self._mask[r, c] != 0:
-                    frame[r, c] = self._pixels_matrix[frame_idx, i]
-                    i += 1
-                elif self._mask is None:
-                    frame[r, c] = self._pixels_matrix[frame_idx, i]
-                    i += 1
+        frame = np.zeros((self._num_rows, self._num_columns), dtype=self._dtype)
+        frame[self._pixel_rows, self._pixel_columns] = self._pixels_matrix[frame_idx]
         return frame
 
     def get_video(self, start_frame=None, end_frame=None, channel: int = 0) -> np.ndarray:
@@ -128,21 +134,31 @@ class ProcessedImagingExtractor(ImagingExtractor):
             end_frame = self._num_frames
         num_frames = end_frame - start_frame
 
-        video = np.zeros((num_frames, self._num_rows, self._num_columns))
-        i = 0
-        for r in np.arange(self._num_rows-1,-1,-1):
-            for c in np.arange(self._num_columns-1,-1,-1):
-                # "dff_blue" and "dff_uv" pixel matrix contains the pixel trace for only the non-zero elements of the
-                # mask (different pixel indexing)
-                if self._mask is not None and self._mask[r, c] != 0:
-                    video[:, r, c] = self._pixels_matrix[start_frame:end_frame, i]
-                    i += 1
-                elif self._mask is None:
-                    video[:, r, c] = self._pixels_matrix[start_frame:end_frame, i]
-                    i += 1
+        video = np.zeros((num_frames, self._num_rows, self._num_columns), dtype=self._dtype)
+        # "dff_blue" and "dff_uv" pixel matrix contains the pixel trace for only the non-zero elements of the
+        # mask (different pixel indexing)
+        video[:, self._pixel_rows, self._pixel_columns] = self._pixels_matrix[start_frame:end_frame]
 
         return video
 
+    def get_frame_mask(self) -> Optional[np.ndarray]:
+        """Return the frame mask of the pixels in the pixels matrix, None if the pixels matrix holds all the pixels."""
+        return self._mask
+
+    def get_masked_pixels(self, start_frame: Optional[int] = None, end_frame: Optional[int] = None) -> np.ndarray:
+        """Get the (frames, masked pixels) matrix, without rebuilding the frames.
+
+        The columns are the non-zero elements of the frame mask, in the order of `get_masked_pixel_coordinates`.
+
+        Parameters
+        ----------
+        start_frame: int, optional
+            Start frame index (inclusive).
+        end_frame: int, optional
+            End frame index (exclusive).
+        """
+        return self._pixels_matrix[start_frame:end_frame]
+
     def get_image_size(self) -> Tuple[int, int]:
         return (self._num_rows, self._num_columns)
 
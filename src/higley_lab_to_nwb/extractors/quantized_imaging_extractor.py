@@ -0,0 +1,94 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from roiextractors.extraction_tools import ArrayType, DtypeType
+from roiextractors.imagingextractor import ImagingExtractor
+
+
+def get_quantization_parameters(minimum: float, maximum: float, dtype: DtypeType = "int16") -> Tuple[float, float]:
+    """Return the (conversion, offset) mapping the [minimum, maximum] range on the range of an integer dtype.
+
+    The values are stored as `round((value - offset) / conversion)` and read back as `stored * conversion + offset`,
+    the NWB `conversion` and `offset` of a TimeSeries. The range is extended to contain zero and the offset is a
+    multiple of the conversion, so that zero is stored exactly. The maximum absolute error is `conversion / 2`.
+
+    Parameters
+    ----------
+    minimum: float
+        The minimum of the values to quantize.
+    maximum: float
+        The maximum of the values to quantize.
+    dtype: DtypeType, default: "int16"
+        The integer dtype of the stored values.
+    """
+    minimum, maximum = min(float(minimum), 0.0), max(float(maximum), 0.0)
+    dtype_info = np.iinfo(dtype)
+    # one level of margin on each side for the rounding of the offset
+    num_levels = int(dtype_info.max) - int(dtype_info.min) - 2
+    conversion = (maximum - minimum) / num_levels if maximum > minimum else 1.0
+    offset = float(np.round((maximum + minimum) / 2 / conversion) * conversion)
+    return conversion, offset
+
+
+def quantize(data: np.ndarray, conversion: float, offset: float, dtype: DtypeType = "int16") -> np.ndarray:
+    """Return the values of `data` stored with the NWB `conversion` and `offset` in an integer dtype."""
+    dtype_info = np.iinfo(dtype)
+    quantized = np.round((np.asarray(data, dtype="float64") - offset) / conversion)
+    return np.clip(quantized, dtype_info.min, dtype_info.max, out=quantized).astype(dtype)
+
+
+class QuantizedImagingExtractor(ImagingExtractor):
+    """Imaging extractor returning the frames of another imaging extractor quantized to an integer dtype."""
+
+    extractor_name = "QuantizedImagingExtractor"
+    is_writable = True
+
+    def __init__(
+        self, imaging_extractor: ImagingExtractor, conversion: float, offset: float, dtype: DtypeType = "int16"
+    ) -> None:
+        """Create a QuantizedImagingExtractor instance from an imaging extractor.
+
+        Parameters
+        ----------
+        imaging_extractor : ImagingExtractor
+            The imaging extractor of the values to quantize.
+        conversion : float
+            The NWB conversion factor, see `get_quantization_parameters`.
+        offset : float
+            The NWB offset, see `get_quantization_parameters`.
+        dtype : DtypeType, default: "int16"
+            The integer dtype of the quantized frames.
+        """
+        super().__init__()
+        self._parent_imaging = imaging_extractor
+        self.conversion = conversion
+        self.offset = offset
+        self._dtype = np.dtype(dtype)
+        if getattr(imaging_extractor, "_times", None) is not None:
+            self._times = imaging_extractor._times
+
+    def get_frames(self, frame_idxs: ArrayType, channel: Optional[int] = 0) -> np.ndarray:
+        frames = self._parent_imaging.get_frames(frame_idxs=frame_idxs, channel=channel)
+        return quantize(data=frames, conversion=self.conversion, offset=self.offset, dtype=self._dtype)
+
+    def get_video(self, start_frame: Optional[int] = None, end_frame: Optional[int] = None, channel: int = 0):
+        video = self._parent_imaging.get_video(start_frame=start_frame, end_frame=end_frame)
+        return quantize(data=video, conversion=self.conversion, offset=self.offset, dtype=self._dtype)
+
+    def get_image_size(self) -> Tuple[int, int]:
+        return self._parent_imaging.get_image_size()
+
+    def get_num_frames(self) -> int:
+        return self._parent_imaging.get_num_frames()
+
+    def get_sampling_frequency(self) -> float:
+        return self._parent_imaging.get_sampling_frequency()
+
+    def get_num_channels(self) -> int:
+        return self._parent_imaging.get_num_channels()
+
+    def get_channel_names(self) -> list:
+        return self._parent_imaging.get_channel_names()
+
+    def get_dtype(self) -> DtypeType:
+        return self._dtype
@@ -0,0 +1,146 @@
+"""Compressed sparse storage of ROI pixel masks.
+
+Classes
+-------
+SparsePixelMasks
+    CSR-style pixel masks of a set of ROIs with lazy construction of dense image masks.
+"""
+
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+
+class SparsePixelMasks:
+    """Compressed sparse row (CSR) storage of the pixel masks of a set of ROIs.
+
+    The pixels of all the ROIs are concatenated into flat `rows`, `columns` and `weights` arrays, while `indptr` holds
+    the offset of each ROI: the pixels of the i-th ROI are `rows[indptr[i]:indptr[i + 1]]`.
+    Dense image masks are only built on request and only for the selected ROIs. Indexing the object as
+    `masks[:, :, roi_index]` returns the dense image mask(s), so it can be used as a lazy `_image_masks` attribute
+    of a SegmentationExtractor.
+    """
+
+    def __init__(
+        self,
+        rows: np.ndarray,
+        columns: np.ndarray,
+        weights: np.ndarray,
+        indptr: np.ndarray,
+        image_size: Sequence[int],
+    ):
+        """Create a SparsePixelMasks object from its CSR components.
+
+        Parameters
+        ----------
+        rows: np.ndarray
+            The row index of each pixel, for all the ROIs.
+        columns: np.ndarray
+            The column index of each pixel, for all the ROIs.
+        weights: np.ndarray
+            The weight of each pixel, for all the ROIs.
+        indptr: np.ndarray
+            The offsets of the pixels of each ROI, of length number of ROIs + 1.
+        image_size: list
+            The frame dimension, [n_rows, n_cols].
+        """
+        self.rows = np.asarray(rows)
+        self.columns = np.asarray(columns)
+        self.weights = np.asarray(weights)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.image_size = tuple(int(size) for size in image_size)
+
+        assert len(self.rows) == len(self.columns) == len(self.weights) == self.indptr[-1], (
+            f"The number of pixels in 'rows' ({len(self.rows)}), 'columns' ({len(self.columns)}) and 'weights' "
+            f"({len(self.weights)}) must match the last offset in 'indptr' ({self.indptr[-1]})."
+        )
+
+    @classmethod
+    def from_coordinates(cls, coordinates: List[np.ndarray], image_size: Sequence[int]) -> "SparsePixelMasks":
+        """Create a SparsePixelMasks object with unit weights from a list of (number_of_pixels, 2) coordinates.
+
+        Parameters
+        ----------
+        coordinates: list
+            List of length number of ROIs, each element is an array of [row, column] pixel coordinates.
+        image_size: list
+            The frame dimension, [n_rows, n_cols].
+        """
+        coordinates = [np.asarray(roi_coordinates, dtype=np.int32).reshape(-1, 2) for roi_coordinates in coordinates]
+        indptr = np.zeros(len(coordinates) + 1, dtype=np.int64)
+        np.cumsum([len(roi_coordinates) for roi_coordinates in coordinates], out=indptr[1:])
+        if len(coordinates):
+            pixels = np.concatenate(coordinates)
+        else:
+            pixels = np.zeros((0, 2), dtype=np.int32)
+
+        return cls(
+            rows=pixels[:, 0],
+            columns=pixels[:, 1],
+            weights=np.ones(len(pixels)),
+            indptr=indptr,
+            image_size=image_size,
+        )
+
+    @property
+    def num_rois(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return (*self.image_size, self.num_rois)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.weights.dtype
+
+    def _get_roi_slice(self, roi_index: int) -> slice:
+        return slice(self.indptr[roi_index], self.indptr[roi_index + 1])
+
+    def get_pixel_mask(self, roi_index: int) -> np.ndarray:
+        """Return the (number_of_pixels, 3) pixel mask of a single ROI."""
+        roi_slice = self._get_roi_slice(roi_index)
+        return np.column_stack((self.rows[roi_slice], self.columns[roi_slice], self.weights[roi_slice]))
+
+    def get_pixel_masks(self, roi_indices: Sequence[int]) -> List[np.ndarray]:
+        """Return the pixel masks of the selected ROIs."""
+        return [self.get_pixel_mask(roi_index) for roi_index in roi_indices]
+
+    def get_image_masks(self, roi_indices: Sequence[int]) -> np.ndarray:
+        """Build the dense (n_rows, n_cols, len(roi_indices)) image masks of the selected ROIs only."""
+        image_masks = np.zeros((*self.image_size, len(roi_indices)), dtype=self.dtype)
+        for mask_index, roi_index in enumerate(roi_indices):
+            roi_slice = self._get_roi_slice(roi_index)
+            image_masks[self.rows[roi_slice], self.columns[roi_slice], mask_index] = self.weights[roi_slice]
+        return image_masks
+
+    def get_roi_locations(self, roi_indices: Sequence[int]) -> np.ndarray:
+        """Return the (2, len(roi_indices)) pixel location of the centroid of the selected ROIs.
+
+        The location is the median of the pixels with the highest weight, as in
+        SegmentationExtractor.get_roi_locations, computed without building the image masks.
+        """
+        roi_locations = np.zeros([2, len(roi_indices)], dtype="int")
+        for location_index, roi_index in enumerate(roi_indices):
+            roi_slice = self._get_roi_slice(roi_index)
+            weights = self.weights[roi_slice]
+            if not len(weights):
+                continue
+            max_weight_pixels = weights == np.amax(weights)
+            roi_locations[0, location_index] = np.median(self.rows[roi_slice][max_weight_pixels])
+            roi_locations[1, location_index] = np.median(self.columns[roi_slice][max_weight_pixels])
+        return roi_locations
+
+    def __getitem__(self, key: Union[tuple, int]) -> np.ndarray:
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (3 - len(key))
+        row_key, column_key, roi_key = key
+
+        if isinstance(roi_key, (int, np.integer)):
+            return self.get_image_masks(roi_indices=[int(roi_key)])[row_key, column_key, 0]
+        if isinstance(roi_key, slice):
+            roi_indices = range(*roi_key.indices(self.num_rois))
+        else:
+            roi_indices = np.asarray(roi_key).ravel()
+        return self.get_image_masks(roi_indices=roi_indices)[row_key, column_key, :]
@@ -0,0 +1,334 @@
+"""Base NWBConverter class of the sessions of the lab.
+
+The converters of the datasets only define their data interfaces, their metadata and the temporal alignment of their
+interfaces: the creation of the interfaces, the planning of the datasets, the pipelined write of the imaging data, the
+incremental conversion and the verification of the written NWB file are shared here.
+
+Classes
+-------
+HigleyLabNWBConverter
+    Base conversion class of the sessions, with the profiled, planned and pipelined conversion.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Literal, Optional
+
+from neuroconv import NWBConverter
+from neuroconv.datainterfaces.ophys.baseimagingextractorinterface import BaseImagingExtractorInterface
+from neuroconv.tools.nwb_helpers import make_or_load_nwbfile
+from pynwb import NWBFile
+
+from higley_lab_to_nwb.interfaces import BasePipelinedImagingExtractorInterface
+from higley_lab_to_nwb.tools import (
+    ConversionProfiler,
+    add_data_interfaces_to_nwbfile,
+    append_changed_interfaces,
+    configure_datasets,
+    use_zarr_data_io,
+    validate_data_io_overrides,
+    verify_nwbfile,
+    write_imaging_series_files,
+    write_imaging_series_in_parallel,
+)
+
+# the methods of the converter that are profiled, and the stage they are reported under
+_PROFILED_CONVERTER_METHODS = dict(
+    get_metadata="get_metadata",
+    temporally_align_data_interfaces="alignment",
+    run_conversion="run_conversion",
+    write_pending_imaging_data="write_pending_data",
+)
+
+
+class HigleyLabNWBConverter(NWBConverter):
+    """Base conversion class of the sessions, with the profiled, planned and pipelined conversion."""
+
+    def __init__(
+        self,
+        source_data: Dict[str, dict],
+        ophys_metadata: Dict[str, dict],
+        verbose: bool = True,
+        profile: bool = False,
+        plan_datasets: bool = True,
+        concurrent_preload: bool = True,
+        max_preload_workers: Optional[int] = None,
+        output_layout: Literal["single_file", "multi_file"] = "single_file",
+        max_series_writers: Optional[int] = None,
+        backend: Literal["hdf5", "zarr"] = "hdf5",
+        dataset_io_overrides: Optional[Dict[str, dict]] = None,
+        access_pattern_io_overrides: Optional[Dict[str, dict]] = None,
+    ):
+        """Create the data interfaces of a session.
+
+        Parameters
+        ----------
+        profile: bool, default: False
+            Whether to record the resources used by each interface in `self.profiler`, see ConversionProfiler.
+        plan_datasets: bool, default: True
+            Whether to chunk and compress each dataset for its expected read pattern, see `configure_datasets`.
+        concurrent_preload: bool, default: True
+            Whether to create the non-imaging interfaces and load their sources (see their `preload` method) on a
+            thread pool, while the imaging interfaces are created. The profiled stages of these interfaces overlap.
+        max_preload_workers: int, optional
+            The number of threads loading the non-imaging sources, by default one per interface.
+        output_layout: {"single_file", "multi_file"}, default: "single_file"
+            With "multi_file", the data of each imaging series added with `pipelined_write=True` is written to its own
+            HDF5 file next to the NWB file, by one process per series at the same time, and linked from the NWB file.
+            See `write_imaging_series_files`, and `consolidate_nwbfile` to merge the files afterwards.
+        max_series_writers: int, optional
+            The number of imaging series written at the same time with the "multi_file" layout or the Zarr backend,
+            by default all.
+        backend: {"hdf5", "zarr"}, default: "hdf5"
+            The backend of the NWB file. A Zarr NWB file is a folder with one file per chunk, with consolidated
+            metadata: the imaging series added with `pipelined_write=True` are written in place by parallel
+            processes, so the "multi_file" layout doesn't apply.
+        dataset_io_overrides: dict, optional
+            The H5DataIO or ZarrDataIO arguments (chunks, compression) replacing the planned ones of some datasets,
+            by location, see `configure_datasets`.
+        access_pattern_io_overrides: dict, optional
+            The H5DataIO or ZarrDataIO arguments replacing the planned ones of the datasets of an access pattern
+            ("frames", "tiles" or "traces"), e.g. the codecs chosen by the codec benchmark with
+            `load_codec_choices`, see `configure_datasets`.
+        """
+        if backend == "zarr" and output_layout == "multi_file":
+            raise ValueError("The 'multi_file' output layout is only available with the 'hdf5' backend.")
+        validate_data_io_overrides(
+            backend=backend,
+            dataset_io_overrides=dataset_io_overrides,
+            access_pattern_io_overrides=access_pattern_io_overrides,
+        )
+        # the interfaces are created below, concurrently and through the profiler, instead of one after the other
+        super().__init__(source_data=dict(), verbose=False)
+        self.verbose = verbose
+        self.profiler = ConversionProfiler() if profile else None
+        self.plan_datasets = plan_datasets
+        self.concurrent_preload = concurrent_preload
+        self.max_preload_workers = max_preload_workers
+        self.output_layout = output_layout
+        self.max_series_writers = max_series_writers
+        self.backend = backend
+        self.dataset_io_overrides = dataset_io_overrides
+        self.access_pattern_io_overrides = access_pattern_io_overrides
+        self._is_aligned = False
+        self._validate_source_data(source_data=source_data, verbose=self.verbose)
+        self._create_data_interfaces(source_data=source_data)
+        self.ophys_metadata = ophys_metadata
+
+    def _create_data_interface(self, name: str, source_data: dict, preload: bool = False):
+        """Create a data interface, through the profiler when the conversion is profiled, and load its sources."""
+        data_interface_class = self.data_interface_classes[name]
+        if self.profiler is None:
+            data_interface = data_interface_class(**source_data)
+        else:
+            data_interface = self.profiler.create_data_interface(
+                interface_name=name, data_interface_class=data_interface_class, source_data=source_data
+            )
+        if preload and hasattr(data_interface, "preload"):
+            data_interface.preload()
+        return data_interface
+
+    def _create_data_interfaces(self, source_data: Dict[str, dict]) -> None:
+        """Create the data interfaces, the non-imaging ones on a thread pool when `concurrent_preload` is set."""
+        names = [name for name in self.data_interface_classes if name in source_data]
+        preloaded_names = [
+            name
+            for name in names
+            if self.concurrent_preload
+            and not issubclass(self.data_interface_classes[name], BaseImagingExtractorInterface)
+        ]
+        data_interface_objects = dict()
+        with ThreadPoolExecutor(max_workers=self.max_preload_workers or max(1, len(preloaded_names))) as executor:
+            futures = {
+                name: executor.submit(self._create_data_interface, name, source_data[name], True)
+                for name in preloaded_names
+            }
+            for name in names:
+                if name not in futures:
+                    data_interface_objects[name] = self._create_data_interface(name, source_data[name])
+        data_interface_objects.update({name: future.result() for name, future in futures.items()})
+        self.data_interface_objects = {name: data_interface_objects[name] for name in names}
+        if self.profiler is not None:
+            self.profiler.instrument(name=type(self).__name__, obj=self, method_to_stage=_PROFILED_CONVERTER_METHODS)
+
+    def run_conversion(  # until [Issue #908](https://github.com/catalystneuro/neuroconv/issues/908) is fixed
+        self,
+        nwbfile_path: Optional[str] = None,
+        nwbfile: Optional[NWBFile] = None,
+        metadata: Optional[dict] = None,
+        overwrite: bool = False,
+        conversion_options: Optional[dict] = None,
+    ) -> None:
+        """Write the data interfaces to the NWB file, then the imaging data deferred by the pipelined interfaces.
+
+        The datasets are configured by `add_to_nwbfile` for the backend of the converter, instead of the default
+        backend configuration of neuroconv.
+        """
+        if metadata is None:
+            metadata = self.get_metadata()
+
+        self.validate_metadata(metadata=metadata)
+
+        self.validate_conversion_options(conversion_options=conversion_options)
+
+        self.align_data_interfaces()
+
+        with make_or_load_nwbfile(
+            nwbfile_path=nwbfile_path,
+            nwbfile=nwbfile,
+            metadata=metadata,
+            overwrite=overwrite,
+            backend=self.backend,
+            verbose=self.verbose,
+        ) as nwbfile_out:
+            self.add_to_nwbfile(nwbfile_out, metadata, conversion_options)
+
+        self.write_pending_imaging_data(nwbfile_path=nwbfile_path)
+
+    def align_data_interfaces(self) -> None:
+        """Align the data interfaces with `temporally_align_data_interfaces`, unless they are already aligned.
+
+        The alignment shifts the times of the interfaces from their current ones, so it is only done once for the
+        conversion, the incremental conversion and the verification with the same converter.
+        """
+        if self._is_aligned:
+            return
+        self.temporally_align_data_interfaces()
+        self._is_aligned = True
+
+    def add_to_nwbfile(
+        self,
+        nwbfile: NWBFile,
+        metadata,
+        conversion_options: Optional[dict] = None,
+        interface_names: Optional[List[str]] = None,
+        conversion_record: Optional[dict] = None,
+        add_conversion_record: bool = True,
+    ) -> dict:
+        """Add the data interfaces to the NWB file and record the objects of each, see `add_data_interfaces_to_nwbfile`.
+
+        Parameters
+        ----------
+        interface_names: list of str, optional
+            The interfaces to add, by default all of them.
+        conversion_record: dict, optional
+            The record of the interfaces already in the NWB file, when it was read in append mode.
+        add_conversion_record: bool, default: True
+            Whether to add the record to the NWB file, the incremental conversion updates the record of the file itself.
+
+        Returns
+        -------
+        conversion_record: dict
+            The hash of the sources and the object IDs of each interface of the NWB file.
+        """
+        interface_names = interface_names or list(self.data_interface_objects)
+        conversion_record = add_data_interfaces_to_nwbfile(
+            nwbfile=nwbfile,
+            metadata=metadata,
+            data_interface_objects={name: self.data_interface_objects[name] for name in interface_names},
+            conversion_options=conversion_options,
+            conversion_record=conversion_record,
+            add_conversion_record=add_conversion_record,
+        )
+        if self.plan_datasets:
+            configure_datasets(
+                nwbfile=nwbfile,
+                backend=self.backend,
+                dataset_io_overrides=self.dataset_io_overrides,
+                access_pattern_io_overrides=self.access_pattern_io_overrides,
+            )
+        elif self.backend == "zarr":
+            use_zarr_data_io(nwbfile=nwbfile)
+        return conversion_record
+
+    def append_changed_interfaces(
+        self,
+        nwbfile_path: str,
+        metadata: Optional[dict] = None,
+        conversion_options: Optional[dict] = None,
+        interface_names: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Add or replace, in an existing NWB file, the interfaces whose sources changed.
+
+        Only the interfaces whose sources or conversion options changed since the NWB file was written are added
+        again, e.g. the dF/F or the segmentation after a new processing, the raw imaging is not rewritten.
+        See `higley_lab_to_nwb.tools.append_changed_interfaces`.
+
+        Returns
+        -------
+        interface_names: list of str
+            The names of the interfaces added or replaced.
+        """
+        if self.backend != "hdf5":
+            raise ValueError("The interfaces can only be added or replaced in an existing HDF5 NWB file.")
+        return append_changed_interfaces(
+            converter=self,
+            nwbfile_path=nwbfile_path,
+            metadata=metadata,
+            conversion_options=conversion_options,
+            interface_names=interface_names,
+        )
+
+    def verify_conversion(
+        self,
+        nwbfile_path: str,
+        metadata: Optional[dict] = None,
+        conversion_options: Optional[dict] = None,
+        sample_fraction: float = 0.01,
+        max_workers: Optional[int] = None,
+        raise_on_mismatch: bool = True,
+    ) -> List[dict]:
+        """Compare a random sample of the chunks of the series of the written NWB file with the sources.
+
+        See `higley_lab_to_nwb.tools.verify_nwbfile`.
+
+        Returns
+        -------
+        records: list of dict
+            The verification of each dataset of the series of the interfaces.
+        """
+        return verify_nwbfile(
+            converter=self,
+            nwbfile_path=nwbfile_path,
+            metadata=metadata,
+            conversion_options=conversion_options,
+            sample_fraction=sample_fraction,
+            max_workers=max_workers,
+            raise_on_mismatch=raise_on_mismatch,
+        )
+
+    def write_pending_imaging_data(self, nwbfile_path: Optional[str] = None) -> None:
+        """Write the imaging data deferred by the interfaces added with `pipelined_write=True`.
+
+        With the "multi_file" output layout, the data of each interface is written to its own series file, and with the
+        Zarr backend in place, all the series at the same time. Otherwise the data is written in the NWB file one
+        interface after the other.
+        """
+        pending_interfaces = dict()
+        for interface_name, data_interface in self.data_interface_objects.items():
+            if not isinstance(data_interface, BasePipelinedImagingExtractorInterface):
+                continue
+            if getattr(data_interface, "_pending_pipelined_write", None) is None:
+                continue
+            if nwbfile_path is None:
+                raise ValueError(f"'nwbfile_path' must be specified to write the imaging data of '{interface_name}'.")
+            pending_interfaces[interface_name] = data_interface
+
+        if (self.output_layout == "multi_file" or self.backend == "zarr") and pending_interfaces:
+            write_series = write_imaging_series_in_parallel if self.backend == "zarr" else write_imaging_series_files
+            write_series(
+                nwbfile_path=nwbfile_path,
+                pending_writes={
+                    interface_name: data_interface._pending_pipelined_write
+                    for interface_name, data_interface in pending_interfaces.items()
+                },
+                max_workers=self.max_series_writers,
+                verbose=self.verbose,
+            )
+            for data_interface in pending_interfaces.values():
+                data_interface._pending_pipelined_write = None
+            return
+
+        for interface_name, data_interface in pending_interfaces.items():
+            if self.verbose:
+                print(f"Writing the imaging data of '{interface_name}' with the pipelined engine")
+            data_interface.write_pending_data(nwbfile_path=nwbfile_path, backend=self.backend)
@@ -1,11 +1,38 @@
-from .spike2signals_interface import Spike2SignalsInterface
-from .external_stimuli_interface import ExternalStimuliInterface
-from .cidansegmentation_interface import CidanSegmentationInterface
-from .mesoscopic_imaging_interface import (
-    MesoscopicImagingMultiTiffStackInterface,
-    MesoscopicImagingMultiTiffSingleFrameInterface,
+"""The data interfaces, imported on first access so that importing the package doesn't import their dependencies."""
+
+from typing import TYPE_CHECKING
+
+from ..lazy_imports import attach_lazy_imports
+
+# the public names of the package and the module defining them, imported on first access
+_NAME_TO_MODULE = dict(
+    Spike2SignalsInterface=".spike2signals_interface",
+    ExternalStimuliInterface=".external_stimuli_interface",
+    BasePipelinedImagingExtractorInterface=".pipelined_imaging_interface",
+    CidanSegmentationInterface=".cidansegmentation_interface",
+    MesoscopicImagingMultiTiffStackInterface=".mesoscopic_imaging_interface",
+    MesoscopicImagingMultiTiffSingleFrameInterface=".mesoscopic_imaging_interface",
+    ProcessedImagingInterface=".processing_imaging_interface",
+    ParcellsSegmentationInterface=".parcells_segmentation_interface",
+    ProcessedBehaviorInterface=".processed_behavior_interface",
+    FacemapInterface=".facemapdatainterface",
+    FacemapPythonInterface=".facemapdatainterface",
 )
-from .processing_imaging_interface import ProcessedImagingInterface
-from .parcells_segmentation_interface import ParcellsSegmentationInterface
-from .processed_behavior_interface import ProcessedBehaviorInterface
-from .facemapdatainterface import FacemapInterface, FacemapPythonInterface
+__all__ = list(_NAME_TO_MODULE)
+
+__getattr__, __dir__ = attach_lazy_imports(package_name=__name__, name_to_module=_NAME_TO_MODULE)
+
+
+if TYPE_CHECKING:
+    from .spike2signals_interface import Spike2SignalsInterface
+    from .external_stimuli_interface import ExternalStimuliInterface
+    from .pipelined_imaging_interface import BasePipelinedImagingExtractorInterface
+    from .cidansegmentation_interface import CidanSegmentationInterface
+    from .mesoscopic_imaging_interface import (
+        MesoscopicImagingMultiTiffStackInterface,
+        MesoscopicImagingMultiTiffSingleFrameInterface,
+    )
+    from .processing_imaging_interface import ProcessedImagingInterface
+    from .parcells_segmentation_interface import ParcellsSegmentationInterface
+    from .processed_behavior_interface import ProcessedBehaviorInterface
+    from .facemapdatainterface import FacemapInterface, FacemapPythonInterface
@@ -51,8 +51,17 @@ class ExternalStimuliInterface(BaseDataInterface):
             stop_times=stop_times,
             verbose=verbose,
         )
+        # the table of the stimulus features loaded by `preload`
+        self._stimulus_features = None
+
+    def preload(self) -> None:
+        """Read the stimulus features of the CSV file once, instead of once per feature when writing."""
+        if self.source_data["csv_file_path"] is not None:
+            self._stimulus_features = pd.read_csv(self.source_data["csv_file_path"])
 
     def get_stimulus_feature(self, column_index):
+        if self._stimulus_features is not None:
+            return self._stimulus_features.iloc[:, column_index].to_numpy()
         feature = pd.read_csv(self.source_data["csv_file_path"], usecols=column_index)
         return feature.to_numpy()
 
@@ -1,36 +1,56 @@
-import subprocess
-import sys
 from typing import Literal, Optional
 
 import h5py
-import scipy.io
 import numpy as np
 from pynwb.base import TimeSeries
 from pynwb.behavior import EyeTracking, PupilTracking, SpatialSeries
 from pynwb.core import DynamicTableRegion
 from pynwb.file import NWBFile
 
+from neuroconv.utils.checks import calculate_regular_series_rate
 from neuroconv.utils.dict import DeepDict
 
 from neuroconv import BaseTemporalAlignmentInterface
-from neuroconv.tools import get_module
+from neuroconv.tools import get_module, get_package
 from neuroconv.utils import FilePathType, get_base_schema, get_schema_from_hdmf_class
-from neuroconv.datainterfaces.behavior.video.video_utils import get_video_timestamps
 
 
-def install_package(package):
-    subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+def _get_ndx_facemap_motionsvd():
+    """Import ndx_facemap_motionsvd, with the installation instructions if it is missing."""
+    # TODO: to be change when ndx-facemap-motionsvd version on pip
+    return get_package(
+        package_name="ndx_facemap_motionsvd",
+        installation_instructions="pip install git+https://github.com/catalystneuro/ndx-facemap-motionsvd.git@main",
+    )
 
 
-try:
-    from ndx_facemap_motionsvd import MotionSVDMasks, MotionSVDSeries
-except ImportError:
-    # TODO: to be change when ndx-facemap-motionsvd version on pip
-    install_package("git+https://github.com/catalystneuro/ndx-facemap-motionsvd.git@main")
-    from ndx_facemap_motionsvd import MotionSVDMasks, MotionSVDSeries
+class _SharedTimingMixin:
+    """Write the timing of all the series of an interface once.
+
+    Regular timestamps are written as `starting_time` and `rate`. Irregular timestamps are written with the first
+    series and linked by the following ones.
+    """
+
+    _timing_kwargs = None
+
+    def _get_timing_kwargs(self) -> dict:
+        """Return the timing arguments of the next TimeSeries added to the NWB file."""
+        if self._timing_kwargs is None:
+            timestamps = np.asarray(self.get_timestamps(), dtype="float64")
+            rate = calculate_regular_series_rate(series=timestamps)
+            if rate is not None:
+                self._timing_kwargs = dict(starting_time=float(timestamps[0]), rate=float(rate))
+            else:
+                self._timing_kwargs = dict(timestamps=timestamps)
+        return self._timing_kwargs
+
+    def _share_timestamps(self, time_series: TimeSeries) -> None:
+        """Make the following series link to the timestamps written with `time_series`."""
+        if isinstance(self._timing_kwargs.get("timestamps"), np.ndarray):
+            self._timing_kwargs = dict(timestamps=time_series)
 
 
-class FacemapInterface(BaseTemporalAlignmentInterface):
+class FacemapInterface(_SharedTimingMixin, BaseTemporalAlignmentInterface):
     display_name = "Facemap"
     help = "Interface for Facemap output generated with the Matlab implementation of Facemap software."
 
@@ -60,6 +80,10 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
         verbose : bool, default: True
             Allows verbose.
         """
+        import scipy.io
+
+        _get_ndx_facemap_motionsvd()
+
         super().__init__(mat_file_path=mat_file_path, video_file_path=video_file_path, verbose=verbose)
         self.first_n_components = first_n_components
         self.original_timestamps = None
@@ -71,9 +95,9 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
             with h5py.File(mat_file_path, "r") as file:
                 print("Facemap output opened successfully with h5py")
                 self.older_matlab_version = False
-                nframes = file["proc"]["nframes"][0, 0]
+                nframes = int(file["proc"]["nframes"][0, 0])
                 # TODO remove this line of code once we have the actual timestamps from the original video
-                self.original_timestamps = list(range(nframes))
+                self.original_timestamps = np.arange(nframes, dtype="float64")
         except OSError as e:
             print(f"Failed to open file with h5py: {e}")
             # Check if the file is an older MATLAB .mat file
@@ -82,7 +106,7 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
                 self._mat_data = scipy.io.loadmat(mat_file_path)
                 self.older_matlab_version = True
                 # TODO remove this line of code once we have the actual timestamps from the original video
-                self.original_timestamps = list(range(self._mat_data["nframes"]))
+                self.original_timestamps = np.arange(int(np.squeeze(self._mat_data["nframes"])), dtype="float64")
             except NotImplementedError:
                 print("The .mat file is not in HDF5 format")
             except Exception as e:
@@ -150,9 +174,6 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
 
     def add_eye_tracking(self, nwbfile: NWBFile, metadata: DeepDict):
 
-        if self.timestamps is None:
-            self.timestamps = self.get_timestamps()
-
         if self.older_matlab_version:
             try:
                 data = self._mat_data["proc"]["pupil"][0, 0]["com"][0, 0]
@@ -176,7 +197,7 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
             data=data,
             reference_frame=eye_tracking_metadata["reference_frame"],
             unit=eye_tracking_metadata["unit"],
-            timestamps=self.timestamps,
+            **self._get_timing_kwargs(),
         )
 
         if "EyeTracking" not in behavior_module.data_interfaces:
@@ -186,14 +207,12 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
             eye_tracking = behavior_module.data_interfaces["EyeTracking"]
 
         eye_tracking.add_spatial_series(eye_com)
+        self._share_timestamps(eye_com)
 
     def add_pupil_data(
         self, nwbfile: NWBFile, metadata: DeepDict, pupil_trace_type: Literal["area_raw", "area"] = "area"
     ):
 
-        if self.timestamps is None:
-            self.timestamps = self.get_timestamps()
-
         if self.older_matlab_version:
             try:
                 data = self._mat_data["proc"]["pupil"][0, 0][pupil_trace_type][0, 0]
@@ -218,7 +237,7 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
             description=pupil_area_metadata["description"],
             data=data,
             unit=pupil_area_metadata["unit"],
-            timestamps=self.timestamps,
+            **self._get_timing_kwargs(),
         )
 
         if "PupilTracking" not in behavior_module.data_interfaces:
@@ -228,6 +247,7 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
             pupil_tracking = behavior_module.data_interfaces["PupilTracking"]
 
         pupil_tracking.add_timeseries(pupil_trace)
+        self._share_timestamps(pupil_trace)
 
     def add_face_motion_SVD(self, nwbfile: NWBFile, metadata: DeepDict):
         """
@@ -243,8 +263,7 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
         # motSVD: cell array of motion SVDs [time x components] (in order: face, ROI1, ROI2, ROI3)
         # uMotMask: cell array of motion masks [pixels x components]  (in order: face, ROI1, ROI2, ROI3)
         # motion masks of face are reported as 2D-arrays npixels x
-        if self.timestamps is None:
-            self.timestamps = self.get_timestamps()
+        from ndx_facemap_motionsvd import MotionSVDMasks, MotionSVDSeries
 
         motion_mask_name = metadata["Behavior"]["MotionSVDMasks"]["name"]
         motion_mask_description = metadata["Behavior"]["MotionSVDMasks"]["description"]
@@ -322,10 +341,11 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
             data=data[:, : self.first_n_components],
             motion_masks=motion_masks,
             unit="unknown",
-            timestamps=self.timestamps,
+            **self._get_timing_kwargs(),
         )
         behavior_module.add(motion_masks_table)
         behavior_module.add(motion_series)
+        self._share_timestamps(motion_series)
 
         return
 
@@ -344,8 +364,7 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
         # uMotMask: cell array of motion masks [pixels x components]  (in order: face, ROI1, ROI2, ROI3)
         # ROIs motion masks are reported as 3D-arrays x_pixels x y_pixels x components
 
-        if self.timestamps is None:
-            self.timestamps = self.get_timestamps()
+        from ndx_facemap_motionsvd import MotionSVDMasks, MotionSVDSeries
 
         motion_mask_name = metadata["Behavior"]["MotionSVDMasks"]["name"]
         motion_mask_description = metadata["Behavior"]["MotionSVDMasks"]["description"]
@@ -424,15 +443,18 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
             data=data[:, : self.first_n_components],
             motion_masks=motion_masks,
             unit="unknown",
-            timestamps=self.timestamps,
+            **self._get_timing_kwargs(),
         )
 
         behavior_module.add(motion_masks_table)
         behavior_module.add(motion_series)
+        self._share_timestamps(motion_series)
 
         return
 
     def get_original_timestamps(self) -> np.ndarray:
+        from neuroconv.datainterfaces.behavior.video.video_utils import get_video_timestamps
+
         if self.original_timestamps is None:
             self.original_timestamps = get_video_timestamps(self.source_data["video_file_path"])
         return self.original_timestamps
@@ -445,6 +467,7 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
 
     def set_aligned_timestamps(self, aligned_timestamps: np.ndarray) -> None:
         self.timestamps = aligned_timestamps
+        self._timing_kwargs = None
 
     def _get_downsamplig_factor(self) -> float:
         if self.older_matlab_version:
@@ -488,6 +511,8 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
         """
         if metadata is None:
             metadata = self.get_metadata()
+        # the timing is written once per NWB file, by the first series
+        self._timing_kwargs = None
 
         self.add_eye_tracking(nwbfile=nwbfile, metadata=metadata)
         self.add_pupil_data(nwbfile=nwbfile, metadata=metadata, pupil_trace_type="area_raw")
@@ -499,7 +524,7 @@ class FacemapInterface(BaseTemporalAlignmentInterface):
                 self.add_motion_SVD(nwbfile=nwbfile, metadata=metadata, ROI_index=mask_index + 1, ROI_name=mask_name)
 
 
-class FacemapPythonInterface(BaseTemporalAlignmentInterface):
+class FacemapPythonInterface(_SharedTimingMixin, BaseTemporalAlignmentInterface):
     display_name = "FacemapPython"
     help = "Interface for Facemap output generated with the Python implementation of Facemap software."  # TODO check with the point person
 
@@ -529,6 +554,10 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
         verbose : bool, default: True
             Allows verbose.
         """
+        import scipy.io
+
+        _get_ndx_facemap_motionsvd()
+
         super().__init__(mat_file_path=mat_file_path, video_file_path=video_file_path, verbose=verbose)
         self.first_n_components = first_n_components
         self.original_timestamps = None
@@ -538,7 +567,7 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
         try:
             face_motion = scipy.io.loadmat(mat_file_path, variable_names=["motion_0"])
             # TODO remove this line of code once we have the actual timestamps from the original video
-            self.original_timestamps = list(range(face_motion["motion_0"].shape[1]))
+            self.original_timestamps = np.arange(face_motion["motion_0"].shape[1], dtype="float64")
         except NotImplementedError:
             print("The .mat file is not in HDF5 format")
         except Exception as e:
@@ -614,8 +643,7 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
         self, nwbfile: NWBFile, metadata: DeepDict, eye_tracking_trace_type: Literal["com_smooth", "com"] = "com"
     ):
 
-        if self.timestamps is None:
-            self.timestamps = self.get_timestamps()
+        import scipy.io
 
         pupil_data = scipy.io.loadmat(self.source_data["mat_file_path"], variable_names=["pupil"])
         if pupil_data["pupil"].size == 0:
@@ -634,7 +662,7 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
             data=data,
             reference_frame=eye_tracking_metadata["reference_frame"],
             unit=eye_tracking_metadata["unit"],
-            timestamps=self.timestamps,
+            **self._get_timing_kwargs(),
         )
         if "EyeTracking" not in behavior_module.data_interfaces:
             eye_tracking = EyeTracking(name="EyeTracking")
@@ -643,12 +671,13 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
             eye_tracking = behavior_module.data_interfaces["EyeTracking"]
 
         eye_tracking.add_spatial_series(eye_com)
+        self._share_timestamps(eye_com)
 
     def add_pupil_data(
         self, nwbfile: NWBFile, metadata: DeepDict, pupil_trace_type: Literal["area_smooth", "area"] = "area"
     ):
-        if self.timestamps is None:
-            self.timestamps = self.get_timestamps()
+        import scipy.io
+
         pupil_data = scipy.io.loadmat(self.source_data["mat_file_path"], variable_names=["pupil"])
         if pupil_data["pupil"].size == 0:
             print(f"No pupil area data available in {self.source_data['mat_file_path']}")
@@ -665,7 +694,7 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
             description=pupil_area_metadata["description"],
             data=data,
             unit=pupil_area_metadata["unit"],
-            timestamps=self.timestamps,
+            **self._get_timing_kwargs(),
         )
 
         if "PupilTracking" not in behavior_module.data_interfaces:
@@ -675,6 +704,7 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
             pupil_tracking = behavior_module.data_interfaces["PupilTracking"]
 
         pupil_tracking.add_timeseries(pupil_trace)
+        self._share_timestamps(pupil_trace)
 
     def add_motion_SVD(self, nwbfile: NWBFile, metadata: DeepDict, mask_index: int = 0, mask_name: str = "Face"):
         """
@@ -690,8 +720,8 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
         # motSVD: cell array of motion SVDs [time x components] (in order: face, ROI1, ROI2, ROI3)
         # uMotMask: cell array of motion masks [pixels x components]  (in order: face, ROI1, ROI2, ROI3)
         # motion masks of face are reported as 2D-arrays npixels x
-        if self.timestamps is None:
-            self.timestamps = self.get_timestamps()
+        import scipy.io
+        from ndx_facemap_motionsvd import MotionSVDMasks, MotionSVDSeries
 
         motion_mask_name = metadata["Behavior"]["MotionSVDMasks"]["name"]
         motion_mask_description = metadata["Behavior"]["MotionSVDMasks"]["description"]
@@ -739,14 +769,17 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
             data=face_motion_series[:, : self.first_n_components],
             motion_masks=motion_masks,
             unit="unknown",
-            timestamps=self.timestamps,
+            **self._get_timing_kwargs(),
         )
         behavior_module.add(motion_masks_table)
         behavior_module.add(motion_series)
+        self._share_timestamps(motion_series)
 
         return
 
     def get_original_timestamps(self) -> np.ndarray:
+        from neuroconv.datainterfaces.behavior.video.video_utils import get_video_timestamps
+
         if self.original_timestamps is None:
             self.original_timestamps = get_video_timestamps(self.source_data["video_file_path"])
         return self.original_timestamps
@@ -759,12 +792,17 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
 
     def set_aligned_timestamps(self, aligned_timestamps: np.ndarray) -> None:
         self.timestamps = aligned_timestamps
+        self._timing_kwargs = None
 
     def _get_downsamplig_factor(self) -> float:
+        import scipy.io
+
         downsamplig_factor = scipy.io.loadmat(self.source_data["mat_file_path"], variable_names=["sbin"])
         return float(downsamplig_factor["sbin"][0, 0])
 
     def _get_processed_frame_dimension(self) -> np.ndarray:
+        import scipy.io
+
         frame_dimension = scipy.io.loadmat(self.source_data["mat_file_path"], variable_names=["LXbin", "LYbin"])
         return [frame_dimension["LXbin"][0, 0], frame_dimension["LYbin"][0, 0]]
 
@@ -791,6 +829,8 @@ class FacemapPythonInterface(BaseTemporalAlignmentInterface):
         """
         if metadata is None:
             metadata = self.get_metadata()
+        # the timing is written once per NWB file, by the first series
+        self._timing_kwargs = None
         self.add_eye_tracking(nwbfile=nwbfile, metadata=metadata, eye_tracking_trace_type="com")
         self.add_pupil_data(nwbfile=nwbfile, metadata=metadata, pupil_trace_type="area")
         self.add_eye_tracking(nwbfile=nwbfile, metadata=metadata, eye_tracking_trace_type="com_smooth")
@@ -1,11 +1,11 @@
-from neuroconv.datainterfaces.ophys.baseimagingextractorinterface import BaseImagingExtractorInterface
 from neuroconv.utils import FolderPathType
 from neuroconv.utils.dict import DeepDict
 from typing import Literal
 from ..extractors import MesoscopicImagingMultiTiffStackExtractor, MesoscopicImagingMultiTiffSingleFrameExtractor
+from .pipelined_imaging_interface import BasePipelinedImagingExtractorInterface
 
 
-class MesoscopicImagingMultiTiffStackInterface(BaseImagingExtractorInterface):
+class MesoscopicImagingMultiTiffStackInterface(BasePipelinedImagingExtractorInterface):
     """
     Data Interface for writing mesoscopic imaging data using MesoscopicImagingMultiTiffStackExtractor.
     """
@@ -48,7 +48,7 @@ class MesoscopicImagingMultiTiffStackInterface(BaseImagingExtractorInterface):
         )
 
 
-class MesoscopicImagingMultiTiffSingleFrameInterface(BaseImagingExtractorInterface):
+class MesoscopicImagingMultiTiffSingleFrameInterface(BasePipelinedImagingExtractorInterface):
     """
     Data Interface for writing mesoscopic imaging data using MesoscopicImagingMultiTiffSingleFrameExtractor.
     """
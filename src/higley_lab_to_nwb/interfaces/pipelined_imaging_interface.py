@@ -0,0 +1,172 @@
+from typing import Literal, Optional
+
+from hdmf.backends.hdf5 import H5DataIO
+from neuroconv.datainterfaces.ophys.baseimagingextractorinterface import BaseImagingExtractorInterface
+from neuroconv.utils import FilePathType
+from pynwb import NWBFile
+
+from ..tools.binned_imaging_series import BinnedSeriesWriter, add_deferred_binned_series
+from ..tools.pipelined_imaging_write import (
+    DeferredDataChunkIterator,
+    open_nwbfile_datasets,
+    write_imaging_data_pipelined,
+)
+from ..tools.summary_images import SummaryImageAccumulator, add_deferred_summary_images, write_summary_images
+
+
+class BasePipelinedImagingExtractorInterface(BaseImagingExtractorInterface):
+    """
+    Base Data Interface for imaging data that can be written with a pipelined read/compress/write engine.
+
+    With `pipelined_write=True`, `add_to_nwbfile` adds the photon series with an empty dataset and the data is written
+    by `write_pending_data` once the NWB file is closed, see `higley_lab_to_nwb.tools.write_imaging_data_pipelined`.
+    The summary images of the series can be accumulated from the frames read by this write, see
+    `higley_lab_to_nwb.tools.summary_images`, and a spatially binned and temporally decimated copy of the series
+    written by it, see `higley_lab_to_nwb.tools.binned_imaging_series`.
+    """
+
+    def add_to_nwbfile(
+        self,
+        nwbfile: NWBFile,
+        metadata: Optional[dict] = None,
+        photon_series_type: Literal["TwoPhotonSeries", "OnePhotonSeries"] = "TwoPhotonSeries",
+        photon_series_index: int = 0,
+        parent_container: Literal["acquisition", "processing/ophys"] = "acquisition",
+        stub_test: bool = False,
+        stub_frames: int = 100,
+        pipelined_write: bool = False,
+        pipeline_options: Optional[dict] = None,
+        add_summary_images: bool = False,
+        add_binned_series: bool = False,
+        spatial_binning: int = 4,
+        temporal_decimation: int = 1,
+    ):
+        """Add the photon series to the NWB file.
+
+        Parameters
+        ----------
+        pipelined_write: bool, default: False
+            Whether to defer the writing of the data to `write_pending_data`, called by the converter after the
+            NWB file is written.
+        pipeline_options: dict, optional
+            The options of `write_imaging_data_pipelined`, e.g. `num_reader_threads` or `num_compressor_workers`, or
+            `reader_mode="processes"` to decode the TIFF files in worker processes.
+        add_summary_images: bool, default: False
+            Whether to add the mean, maximum, standard deviation and correlation images of the series to the
+            "SummaryImages" of the ophys processing module, computed from the frames read by the pipelined write.
+            Requires `pipelined_write=True`.
+        add_binned_series: bool, default: False
+            Whether to add a copy of the series averaged over bins of `spatial_binning` x `spatial_binning` pixels and
+            `temporal_decimation` frames to the ophys processing module, written by the pipelined write.
+            Requires `pipelined_write=True`.
+        spatial_binning: int, default: 4
+            The side of the square bins of pixels of the binned series, in pixels.
+        temporal_decimation: int, default: 1
+            The number of consecutive frames averaged together in the binned series.
+        """
+        if add_summary_images and not pipelined_write:
+            raise ValueError("The summary images are computed during the pipelined write, set 'pipelined_write=True'.")
+        if add_binned_series and not pipelined_write:
+            raise ValueError("The binned series is written during the pipelined write, set 'pipelined_write=True'.")
+        metadata = metadata or self.get_metadata()
+        super().add_to_nwbfile(
+            nwbfile=nwbfile,
+            metadata=metadata,
+            photon_series_type=photon_series_type,
+            photon_series_index=photon_series_index,
+            parent_container=parent_container,
+            stub_test=stub_test,
+            stub_frames=stub_frames,
+        )
+        if not pipelined_write:
+            return
+
+        photon_series_name = metadata["Ophys"][photon_series_type][photon_series_index]["name"]
+        if parent_container == "acquisition":
+            photon_series = nwbfile.acquisition[photon_series_name]
+        else:
+            photon_series = nwbfile.processing["ophys"][photon_series_name]
+
+        # replace the data iterator, keeping the chunking and compression chosen for the photon series
+        data_io = photon_series.data
+        data_iterator = data_io.data
+        deferred_iterator = DeferredDataChunkIterator(
+            maxshape=data_iterator.maxshape,
+            dtype=data_iterator.dtype,
+            chunk_shape=data_iterator.recommended_chunk_shape(),
+        )
+        photon_series.fields["data"] = H5DataIO(data=deferred_iterator, **data_io.io_settings)
+
+        summary_image_paths = None
+        if add_summary_images:
+            summary_image_paths = add_deferred_summary_images(
+                nwbfile=nwbfile,
+                photon_series_name=photon_series_name,
+                frame_shape=data_iterator.maxshape[1:3],
+                dtype=data_iterator.dtype,
+                conversion=photon_series.conversion,
+                offset=photon_series.offset,
+            )
+
+        binned_series = None
+        if add_binned_series:
+            binned_series = dict(
+                dataset_path=add_deferred_binned_series(
+                    nwbfile=nwbfile,
+                    photon_series=photon_series,
+                    spatial_binning=spatial_binning,
+                    temporal_decimation=temporal_decimation,
+                ),
+                spatial_binning=spatial_binning,
+                temporal_decimation=temporal_decimation,
+            )
+
+        self._pending_pipelined_write = dict(
+            dataset_path=f"/{parent_container}/{photon_series_name}/data",
+            imaging_extractor=data_iterator.imaging_extractor,
+            pipeline_options=pipeline_options or dict(),
+            summary_image_paths=summary_image_paths,
+            # the summary images are of the values of the series, e.g. of a series quantized to int16
+            conversion_and_offset=(photon_series.conversion, photon_series.offset),
+            binned_series=binned_series,
+        )
+
+    def write_pending_data(self, nwbfile_path: FilePathType, backend: Literal["hdf5", "zarr"] = "hdf5") -> None:
+        """Write the data deferred by `add_to_nwbfile(..., pipelined_write=True)` into the closed NWB file."""
+        pending_pipelined_write = getattr(self, "_pending_pipelined_write", None)
+        if pending_pipelined_write is None:
+            return
+
+        summary_image_accumulator, binned_series_writer = None, None
+        binned_series = pending_pipelined_write.get("binned_series")
+        dataset_paths = [pending_pipelined_write["dataset_path"]]
+        if binned_series is not None:
+            dataset_paths.append(binned_series["dataset_path"])
+        with open_nwbfile_datasets(nwbfile_path=nwbfile_path, dataset_paths=dataset_paths, backend=backend) as datasets:
+            dataset = datasets[0]
+            if pending_pipelined_write.get("summary_image_paths"):
+                conversion, offset = pending_pipelined_write.get("conversion_and_offset", (1.0, 0.0))
+                summary_image_accumulator = SummaryImageAccumulator(
+                    frame_shape=dataset.shape[1:3], dtype=dataset.dtype, conversion=conversion, offset=offset
+                )
+            if binned_series is not None:
+                binned_series_writer = BinnedSeriesWriter(
+                    dataset=datasets[1],
+                    spatial_binning=binned_series["spatial_binning"],
+                    temporal_decimation=binned_series["temporal_decimation"],
+                )
+            write_imaging_data_pipelined(
+                dataset=dataset,
+                imaging_extractor=pending_pipelined_write["imaging_extractor"],
+                summary_image_accumulator=summary_image_accumulator,
+                binned_series_writer=binned_series_writer,
+                **pending_pipelined_write["pipeline_options"],
+            )
+        if summary_image_accumulator is not None:
+            write_summary_images(
+                nwbfile_path=nwbfile_path,
+                dataset_paths=pending_pipelined_write["summary_image_paths"],
+                summary_images=summary_image_accumulator.get_summary_images(),
+                backend=backend,
+            )
+        self._pending_pipelined_write = None
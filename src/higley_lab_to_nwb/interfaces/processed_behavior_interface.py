@@ -35,7 +35,13 @@ class ProcessedBehaviorInterface(BaseDataInterface):
                 Sampling frequency of the wheel speed trace.
         """
 
-        super().__init__(verbose=verbose)
+        super().__init__(
+            wheel_on_times=wheel_on_times,
+            wheel_off_times=wheel_off_times,
+            wheel_speed_data=wheel_speed_data,
+            sampling_frequency=sampling_frequency,
+            verbose=verbose,
+        )
         self.wheel_on_times = wheel_on_times
         self.wheel_off_times = wheel_off_times
         self.wheel_speed_data = wheel_speed_data
@@ -1,12 +1,32 @@
-from neuroconv.datainterfaces.ophys.baseimagingextractorinterface import BaseImagingExtractorInterface
-from typing import Literal
+from copy import deepcopy
+from typing import Iterator, Literal, Optional, Tuple
+
+import numpy as np
+from neuroconv.utils.checks import calculate_regular_series_rate
 from neuroconv.utils.dict import DeepDict
+from pynwb import NWBFile
 from roiextractors.extraction_tools import PathType
 
-from ..extractors import ProcessedImagingExtractor
+from ..extractors import ProcessedImagingExtractor, QuantizedImagingExtractor, get_quantization_parameters
+from ..tools.masked_pixel_series import MaskedPixelsDataChunkIterator, add_masked_pixel_series
+from .pipelined_imaging_interface import BasePipelinedImagingExtractorInterface
+
+# the size of the blocks of frames of the pixels matrix scanned at once
+_PIXELS_BLOCK_BYTES = 64 * 2**20
+
+
+def _iterate_masked_pixel_blocks(imaging_extractor: ProcessedImagingExtractor) -> Iterator[np.ndarray]:
+    """Yield the (frames, masked pixels) block of each block of frames of the pixels matrix."""
+    end_frame = imaging_extractor.get_num_frames()
+    first_frame = imaging_extractor.get_masked_pixels(start_frame=0, end_frame=1)
+    num_block_frames = max(1, _PIXELS_BLOCK_BYTES // max(1, first_frame.nbytes))
+    for start_frame in range(0, end_frame, num_block_frames):
+        yield imaging_extractor.get_masked_pixels(
+            start_frame=start_frame, end_frame=min(start_frame + num_block_frames, end_frame)
+        )
 
 
-class ProcessedImagingInterface(BaseImagingExtractorInterface):
+class ProcessedImagingInterface(BasePipelinedImagingExtractorInterface):
     """
     Data Interface for writing processed imaging data using ProcessedImagingExtractor.
     """
@@ -40,4 +60,146 @@ class ProcessedImagingInterface(BaseImagingExtractorInterface):
             verbose=verbose,
             photon_series_type=photon_series_type,
         )
+        self._pixel_range = None
+
+    def _get_pixel_range(self) -> Tuple[float, float]:
+        """Return the minimum and maximum of the pixels matrix, scanned block by block on the first call only."""
+        if self._pixel_range is None:
+            minimum, maximum = np.inf, -np.inf
+            for block in _iterate_masked_pixel_blocks(imaging_extractor=self.imaging_extractor):
+                minimum, maximum = min(minimum, float(block.min())), max(maximum, float(block.max()))
+            self._pixel_range = (minimum, maximum)
+        return self._pixel_range
+
+    def add_to_nwbfile(
+        self,
+        nwbfile: NWBFile,
+        metadata: Optional[dict] = None,
+        photon_series_type: Literal["TwoPhotonSeries", "OnePhotonSeries"] = "TwoPhotonSeries",
+        photon_series_index: int = 0,
+        parent_container: Literal["acquisition", "processing/ophys"] = "acquisition",
+        stub_test: bool = False,
+        stub_frames: int = 100,
+        pipelined_write: bool = False,
+        pipeline_options: Optional[dict] = None,
+        masked_pixels: bool = False,
+        quantized: bool = False,
+        add_summary_images: bool = False,
+        add_binned_series: bool = False,
+        spatial_binning: int = 4,
+        temporal_decimation: int = 1,
+    ):
+        """Add the photon series to the NWB file.
+
+        Parameters
+        ----------
+        masked_pixels: bool, default: False
+            Whether to store the pixel traces of the frame mask ("dff_blue" and "dff_uv") instead of the full frames,
+            see `higley_lab_to_nwb.tools.add_masked_pixel_series`. The series is a TimeSeries named after the photon
+            series and the frames are rebuilt with `higley_lab_to_nwb.tools.get_masked_pixel_frames`.
+            The masked pixels are written by blocks of frames, `pipelined_write` is ignored and the summary images and
+            the binned series, written by the pipelined write, are not available.
+        quantized: bool, default: False
+            Whether to store the values as int16 with the NWB `conversion` and `offset` of the series, mapping the
+            range of the values (and zero) on the int16 range. The maximum absolute quantization error, half the
+            conversion factor, is reported in the `comments` of the series.
+        add_summary_images: bool, default: False
+            Whether to add the summary images of the series, see `BasePipelinedImagingExtractorInterface`. The images
+            of a quantized series are of its dequantized values.
+        add_binned_series: bool, default: False
+            Whether to add a spatially binned and temporally decimated copy of the series, see
+            `BasePipelinedImagingExtractorInterface`. The copy of a quantized series is quantized the same way.
+        spatial_binning: int, default: 4
+            The side of the square bins of pixels of the binned series, in pixels.
+        temporal_decimation: int, default: 1
+            The number of consecutive frames averaged together in the binned series.
+        """
+        if masked_pixels and (add_summary_images or add_binned_series):
+            raise ValueError(
+                "The summary images and the binned series are written by the pipelined write of the full frames, "
+                "they are not available with 'masked_pixels=True'."
+            )
+        metadata = deepcopy(metadata or self.get_metadata())
+        photon_series_metadata = metadata["Ophys"][photon_series_type][photon_series_index]
+
+        quantization_kwargs = dict()
+        if quantized:
+            minimum, maximum = self._get_pixel_range()
+            conversion, offset = get_quantization_parameters(minimum=minimum, maximum=maximum)
+            quantization_kwargs = dict(
+                conversion=conversion,
+                offset=offset,
+                comments=(
+                    f"Quantized to int16 from {self.imaging_extractor.get_dtype()} with conversion {conversion:.9g} "
+                    f"and offset {offset:.9g}: the maximum absolute quantization error is {conversion / 2:.9g}."
+                ),
+            )
+            if self.verbose:
+                print(f"{photon_series_metadata['name']}: {quantization_kwargs['comments']}")
+
+        if not masked_pixels:
+            photon_series_metadata.update(quantization_kwargs)
+            imaging_extractor = self.imaging_extractor
+            if quantized:
+                self.imaging_extractor = QuantizedImagingExtractor(
+                    imaging_extractor=imaging_extractor, conversion=conversion, offset=offset
+                )
+            try:
+                super().add_to_nwbfile(
+                    nwbfile=nwbfile,
+                    metadata=metadata,
+                    photon_series_type=photon_series_type,
+                    photon_series_index=photon_series_index,
+                    parent_container=parent_container,
+                    stub_test=stub_test,
+                    stub_frames=stub_frames,
+                    pipelined_write=pipelined_write,
+                    pipeline_options=pipeline_options,
+                    add_summary_images=add_summary_images,
+                    add_binned_series=add_binned_series,
+                    spatial_binning=spatial_binning,
+                    temporal_decimation=temporal_decimation,
+                )
+            finally:
+                self.imaging_extractor = imaging_extractor
+            return
 
+        frame_mask = self.imaging_extractor.get_frame_mask()
+        if frame_mask is None:
+            raise ValueError(
+                f"'masked_pixels' requires a frame mask, the '{self.imaging_extractor._channel_names}' pixels matrix "
+                "holds all the pixels of the frame."
+            )
+        imaging_extractor = self.imaging_extractor
+        if stub_test:
+            stub_frames = min([stub_frames, imaging_extractor.get_num_frames()])
+            imaging_extractor = imaging_extractor.frame_slice(start_frame=0, end_frame=stub_frames)
+        num_frames = imaging_extractor.get_num_frames()
+
+        timing_kwargs = dict(rate=float(imaging_extractor.get_sampling_frequency()))
+        if imaging_extractor.has_time_vector():
+            timestamps = imaging_extractor.frame_to_time(np.arange(num_frames))
+            estimated_rate = calculate_regular_series_rate(series=timestamps)
+            if estimated_rate:
+                timing_kwargs = dict(starting_time=timestamps[0], rate=estimated_rate)
+            else:
+                timing_kwargs = dict(timestamps=timestamps)
+
+        # read, and quantized, one buffer of frames at a time while writing
+        masked_pixel_traces = MaskedPixelsDataChunkIterator(
+            imaging_extractor=self.imaging_extractor,
+            end_frame=num_frames,
+            conversion=quantization_kwargs.get("conversion"),
+            offset=quantization_kwargs.get("offset", 0.0),
+        )
+        add_masked_pixel_series(
+            nwbfile=nwbfile,
+            masked_pixels=masked_pixel_traces,
+            frame_mask=frame_mask,
+            name=photon_series_metadata["name"],
+            description=photon_series_metadata.get("description", "Processed imaging data."),
+            unit=photon_series_metadata.get("unit", "n.a."),
+            parent_container=parent_container,
+            **timing_kwargs,
+            **quantization_kwargs,
+        )
@@ -1,15 +1,14 @@
 from typing import List
 import numpy as np
-from neo import io
 
 from neuroconv import BaseDataInterface
 from neuroconv.tools import get_package
 from neuroconv.utils import FilePathType
 from neuroconv.tools.signal_processing import get_rising_frames_from_ttl, get_falling_frames_from_ttl
-from spikeinterface.extractors import CedRecordingExtractor
 from pynwb import NWBFile, TimeSeries
 from pynwb.epoch import TimeIntervals
-from ndx_events import TtlsTable, TtlTypesTable
+
+# neo, spikeinterface and ndx_events are imported when they are used, to keep the import of the package fast
 
 
 def _test_sonpy_installation() -> None:
@@ -22,6 +21,8 @@ def _test_sonpy_installation() -> None:
 
 def get_streams(file_path: FilePathType) -> List[str]:
     """Return a list of channel names as set in the recording extractor."""
+    from neo import io
+
     r = io.CedIO(filename=file_path)
     signal_channels = r.header["signal_channels"]
     stream_ids = signal_channels["id"]
@@ -31,6 +32,8 @@ def get_streams(file_path: FilePathType) -> List[str]:
 
 def _get_stream_gain_offset(file_path: FilePathType, stream_id: str) -> List[str]:
     """Return a list of channel names as set in the recording extractor."""
+    from neo import io
+
     r = io.CedIO(filename=file_path)
     signal_channels = r.header["signal_channels"]
     gain = signal_channels["gain"][signal_channels["id"] == stream_id][0]
@@ -74,6 +77,30 @@ class Spike2SignalsInterface(BaseDataInterface):
 
         self.ttl_stream_ids_to_names_map = ttl_stream_ids_to_names_map
         self.behavioral_stream_ids_to_names_map = behavioral_stream_ids_to_names_map
+        # the event times of the TTL streams by (stream id, rising), read once for the alignment and the writing
+        self._event_times = dict()
+        # the traces, sampling frequency, gain and offset of the behavioral streams loaded by `preload`
+        self._behavioral_streams = dict()
+
+    def preload(self) -> None:
+        """Read the event times of all the TTL streams and the traces of the behavioral streams.
+
+        The converters call it concurrently with the loading of the other sources, so that the alignment and the
+        writing don't read the Spike2 file again.
+        """
+        from spikeinterface.extractors import CedRecordingExtractor
+
+        for stream_id in self.ttl_stream_ids_to_names_map:
+            self.get_event_times_from_ttl(stream_id=stream_id)
+        for stream_id in self.behavioral_stream_ids_to_names_map:
+            extractor = CedRecordingExtractor(file_path=str(self.source_data["file_path"]), stream_id=stream_id)
+            gain, offset = _get_stream_gain_offset(file_path=str(self.source_data["file_path"]), stream_id=stream_id)
+            self._behavioral_streams[stream_id] = (
+                extractor.get_traces().reshape(-1),
+                extractor.get_sampling_frequency(),
+                gain,
+                offset,
+            )
 
     def get_metadata(self) -> dict:
         metadata = super().get_metadata()
@@ -91,6 +118,11 @@ class Spike2SignalsInterface(BaseDataInterface):
         return metadata
 
     def get_event_times_from_ttl(self, stream_id, rising: bool = True):
+        from spikeinterface.extractors import CedRecordingExtractor
+
+        if (stream_id, rising) in self._event_times:
+            return self._event_times[stream_id, rising]
+
         extractor = CedRecordingExtractor(file_path=str(self.source_data["file_path"]), stream_id=stream_id)
         times = extractor.get_times()
         traces = extractor.get_traces()
@@ -99,7 +131,8 @@ class Spike2SignalsInterface(BaseDataInterface):
         else:
             event_times = get_falling_frames_from_ttl(traces)
 
-        return times[event_times]
+        self._event_times[stream_id, rising] = times[event_times]
+        return self._event_times[stream_id, rising]
 
     def get_event_times_from_ttl_channel_name(self, channel_name: str) -> int:
 
@@ -116,6 +149,9 @@ class Spike2SignalsInterface(BaseDataInterface):
         return times
 
     def add_to_nwbfile(self, nwbfile: NWBFile, metadata: dict, stub_test: bool = False) -> None:
+        from ndx_events import TtlsTable, TtlTypesTable
+        from spikeinterface.extractors import CedRecordingExtractor
+
         end_frame = 100 if stub_test else None
 
         events_metadata = metadata["Events"]
@@ -142,12 +178,20 @@ class Spike2SignalsInterface(BaseDataInterface):
         nwbfile.add_acquisition(ttls_table)
 
         for stream_id, stream_name in self.behavioral_stream_ids_to_names_map.items():
-            extractor = CedRecordingExtractor(file_path=str(self.source_data["file_path"]), stream_id=stream_id)
-            gain, offset = _get_stream_gain_offset(file_path=str(self.source_data["file_path"]), stream_id=stream_id)
+            if stream_id in self._behavioral_streams:
+                traces, sampling_frequency, gain, offset = self._behavioral_streams[stream_id]
+                traces = traces[:end_frame]
+            else:
+                extractor = CedRecordingExtractor(file_path=str(self.source_data["file_path"]), stream_id=stream_id)
+                gain, offset = _get_stream_gain_offset(
+                    file_path=str(self.source_data["file_path"]), stream_id=stream_id
+                )
+                traces = extractor.get_traces(end_frame=end_frame).reshape(-1)
+                sampling_frequency = extractor.get_sampling_frequency()
             behavioral_time_series = TimeSeries(
                 name=stream_name,
-                data=extractor.get_traces(end_frame=end_frame).reshape(-1),
-                rate=extractor.get_sampling_frequency(),
+                data=traces,
+                rate=sampling_frequency,
                 description=f"The {stream_name} measured over time.",
                 unit="Volts",
                 conversion=gain,
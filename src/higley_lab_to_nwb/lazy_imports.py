@@ -0,0 +1,50 @@
+"""Import of the public names of a package on first access, so that importing the package doesn't import their modules.
+
+Functions
+---------
+attach_lazy_imports
+    Return the module `__getattr__` and `__dir__` of a package importing its public names on first access.
+"""
+
+import sys
+from importlib import import_module
+from typing import Callable, Dict, List, Tuple
+
+
+def attach_lazy_imports(
+    package_name: str, name_to_module: Dict[str, str]
+) -> Tuple[Callable[[str], object], Callable[[], List[str]]]:
+    """Return the module `__getattr__` and `__dir__` of a package importing its public names on first access.
+
+    A name is imported from its module on its first access and then cached in the namespace of the package, so that
+    the next accesses don't go through `__getattr__`. Use it in the `__init__.py` of the package as:
+
+        __all__ = list(_NAME_TO_MODULE)
+        __getattr__, __dir__ = attach_lazy_imports(package_name=__name__, name_to_module=_NAME_TO_MODULE)
+
+    Parameters
+    ----------
+    package_name: str
+        The name of the package, `__name__` in its `__init__.py`.
+    name_to_module: dict
+        The module defining each public name of the package, relative to the package (e.g. ".tools_module").
+
+    Returns
+    -------
+    __getattr__: callable
+        The module `__getattr__` of the package, raising an AttributeError for the names not in `name_to_module`.
+    __dir__: callable
+        The module `__dir__` of the package, listing the public names not imported yet.
+    """
+
+    def __getattr__(name: str):
+        if name not in name_to_module:
+            raise AttributeError(f"module {package_name!r} has no attribute {name!r}")
+        value = getattr(import_module(name_to_module[name], package=package_name), name)
+        setattr(sys.modules[package_name], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package_name])) | set(name_to_module))
+
+    return __getattr__, __dir__
@@ -1,8 +1,18 @@
 """Primary script to run to convert an entire session for of data using the NWBConverter."""
 
+from functools import partial
 from pathlib import Path
-from typing import Union
+from typing import Literal, Optional, Union
 from neuroconv.utils import load_dict_from_file, dict_deep_update
+from higley_lab_to_nwb.tools import (
+    atomic_nwbfile_path,
+    estimate_conversion,
+    load_throughputs,
+    print_estimate,
+    print_verification,
+    run_concurrently,
+)
+from higley_lab_to_nwb.interfaces import MesoscopicImagingMultiTiffSingleFrameInterface, ProcessedImagingInterface
 from higley_lab_to_nwb.lohani_2022 import Lohani2022NWBConverter
 from higley_lab_to_nwb.interfaces.spike2signals_interface import get_streams
 from higley_lab_to_nwb.lohani_2022.utils import (
@@ -19,22 +29,59 @@ def session_to_nwb(
     session_id: str,
     stub_test: bool = False,
     verbose: bool = True,
+    pipelined_write: bool = True,
+    profile: bool = False,
+    append: bool = False,
+    verify: bool = False,
+    output_layout: Literal["single_file", "multi_file"] = "single_file",
+    backend: Literal["hdf5", "zarr"] = "hdf5",
+    dry_run: bool = False,
+    benchmark_report_file_path: Optional[Union[str, Path]] = None,
 ):
     output_dir_path = Path(output_dir_path)
     if stub_test:
         output_dir_path = output_dir_path / "nwb_stub"
     output_dir_path.mkdir(parents=True, exist_ok=True)
 
-    nwbfile_path = output_dir_path / f"{session_id}.nwb"
+    nwbfile_suffix = ".nwb.zarr" if backend == "zarr" else ".nwb"
+    nwbfile_path = output_dir_path / f"{session_id}{nwbfile_suffix}"
 
     source_data = dict()
     conversion_options = dict()
 
     search_pattern = "_".join(session_id.split("_")[:2])
 
-    # Add Analog signals from Spike2
+    # Read the Spike2 streams and the processed signals concurrently, they are independent until the alignment
     file_path = list(folder_path.glob(f"{search_pattern}*.smrx"))[0]
-    stream_ids, stream_names = get_streams(file_path=file_path)
+    mat_file_path = parcellation_folder_path / "smrx_signals.mat"
+    source_loaders = dict(
+        streams=partial(get_streams, file_path=file_path),
+        wheel_speed=partial(get_channel_trace_from_mat, file_path=mat_file_path, variable_name="wheelspeed"),
+        wheel_times=partial(
+            get_event_times_from_mat,
+            file_path=str(mat_file_path),
+            start_time_variable_name="wheelOn",
+            end_time_variable_name="wheelOff",
+        ),
+    )
+    if "vis_stim" in session_id:
+        source_loaders["visual_stimulus_times"] = partial(
+            get_event_times_from_mat,
+            file_path=str(mat_file_path),
+            start_time_variable_name="stimstart",
+            end_time_variable_name="stimend",
+        )
+    if "airpuff" in session_id:
+        source_loaders["airpuff_times"] = partial(
+            get_event_times_from_mat,
+            file_path=str(mat_file_path),
+            start_time_variable_name="airpuffstart",
+            end_time_variable_name="airpuffend",
+        )
+    loaded_sources = run_concurrently(tasks=source_loaders)
+
+    # Add Analog signals from Spike2
+    stream_ids, stream_names = loaded_sources["streams"]
 
     # Define each smrx signal name
     TTLsignals_name_map = {
@@ -61,13 +108,8 @@ def session_to_nwb(
     conversion_options.update(dict(Spike2Signals=dict(stub_test=stub_test)))
 
     # Add Processed Behavioral Signals
-    mat_file_path = parcellation_folder_path / "smrx_signals.mat"
-    wheel_speed_data, sampling_frequency = get_channel_trace_from_mat(
-        file_path=mat_file_path, variable_name="wheelspeed"
-    )
-    wheel_on_times, wheel_off_times = get_event_times_from_mat(
-        file_path=str(mat_file_path), start_time_variable_name="wheelOn", end_time_variable_name="wheelOff"
-    )
+    wheel_speed_data, sampling_frequency = loaded_sources["wheel_speed"]
+    wheel_on_times, wheel_off_times = loaded_sources["wheel_times"]
     source_data.update(
         dict(
             ProcessedWheelSignalInterface=dict(
@@ -83,9 +125,7 @@ def session_to_nwb(
     # Add Visual Stimulus
     if "vis_stim" in session_id:
         csv_file_path = list(folder_path.glob(f"{search_pattern}*.csv"))[0]
-        start_times, stop_times = get_event_times_from_mat(
-            file_path=str(mat_file_path), start_time_variable_name="stimstart", end_time_variable_name="stimend"
-        )
+        start_times, stop_times = loaded_sources["visual_stimulus_times"]
         source_data.update(
             dict(
                 VisualStimulusInterface=dict(
@@ -100,9 +140,7 @@ def session_to_nwb(
 
     # Add Airpuff Stimulus
     if "airpuff" in session_id:
-        start_times, stop_times = get_event_times_from_mat(
-            file_path=str(mat_file_path), start_time_variable_name="airpuffstart", end_time_variable_name="airpuffend"
-        )
+        start_times, stop_times = loaded_sources["airpuff_times"]
         source_data.update(
             dict(
                 AirpuffInterface=dict(
@@ -142,6 +180,9 @@ def session_to_nwb(
             "stub_test": stub_test,
             "photon_series_index": photon_series_index,
             "photon_series_type": "OnePhotonSeries",
+            "pipelined_write": pipelined_write,
+            # the summary images are accumulated from the frames read by the pipelined write
+            "add_summary_images": pipelined_write,
         }
         photon_series_index += 1
 
@@ -161,6 +202,7 @@ def session_to_nwb(
             "stub_test": stub_test,
             "photon_series_index": photon_series_index,
             "photon_series_type": "OnePhotonSeries",
+            "pipelined_write": pipelined_write,
             "parent_container": "processing/ophys",
         }
         photon_series_index += 1
@@ -182,6 +224,7 @@ def session_to_nwb(
         dict(
             ParcellsSegmentationInterface=dict(
                 include_roi_acceptance=False,
+                mask_type="pixel",
                 plane_segmentation_name=plane_segmentation_name,
                 stub_test=stub_test,
             )
@@ -211,6 +254,23 @@ def session_to_nwb(
     ophys_metadata_path = Path(__file__).parent / "metadata" / "lohani_2022_ophys_metadata.yaml"
     ophys_metadata = load_dict_from_file(ophys_metadata_path)
 
+    # Estimate the size and duration of the conversion from the headers of the source files, without converting
+    if dry_run:
+        data_interface_classes = dict(Lohani2022NWBConverter.data_interface_classes)
+        for excitation_type, channel in excitation_type_channel_combination.items():
+            suffix = f"{excitation_type}Excitation{channel}Channel"
+            data_interface_classes[f"Imaging{suffix}"] = MesoscopicImagingMultiTiffSingleFrameInterface
+            data_interface_classes[f"DFFImaging{suffix}"] = ProcessedImagingInterface
+        throughputs = load_throughputs(benchmark_report_file_path) if benchmark_report_file_path else None
+        estimate = estimate_conversion(
+            source_data=source_data,
+            data_interface_classes=data_interface_classes,
+            conversion_options=conversion_options,
+            throughputs=throughputs,
+        )
+        print_estimate(estimate)
+        return estimate
+
     if verbose:
         print("Start conversion")
     converter = Lohani2022NWBConverter(
@@ -218,6 +278,9 @@ def session_to_nwb(
         excitation_type_channel_combination=excitation_type_channel_combination,
         ophys_metadata=ophys_metadata,
         verbose=verbose,
+        profile=profile,
+        output_layout=output_layout,
+        backend=backend,
     )
 
     # Add datetime to conversion
@@ -233,10 +296,38 @@ def session_to_nwb(
     editable_metadata = load_dict_from_file(editable_metadata_path)
     metadata = dict_deep_update(metadata, editable_metadata)
 
-    # Run conversion
-    converter.run_conversion(
-        metadata=metadata, nwbfile_path=nwbfile_path, conversion_options=conversion_options, overwrite=True
-    )
+    # Add or replace only the interfaces whose sources changed since the existing NWB file was written
+    if append and nwbfile_path.is_file():
+        interface_names = converter.append_changed_interfaces(
+            nwbfile_path=nwbfile_path, metadata=metadata, conversion_options=conversion_options
+        )
+        if verbose:
+            print(f"Interfaces added or replaced in {nwbfile_path}: {interface_names}")
+    else:
+        # Run conversion
+        # Write to a temporary file first, so that an interrupted conversion never leaves a partial NWB file behind
+        with atomic_nwbfile_path(nwbfile_path) as temporary_nwbfile_path:
+            converter.run_conversion(
+                metadata=metadata,
+                nwbfile_path=temporary_nwbfile_path,
+                conversion_options=conversion_options,
+                overwrite=True,
+            )
+
+    # Compare a random sample of the chunks of the series written with their sources, raising on a mismatch
+    if verify:
+        verification = converter.verify_conversion(
+            nwbfile_path=nwbfile_path, metadata=metadata, conversion_options=conversion_options
+        )
+        if verbose:
+            print_verification(verification)
+
+    if profile:
+        profile_report_path = output_dir_path / f"{session_id}_profile.json"
+        converter.profiler.save_report(file_path=profile_report_path)
+        converter.profiler.print_report()
+
+    return nwbfile_path
 
 
 if __name__ == "__main__":
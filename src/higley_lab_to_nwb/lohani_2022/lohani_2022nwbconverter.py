@@ -1,11 +1,8 @@
 """Primary NWBConverter class for this dataset."""
 
-from typing import Dict, List
-from pynwb import NWBFile
-from neuroconv import NWBConverter
+from typing import Dict, Literal, Optional
 from neuroconv.datainterfaces import VideoInterface
 from neuroconv.utils import DeepDict
-from neuroconv.tools.nwb_helpers import make_or_load_nwbfile
 from higley_lab_to_nwb.interfaces import (
     MesoscopicImagingMultiTiffSingleFrameInterface,
     Spike2SignalsInterface,
@@ -15,9 +12,10 @@ from higley_lab_to_nwb.interfaces import (
     ParcellsSegmentationInterface,
     FacemapInterface,
 )
+from higley_lab_to_nwb.higley_lab_nwbconverter import HigleyLabNWBConverter
 
 
-class Lohani2022NWBConverter(NWBConverter):
+class Lohani2022NWBConverter(HigleyLabNWBConverter):
     """Primary conversion class."""
 
     data_interface_classes = dict(
@@ -36,7 +34,25 @@ class Lohani2022NWBConverter(NWBConverter):
         source_data: Dict[str, dict],
         ophys_metadata: Dict[str, dict],
         verbose: bool = True,
+        profile: bool = False,
+        plan_datasets: bool = True,
+        concurrent_preload: bool = True,
+        max_preload_workers: Optional[int] = None,
+        output_layout: Literal["single_file", "multi_file"] = "single_file",
+        max_series_writers: Optional[int] = None,
+        backend: Literal["hdf5", "zarr"] = "hdf5",
+        dataset_io_overrides: Optional[Dict[str, dict]] = None,
+        access_pattern_io_overrides: Optional[Dict[str, dict]] = None,
     ):
+        """Create the data interfaces of a session, with an imaging and a dF/F interface per excitation and channel.
+
+        See `HigleyLabNWBConverter` for the options of the conversion.
+
+        Parameters
+        ----------
+        excitation_type_channel_combination: dict
+            The channel imaged under each excitation type, e.g. {"Blue": "Green"}.
+        """
         self.excitation_type_channel_combination = excitation_type_channel_combination
         for excitation_type, channel in self.excitation_type_channel_combination.items():
             suffix = f"{excitation_type}Excitation{channel}Channel"
@@ -45,16 +61,20 @@ class Lohani2022NWBConverter(NWBConverter):
             interface_name = f"DFFImaging{suffix}"
             self.data_interface_classes[interface_name] = ProcessedImagingInterface
 
-        self.verbose = verbose
-        self._validate_source_data(source_data=source_data, verbose=self.verbose)
-
-        self.data_interface_objects = {
-            name: data_interface(**source_data[name])
-            for name, data_interface in self.data_interface_classes.items()
-            if name in source_data
-        }
-
-        self.ophys_metadata = ophys_metadata
+        super().__init__(
+            source_data=source_data,
+            ophys_metadata=ophys_metadata,
+            verbose=verbose,
+            profile=profile,
+            plan_datasets=plan_datasets,
+            concurrent_preload=concurrent_preload,
+            max_preload_workers=max_preload_workers,
+            output_layout=output_layout,
+            max_series_writers=max_series_writers,
+            backend=backend,
+            dataset_io_overrides=dataset_io_overrides,
+            access_pattern_io_overrides=access_pattern_io_overrides,
+        )
 
     def get_metadata(self) -> DeepDict:
         metadata = super().get_metadata()
@@ -2,6 +2,7 @@ from .lohani_2022_utils import (
     read_session_start_time,
     get_tiff_file_paths_sorted_by_channel,
     create_tiff_stack,
+    create_tiff_stacks,
     get_event_times_from_mat,
     get_event_times_from_spike2,
     get_channel_trace_from_mat,
@@ -6,7 +6,9 @@ from zoneinfo import ZoneInfo
 from neuroconv.tools.signal_processing import get_rising_frames_from_ttl, get_falling_frames_from_ttl
 from spikeinterface.extractors import CedRecordingExtractor
 from neuroconv.tools import get_package
-from typing import Union
+from typing import Dict, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
 
 
@@ -35,26 +37,99 @@ def get_tiff_file_paths_sorted_by_channel(
     return selected_tiff_file_paths
 
 
+# the columns of each half of the mesoscope frame
+_FRAME_SIDE_COLUMNS = dict(left=slice(None, 512), right=slice(512, None))
+
+
 def create_tiff_stack(
     folder_path: Union[str, Path],
     output_file_path: Union[str, Path],
     start_frame_index: int = 0,
     frame_side: str = "left",
     stub_test: bool = False,
+    frames_per_chunk: int = 100,
+    num_workers: Optional[int] = None,
 ):
-    selected_tiff_file_paths = get_tiff_file_paths_sorted_by_channel(
-        folder_path=folder_path, start_frame_index=start_frame_index, stub_test=stub_test
+    create_tiff_stacks(
+        folder_path=folder_path,
+        output_file_paths={(start_frame_index, frame_side): output_file_path},
+        stub_test=stub_test,
+        frames_per_chunk=frames_per_chunk,
+        num_workers=num_workers,
     )
-    frames = [tifffile.imread(file_path) for file_path in selected_tiff_file_paths]
 
-    if frame_side == "left":
-        stack = np.stack([frame[:, :512].transpose(1, 0) for frame in frames], axis=0)
-    elif frame_side == "right":
-        stack = np.stack([frame[:, 512:].transpose(1, 0) for frame in frames], axis=0)
-    else:
-        raise ValueError("frame_side must be either 'right' or 'left'")
+    return
+
 
-    tifffile.imwrite(output_file_path, stack)
+def create_tiff_stacks(
+    folder_path: Union[str, Path],
+    output_file_paths: Dict[Tuple[int, str], Union[str, Path]],
+    number_of_channels: int = 3,
+    stub_test: bool = False,
+    frames_per_chunk: int = 100,
+    num_workers: Optional[int] = None,
+):
+    """Write the (transposed) half frames of several channels to BigTIFF stacks in a single pass over the folder.
+
+    The single-frame TIFF files are decoded on a thread pool, `frames_per_chunk` frames per channel at a time, and the
+    half frames are appended page by page to the stacks while the next chunk is decoded, so the memory used doesn't
+    depend on the length of the session.
+
+    Parameters
+    ----------
+    folder_path : str or Path
+        The folder of single-frame TIFF files, the channels alternating file by file.
+    output_file_paths : dict
+        The path to the stack of each (start_frame_index, frame_side) pair, e.g. {(0, "left"): ..., (0, "right"): ...}.
+    number_of_channels : int, default: 3
+        The number of channels alternating in the acquisition cycle.
+    stub_test : bool, default: False
+        Whether to only read the first 100 files.
+    frames_per_chunk : int, default: 100
+        The number of frames of each channel decoded and written at once.
+    num_workers : int, optional
+        The number of threads decoding the TIFF files, defaults to the ThreadPoolExecutor default.
+    """
+    for _, frame_side in output_file_paths:
+        if frame_side not in _FRAME_SIDE_COLUMNS:
+            raise ValueError("frame_side must be either 'right' or 'left'")
+
+    tiff_file_paths = natsorted(Path(folder_path).glob("*.tif"))
+    if stub_test:
+        tiff_file_paths = tiff_file_paths[:100]  # for testing
+    start_frame_indices = {start_frame_index for start_frame_index, _ in output_file_paths}
+    # only the files of the requested channels are decoded
+    selected_tiff_file_paths = [
+        (file_index % number_of_channels, file_path)
+        for file_index, file_path in enumerate(tiff_file_paths)
+        if file_index % number_of_channels in start_frame_indices
+    ]
+    chunk_size = frames_per_chunk * len(start_frame_indices)
+    chunks = [
+        selected_tiff_file_paths[chunk_start : chunk_start + chunk_size]
+        for chunk_start in range(0, len(selected_tiff_file_paths), chunk_size)
+    ]
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor, ExitStack() as writers_stack:
+        writers = {
+            key: writers_stack.enter_context(tifffile.TiffWriter(output_file_path, bigtiff=True))
+            for key, output_file_path in output_file_paths.items()
+        }
+
+        def submit_chunk(chunk):
+            return [(channel_index, executor.submit(tifffile.imread, file_path)) for channel_index, file_path in chunk]
+
+        # the next chunk is decoded while the current one is written
+        pending_chunk = submit_chunk(chunks[0]) if chunks else []
+        for chunk_index in range(len(chunks)):
+            frames = [(channel_index, future.result()) for channel_index, future in pending_chunk]
+            if chunk_index + 1 < len(chunks):
+                pending_chunk = submit_chunk(chunks[chunk_index + 1])
+            for (start_frame_index, frame_side), writer in writers.items():
+                columns = _FRAME_SIDE_COLUMNS[frame_side]
+                for channel_index, frame in frames:
+                    if channel_index == start_frame_index:
+                        writer.write(frame[:, columns].transpose(1, 0), contiguous=True)
 
     return
 
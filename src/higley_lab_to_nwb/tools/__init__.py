@@ -0,0 +1,155 @@
+"""The conversion tools, imported on first access so that importing the package doesn't import their dependencies."""
+
+from typing import TYPE_CHECKING
+
+from ..lazy_imports import attach_lazy_imports
+
+# the public names of the package and the module defining them, imported on first access
+_NAME_TO_MODULE = dict(
+    run_sessions_in_parallel=".batch_conversion",
+    get_total_file_size_gb=".batch_conversion",
+    ConversionManifest=".conversion_manifest",
+    atomic_nwbfile_path=".conversion_manifest",
+    get_converter_version=".conversion_manifest",
+    get_final_nwbfile_path=".conversion_manifest",
+    get_nwbfile_size=".conversion_manifest",
+    get_source_hash=".conversion_manifest",
+    DeferredDataChunkIterator=".pipelined_imaging_write",
+    write_imaging_data_pipelined=".pipelined_imaging_write",
+    open_nwbfile_dataset=".pipelined_imaging_write",
+    open_nwbfile_datasets=".pipelined_imaging_write",
+    SharedMemoryFrameReader=".shared_memory_reader",
+    ConversionProfiler=".conversion_profiler",
+    configure_datasets=".dataset_planner",
+    get_access_pattern=".dataset_planner",
+    plan_dataset_io=".dataset_planner",
+    use_zarr_data_io=".dataset_planner",
+    validate_data_io_overrides=".dataset_planner",
+    MaskedPixelsDataChunkIterator=".masked_pixel_series",
+    add_masked_pixel_series=".masked_pixel_series",
+    get_masked_pixel_frames=".masked_pixel_series",
+    unmask_frames=".masked_pixel_series",
+    estimate_conversion=".conversion_estimate",
+    estimate_interface=".conversion_estimate",
+    calibrate_throughputs=".conversion_estimate",
+    load_throughputs=".conversion_estimate",
+    print_estimate=".conversion_estimate",
+    run_concurrently=".concurrent_loading",
+    benchmark_codecs=".codec_benchmark",
+    benchmark_extractor_codecs=".codec_benchmark",
+    get_codec_data_io_kwargs=".codec_benchmark",
+    load_codec_choices=".codec_benchmark",
+    run_codec_benchmarks=".codec_benchmark",
+    sample_imaging_frames=".codec_benchmark",
+    select_codec_choices=".codec_benchmark",
+    add_data_interfaces_to_nwbfile=".incremental_conversion",
+    append_changed_interfaces=".incremental_conversion",
+    get_interface_source_hash=".incremental_conversion",
+    read_conversion_record=".incremental_conversion",
+    consolidate_nwbfile=".multi_file_output",
+    get_external_links=".multi_file_output",
+    write_imaging_series_files=".multi_file_output",
+    write_imaging_series_in_parallel=".multi_file_output",
+    SummaryImageAccumulator=".summary_images",
+    add_deferred_summary_images=".summary_images",
+    write_summary_images=".summary_images",
+    BinnedSeriesWriter=".binned_imaging_series",
+    add_deferred_binned_series=".binned_imaging_series",
+    bin_frames=".binned_imaging_series",
+    get_binned_series_name=".binned_imaging_series",
+    print_verification=".conversion_verification",
+    verify_nwbfile=".conversion_verification",
+    generate_ttl_trace=".synthetic_data",
+    write_cidan_output=".synthetic_data",
+    write_facemap_proc_mat=".synthetic_data",
+    write_mat_file=".synthetic_data",
+    write_parcellation_mat=".synthetic_data",
+    write_processed_imaging_mat=".synthetic_data",
+    write_round_robin_tiff_stacks=".synthetic_data",
+    write_single_frame_tiff_folder=".synthetic_data",
+    write_smrx_signals_mat=".synthetic_data",
+)
+__all__ = list(_NAME_TO_MODULE)
+
+__getattr__, __dir__ = attach_lazy_imports(package_name=__name__, name_to_module=_NAME_TO_MODULE)
+
+
+if TYPE_CHECKING:
+    from .batch_conversion import run_sessions_in_parallel, get_total_file_size_gb
+    from .conversion_manifest import (
+        ConversionManifest,
+        atomic_nwbfile_path,
+        get_converter_version,
+        get_final_nwbfile_path,
+        get_nwbfile_size,
+        get_source_hash,
+    )
+    from .pipelined_imaging_write import (
+        DeferredDataChunkIterator,
+        open_nwbfile_dataset,
+        open_nwbfile_datasets,
+        write_imaging_data_pipelined,
+    )
+    from .shared_memory_reader import SharedMemoryFrameReader
+    from .conversion_profiler import ConversionProfiler
+    from .dataset_planner import (
+        configure_datasets,
+        get_access_pattern,
+        plan_dataset_io,
+        use_zarr_data_io,
+        validate_data_io_overrides,
+    )
+    from .masked_pixel_series import (
+        MaskedPixelsDataChunkIterator,
+        add_masked_pixel_series,
+        get_masked_pixel_frames,
+        unmask_frames,
+    )
+    from .conversion_estimate import (
+        calibrate_throughputs,
+        estimate_conversion,
+        estimate_interface,
+        load_throughputs,
+        print_estimate,
+    )
+    from .concurrent_loading import run_concurrently
+    from .codec_benchmark import (
+        benchmark_codecs,
+        benchmark_extractor_codecs,
+        get_codec_data_io_kwargs,
+        load_codec_choices,
+        run_codec_benchmarks,
+        sample_imaging_frames,
+        select_codec_choices,
+    )
+    from .incremental_conversion import (
+        add_data_interfaces_to_nwbfile,
+        append_changed_interfaces,
+        get_interface_source_hash,
+        read_conversion_record,
+    )
+    from .multi_file_output import (
+        consolidate_nwbfile,
+        get_external_links,
+        write_imaging_series_files,
+        write_imaging_series_in_parallel,
+    )
+    from .summary_images import SummaryImageAccumulator, add_deferred_summary_images, write_summary_images
+    from .binned_imaging_series import (
+        BinnedSeriesWriter,
+        add_deferred_binned_series,
+        bin_frames,
+        get_binned_series_name,
+    )
+    from .conversion_verification import print_verification, verify_nwbfile
+    from .synthetic_data import (
+        generate_ttl_trace,
+        write_cidan_output,
+        write_facemap_proc_mat,
+        write_mat_file,
+        write_parcellation_mat,
+        write_processed_imaging_mat,
+        write_round_robin_tiff_stacks,
+        write_single_frame_tiff_folder,
+        write_smrx_signals_mat,
+    )
@@ -0,0 +1,279 @@
+"""Run the conversion of several sessions in parallel worker processes.
+
+Functions
+---------
+run_sessions_in_parallel
+    Convert sessions on a pool of worker processes with a memory budget, isolated logs and failures.
+get_total_file_size_gb
+    Return the total size of a list of files, in GB, to estimate the memory needed by a session.
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from neuroconv.utils import FilePathType, FolderPathType
+
+from .conversion_manifest import ConversionManifest, get_converter_version, get_nwbfile_size, get_source_hash
+
+
+def get_total_file_size_gb(file_paths: Iterable[FilePathType]) -> float:
+    """Return the total size of the existing files in `file_paths`, in GB."""
+    return sum(Path(file_path).stat().st_size for file_path in file_paths if Path(file_path).is_file()) / 1e9
+
+
+def _convert_session_in_worker(
+    convert_session: Callable,
+    session_id: str,
+    session_kwargs: dict,
+    log_file_path: Optional[str],
+    result_queue: multiprocessing.Queue,
+) -> None:
+    """Convert one session in a worker process, with stdout and stderr redirected to the session log file."""
+    log_file = None
+    if log_file_path is not None:
+        log_file = open(log_file_path, "w")
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # redirect at the file descriptor level, to also capture the output of compiled extensions
+        os.dup2(log_file.fileno(), sys.stdout.fileno())
+        os.dup2(log_file.fileno(), sys.stderr.fileno())
+
+    result = dict(session_id=session_id, status="succeeded", nwbfile_path=None, error=None)
+    start_time = time.perf_counter()
+    try:
+        nwbfile_path = convert_session(**session_kwargs)
+        result.update(nwbfile_path=str(nwbfile_path) if nwbfile_path is not None else None)
+    except Exception as exception:
+        traceback.print_exc()
+        result.update(status="failed", error=f"{type(exception).__name__}: {exception}")
+    result.update(wall_time=time.perf_counter() - start_time)
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    if log_file is not None:
+        log_file.close()
+    result_queue.put(result)
+
+
+def _add_output_statistics(result: dict) -> dict:
+    nwbfile_path = result.get("nwbfile_path")
+    output_size_bytes = get_nwbfile_size(nwbfile_path) if nwbfile_path is not None else None
+    result.update(output_size_bytes=output_size_bytes)
+    throughput = None
+    if output_size_bytes is not None and result.get("wall_time"):
+        throughput = output_size_bytes / 1e6 / result["wall_time"]
+    result.update(throughput_mb_per_s=throughput)
+    return result
+
+
+def _print_summary(results: List[dict], total_wall_time: float) -> None:
+    print("-" * 80)
+    print(f"{'session':<40}{'status':>10}{'wall time (s)':>15}{'MB/s':>15}")
+    for result in results:
+        throughput = result["throughput_mb_per_s"] if result["status"] != "skipped" else None
+        throughput = f"{throughput:.2f}" if throughput is not None else "-"
+        wall_time = f"{result['wall_time']:.1f}" if result.get("wall_time") is not None else "-"
+        print(f"{result['session_id']:<40}{result['status']:>10}{wall_time:>15}{throughput:>15}")
+    num_failed = sum(result["status"] == "failed" for result in results)
+    num_skipped = sum(result["status"] == "skipped" for result in results)
+    num_converted = len(results) - num_skipped
+    print(
+        f"{num_converted} sessions converted in {total_wall_time:.1f} s, {num_failed} failed, "
+        f"{num_skipped} skipped as up to date."
+    )
+
+
+def run_sessions_in_parallel(
+    convert_session: Callable,
+    session_to_kwargs: Dict[str, dict],
+    max_workers: Optional[int] = None,
+    memory_budget_gb: Optional[float] = None,
+    session_to_memory_gb: Optional[Dict[str, float]] = None,
+    default_session_memory_gb: float = 0.0,
+    log_folder_path: Optional[FolderPathType] = None,
+    manifest_file_path: Optional[FilePathType] = None,
+    session_to_source_paths: Optional[Dict[str, List[FilePathType]]] = None,
+    verbose: bool = True,
+) -> List[dict]:
+    """Convert several sessions on a pool of worker processes.
+
+    Each session is converted in a fresh process, so that a failure (or a crash of the worker) only affects that
+    session and the memory is returned to the system once it is done. A session only starts when its estimated
+    memory fits in the remaining `memory_budget_gb`, sessions that would exceed the whole budget are run alone.
+
+    Parameters
+    ----------
+    convert_session: callable
+        The function converting one session, e.g. `session_to_nwb` or `dual_imaging_session_to_nwb`.
+        It must be importable from the worker processes (defined at the module level) and should return the path
+        to the NWB file it wrote.
+    session_to_kwargs: dict
+        The keyword arguments passed to `convert_session`, for each session id.
+    max_workers: int, optional
+        The maximum number of sessions converted at the same time, defaults to the number of CPUs.
+    memory_budget_gb: float, optional
+        The total memory, in GB, available to the sessions converted at the same time. No limit by default.
+    session_to_memory_gb: dict, optional
+        The estimated peak memory of each session, in GB.
+    default_session_memory_gb: float, default: 0.0
+        The estimated peak memory of the sessions missing from `session_to_memory_gb`, in GB.
+    log_folder_path: str or Path, optional
+        The folder where each session writes its own log file and where the summary is saved.
+        By default, the output of the workers is not redirected.
+    manifest_file_path: str or Path, optional
+        The JSON manifest recording the conversion of each session. When given, the sessions that are up to date
+        (converted successfully from the same source files with the same converter version) are skipped and only the
+        new, failed, interrupted or stale sessions are converted.
+    session_to_source_paths: dict, optional
+        The files and folders read by the conversion of each session, used to detect the stale sessions.
+        Sessions without source paths are only compared on their keyword arguments.
+    verbose: bool, default: True
+        Whether to print the progress and the final summary.
+
+    Returns
+    -------
+    results: list of dict
+        For each session, the status, error, wall time, output size and throughput of the conversion.
+        The status is one of "succeeded", "failed" or "skipped".
+    """
+    max_workers = max_workers or os.cpu_count()
+    session_to_memory_gb = session_to_memory_gb or dict()
+    session_to_source_paths = session_to_source_paths or dict()
+    if log_folder_path is not None:
+        log_folder_path = Path(log_folder_path)
+        log_folder_path.mkdir(parents=True, exist_ok=True)
+
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    pending_session_ids = list(session_to_kwargs)
+    running_sessions = dict()
+    results = dict()
+
+    manifest = ConversionManifest(file_path=manifest_file_path) if manifest_file_path is not None else None
+    session_to_source_hash = dict()
+    if manifest is not None:
+        converter_version = get_converter_version()
+        for session_id in list(pending_session_ids):
+            source_hash = get_source_hash(
+                source_paths=session_to_source_paths.get(session_id, []),
+                session_kwargs=session_to_kwargs[session_id],
+            )
+            session_to_source_hash[session_id] = source_hash
+            if manifest.is_up_to_date(session_id, source_hash=source_hash, converter_version=converter_version):
+                pending_session_ids.remove(session_id)
+                entry = manifest.get_session_entry(session_id)
+                results[session_id] = _add_output_statistics(
+                    dict(
+                        session_id=session_id,
+                        status="skipped",
+                        nwbfile_path=entry["nwbfile_path"],
+                        error=None,
+                        wall_time=None,
+                    )
+                )
+                if verbose:
+                    print(f"Session {session_id} is up to date, skipping it")
+
+    def get_session_memory_gb(session_id: str) -> float:
+        return session_to_memory_gb.get(session_id, default_session_memory_gb)
+
+    def get_next_session_id() -> Optional[str]:
+        if memory_budget_gb is None or not running_sessions:
+            return pending_session_ids[0]
+        available_memory_gb = memory_budget_gb - sum(map(get_session_memory_gb, running_sessions))
+        return next(
+            (
+                session_id
+                for session_id in pending_session_ids
+                if get_session_memory_gb(session_id) <= available_memory_gb
+            ),
+            None,
+        )
+
+    def collect_result(result: dict) -> None:
+        session_id = result["session_id"]
+        process = running_sessions.pop(session_id)
+        process.join()
+        results[session_id] = _add_output_statistics(result)
+        if manifest is not None:
+            manifest.update_session(
+                session_id,
+                status=result["status"],
+                nwbfile_path=result["nwbfile_path"],
+                error=result["error"],
+                wall_time=result["wall_time"],
+            )
+        if verbose:
+            print(f"Session {session_id} {result['status']} in {result['wall_time']:.1f} s")
+
+    batch_start_time = time.perf_counter()
+    session_start_times = dict()
+    while pending_session_ids or running_sessions:
+        while pending_session_ids and len(running_sessions) < max_workers:
+            session_id = get_next_session_id()
+            if session_id is None:
+                break
+            pending_session_ids.remove(session_id)
+            log_file_path = str(log_folder_path / f"{session_id}.log") if log_folder_path is not None else None
+            process = context.Process(
+                target=_convert_session_in_worker,
+                args=(convert_session, session_id, session_to_kwargs[session_id], log_file_path, result_queue),
+                name=f"convert-{session_id}",
+            )
+            if manifest is not None:
+                # a session left "running" by an interrupted batch is never considered up to date
+                manifest.update_session(
+                    session_id,
+                    status="running",
+                    source_hash=session_to_source_hash[session_id],
+                    converter_version=converter_version,
+                )
+            process.start()
+            running_sessions[session_id] = process
+            session_start_times[session_id] = time.perf_counter()
+            if verbose:
+                print(f"Converting session {session_id} (log: {log_file_path})")
+
+        try:
+            collect_result(result_queue.get(timeout=1.0))
+            continue
+        except queue.Empty:
+            pass
+
+        # workers killed before reporting (e.g. by the out-of-memory killer) are recorded as failed
+        for session_id, process in list(running_sessions.items()):
+            if process.is_alive():
+                continue
+            try:
+                collect_result(result_queue.get(timeout=1.0))
+                continue
+            except queue.Empty:
+                pass
+            if session_id in running_sessions and not process.is_alive():
+                collect_result(
+                    dict(
+                        session_id=session_id,
+                        status="failed",
+                        nwbfile_path=None,
+                        error=f"The worker process exited with code {process.exitcode}.",
+                        wall_time=time.perf_counter() - session_start_times[session_id],
+                    )
+                )
+
+    total_wall_time = time.perf_counter() - batch_start_time
+    results = [results[session_id] for session_id in session_to_kwargs]
+    if verbose:
+        _print_summary(results=results, total_wall_time=total_wall_time)
+    if log_folder_path is not None:
+        summary = dict(total_wall_time=total_wall_time, sessions=results)
+        with open(log_folder_path / "batch_conversion_summary.json", "w") as file:
+            json.dump(summary, file, indent=2)
+
+    return results
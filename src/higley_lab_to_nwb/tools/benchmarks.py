@@ -0,0 +1,718 @@
+"""Benchmarks of the extractors, interfaces and session conversions of the package on synthetic data.
+
+The source files are generated with `higley_lab_to_nwb.tools.synthetic_data` at the sizes of `BENCHMARK_SIZES`, and
+each benchmark is measured with a ConversionProfiler (wall time, CPU time, bytes read and written, peak memory).
+The throughput is the number of bytes returned by the benchmarked calls (or written to the NWB file for the
+conversions) divided by the wall time.
+
+The Spike2 .smrx files can't be synthesized, so the TTL detection is measured on synthetic analog traces and the
+session conversion aligns the imaging on them in place of the Spike2 recording.
+
+Run the module as a script to write the report of all the benchmarks:
+
+    python -m higley_lab_to_nwb.tools.benchmarks
+
+Functions
+---------
+generate_benchmark_data
+    Generate the synthetic source files of a benchmark size.
+benchmark_extractors
+    Measure the frame and trace reading paths of the extractors.
+benchmark_ttl_detection
+    Measure the detection of the TTL pulses and the reading of the processed Spike2 signals.
+benchmark_session_conversion
+    Measure the conversion of a synthetic dual imaging session, interface by interface.
+benchmark_read_latency
+    Measure the latency of the frame-wise and pixel-wise reads of the photon series of an HDF5 or Zarr NWB file.
+run_benchmarks
+    Generate the data and run all the benchmarks for several sizes.
+
+Classes
+-------
+SyntheticSessionNWBConverter
+    The Benisty 2024 converter, aligned on synthetic TTL pulses in place of the Spike2 recording.
+"""
+
+import itertools
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Literal, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+import h5py
+import numpy as np
+from neuroconv.tools.signal_processing import get_rising_frames_from_ttl
+from neuroconv.utils import FilePathType, FolderPathType, dict_deep_update, load_dict_from_file
+
+from higley_lab_to_nwb.benisty_2024 import Benisty2024NWBConverter
+from higley_lab_to_nwb.extractors import (
+    CidanSegmentationExtractor,
+    MesoscopicImagingMultiTiffSingleFrameExtractor,
+    MesoscopicImagingMultiTiffStackExtractor,
+    ParcellsSegmentationExtractor,
+    ProcessedImagingExtractor,
+)
+from higley_lab_to_nwb.lohani_2022.utils import get_channel_trace_from_mat, get_event_times_from_mat
+from higley_lab_to_nwb.tools.conversion_estimate import estimate_conversion
+from higley_lab_to_nwb.tools.conversion_manifest import get_nwbfile_size
+from higley_lab_to_nwb.tools.conversion_profiler import ConversionProfiler
+from higley_lab_to_nwb.tools.synthetic_data import (
+    generate_ttl_trace,
+    write_cidan_output,
+    write_facemap_proc_mat,
+    write_parcellation_mat,
+    write_processed_imaging_mat,
+    write_round_robin_tiff_stacks,
+    write_single_frame_tiff_folder,
+    write_smrx_signals_mat,
+)
+
+BENCHMARK_SIZES = dict(
+    small=dict(num_frames=200, num_rows=128, num_columns=128, num_rois=25, num_files=2, num_components=50),
+    medium=dict(num_frames=1000, num_rows=256, num_columns=256, num_rois=100, num_files=4, num_components=100),
+    large=dict(num_frames=5000, num_rows=512, num_columns=512, num_rois=400, num_files=10, num_components=500),
+)
+SAMPLING_FREQUENCY = 10.0
+# the interfaces of the synthetic session and the TTL channel they are aligned on
+_INTERFACE_TO_TTL_CHANNEL_NAME = dict(
+    OnePhotonImaging="TTLSignalBlueLED",
+    DffOnePhotonImaging="TTLSignalBlueLED",
+    HemodynamicCorrectedOnePhotonImaging="TTLSignalBlueLED",
+    OnePhotonImagingIsosbestic="TTLSignalVioletLED",
+    DffOnePhotonImagingIsosbestic="TTLSignalVioletLED",
+)
+
+
+class SyntheticSessionNWBConverter(Benisty2024NWBConverter):
+    """The Benisty 2024 converter, aligning the imaging on the first TTL pulse of synthetic LED traces."""
+
+    def __init__(
+        self,
+        source_data: Dict[str, dict],
+        ophys_metadata: Dict[str, dict],
+        ttl_traces: Dict[str, tuple],
+        verbose: bool = False,
+        profile: bool = False,
+        plan_datasets: bool = True,
+        output_layout: Literal["single_file", "multi_file"] = "single_file",
+        backend: Literal["hdf5", "zarr"] = "hdf5",
+        access_pattern_io_overrides: Optional[Dict[str, dict]] = None,
+    ):
+        """Create the data interfaces of a synthetic session.
+
+        Parameters
+        ----------
+        ttl_traces: dict
+            The (times, trace) of the "TTLSignalBlueLED" and "TTLSignalVioletLED" channels, see `generate_ttl_trace`.
+        """
+        self.ttl_traces = ttl_traces
+        super().__init__(
+            source_data=source_data,
+            ophys_metadata=ophys_metadata,
+            verbose=verbose,
+            profile=profile,
+            plan_datasets=plan_datasets,
+            output_layout=output_layout,
+            backend=backend,
+            access_pattern_io_overrides=access_pattern_io_overrides,
+        )
+
+    def temporally_align_data_interfaces(self):
+        for interface_name, ttl_channel_name in _INTERFACE_TO_TTL_CHANNEL_NAME.items():
+            if interface_name not in self.data_interface_objects:
+                continue
+            times, trace = self.ttl_traces[ttl_channel_name]
+            ttl_times = times[get_rising_frames_from_ttl(trace)]
+            self.data_interface_objects[interface_name].set_aligned_starting_time(ttl_times[0])
+
+
+def generate_benchmark_data(folder_path: FolderPathType, size: str = "small", seed: int = 0) -> dict:
+    """Generate the synthetic source files of a benchmark size.
+
+    Parameters
+    ----------
+    folder_path: str or Path
+        The folder where the files are written.
+    size: str, default: "small"
+        The name of the size in BENCHMARK_SIZES.
+    seed: int, default: 0
+        The seed of the random data.
+
+    Returns
+    -------
+    data: dict
+        The paths to the generated files and the parameters of the size.
+    """
+    folder_path = Path(folder_path)
+    parameters = BENCHMARK_SIZES[size]
+    num_frames, num_rows, num_columns = parameters["num_frames"], parameters["num_rows"], parameters["num_columns"]
+    image_size = [num_rows, num_columns]
+
+    data = dict(parameters, size=size, image_size=image_size, session_id="20240101_00001")
+    # two channels alternating frame by frame, split over the stacks
+    data["tiff_stacks_folder_path"] = folder_path / "tiff_stacks"
+    write_round_robin_tiff_stacks(
+        folder_path=data["tiff_stacks_folder_path"],
+        num_files=parameters["num_files"],
+        frames_per_file=-(-2 * num_frames // parameters["num_files"]),
+        num_rows=num_rows,
+        num_columns=num_columns,
+        seed=seed,
+    )
+    # three channels alternating file by file, each frame holds the two halves of the field of view
+    data["single_frame_folder_path"] = folder_path / "single_frames"
+    write_single_frame_tiff_folder(
+        folder_path=data["single_frame_folder_path"],
+        session_id=data["session_id"],
+        num_frames=3 * num_frames,
+        num_rows=num_rows,
+        seed=seed,
+    )
+    data["processed_1p_file_path"] = write_processed_imaging_mat(
+        file_path=folder_path / "final_dFoF.mat",
+        num_frames=num_frames,
+        num_rows=num_rows,
+        num_columns=num_columns,
+        configuration="1p",
+        process_types=("blue", "uv", "green"),
+        seed=seed,
+    )
+    data["processed_dual_file_paths"] = {
+        process_type: write_processed_imaging_mat(
+            file_path=folder_path / file_name,
+            num_frames=num_frames,
+            num_rows=num_rows,
+            num_columns=num_columns,
+            configuration="dual",
+            process_types=(process_type,),
+            seed=seed,
+        )
+        for process_type, file_name in [
+            ("dff_blue", "FIR_dff_blue.mat"),
+            ("dff_uv", "FIR_dff_uv.mat"),
+            ("dff_final", "FIR_DFF_patch11_final_dFoF.mat"),
+        ]
+    }
+    data["parcellation_file_paths"] = {
+        mat_version: write_parcellation_mat(
+            file_path=folder_path / f"parcells_v{mat_version}.mat",
+            num_frames=num_frames,
+            num_rois=parameters["num_rois"],
+            image_size=image_size,
+            mat_version=mat_version,
+            seed=seed,
+        )
+        for mat_version in ("5", "7.3")
+    }
+    data["cidan_file_paths"] = {
+        mat_version: write_cidan_output(
+            folder_path=folder_path / f"cidan_v{mat_version}",
+            num_frames=num_frames,
+            num_rois=parameters["num_rois"],
+            image_size=image_size,
+            mat_version=mat_version,
+            seed=seed,
+        )
+        for mat_version in ("5", "7.3")
+    }
+    data["facemap_file_path"] = write_facemap_proc_mat(
+        file_path=folder_path / f"{data['session_id']}_proc.mat",
+        num_frames=num_frames,
+        num_components=parameters["num_components"],
+        seed=seed,
+    )
+    duration = num_frames / SAMPLING_FREQUENCY + 2.0
+    data["smrx_signals_file_path"] = write_smrx_signals_mat(
+        file_path=folder_path / "smrx_signals.mat", duration=duration, seed=seed
+    )
+    # the blue and violet LEDs alternate, each at the imaging rate
+    data["ttl_traces"] = dict(
+        TTLSignalBlueLED=generate_ttl_trace(duration=duration, pulse_rate=SAMPLING_FREQUENCY, seed=seed),
+        TTLSignalVioletLED=generate_ttl_trace(
+            duration=duration, pulse_rate=SAMPLING_FREQUENCY, start_time=1.0 + 0.5 / SAMPLING_FREQUENCY, seed=seed
+        ),
+    )
+    return data
+
+
+def _measure(profiler: ConversionProfiler, benchmark_name: str, stage: str, function: Callable[[], int]) -> dict:
+    """Profile `function`, which returns the number of bytes it processed, and return the benchmark record."""
+    with profiler.profile(interface_name=benchmark_name, stage=stage):
+        data_bytes = function()
+    record = dict(profiler.records[(benchmark_name, stage)], data_bytes=data_bytes)
+    record["throughput_mb_per_s"] = data_bytes / 1e6 / record["wall_time_s"] if data_bytes else None
+    return record
+
+
+def _read_video(imaging_extractor, frames_per_read: int) -> int:
+    num_frames = imaging_extractor.get_num_frames()
+    num_bytes = 0
+    for start_frame in range(0, num_frames, frames_per_read):
+        end_frame = min(start_frame + frames_per_read, num_frames)
+        # memory-mapped frames are copied, so that they are read from the disk
+        num_bytes += np.array(imaging_extractor.get_video(start_frame=start_frame, end_frame=end_frame)).nbytes
+    return num_bytes
+
+
+def _read_traces(segmentation_extractor, name: str, frames_per_read: int) -> int:
+    num_frames = segmentation_extractor.get_num_frames()
+    num_bytes = 0
+    for start_frame in range(0, num_frames, frames_per_read):
+        end_frame = min(start_frame + frames_per_read, num_frames)
+        traces = segmentation_extractor.get_traces(start_frame=start_frame, end_frame=end_frame, name=name)
+        num_bytes += np.array(traces).nbytes
+    return num_bytes
+
+
+def benchmark_extractors(data: dict, frames_per_read: int = 100) -> List[dict]:
+    """Measure the frame and trace reading paths of the extractors on the files of `generate_benchmark_data`.
+
+    Every extractor is measured for its creation ("__init__") and for the reading of all its frames or traces in
+    blocks of `frames_per_read` frames ("get_video", "get_traces"), the segmentation extractors also for the building
+    of the dense image masks ("get_roi_image_masks").
+
+    Parameters
+    ----------
+    data: dict
+        The output of `generate_benchmark_data`.
+    frames_per_read: int, default: 100
+        The number of frames read by each call.
+
+    Returns
+    -------
+    records: list of dict
+        One record per (benchmark, stage).
+    """
+    profiler = ConversionProfiler()
+    records = []
+    extractors = dict()
+
+    def create_extractor(benchmark_name: str, extractor_class: type, **kwargs) -> int:
+        extractors[benchmark_name] = extractor_class(**kwargs)
+        return 0
+
+    imaging_sources = dict(
+        MesoscopicImagingMultiTiffStackExtractor=(
+            MesoscopicImagingMultiTiffStackExtractor,
+            dict(
+                folder_path=data["tiff_stacks_folder_path"],
+                file_pattern="widefield*.tif",
+                number_of_channels=2,
+                channel_first_frame_index=0,
+                sampling_frequency=SAMPLING_FREQUENCY,
+            ),
+        ),
+        MesoscopicImagingMultiTiffSingleFrameExtractor=(
+            MesoscopicImagingMultiTiffSingleFrameExtractor,
+            dict(
+                folder_path=data["single_frame_folder_path"],
+                file_pattern=data["session_id"],
+                number_of_channels=3,
+                channel_first_frame_index=0,
+                sampling_frequency=SAMPLING_FREQUENCY,
+            ),
+        ),
+        ProcessedImagingExtractor1p=(
+            ProcessedImagingExtractor,
+            dict(
+                file_path=data["processed_1p_file_path"],
+                sampling_frequency=SAMPLING_FREQUENCY,
+                process_type="blue",
+            ),
+        ),
+        ProcessedImagingExtractorDual=(
+            ProcessedImagingExtractor,
+            dict(
+                file_path=data["processed_dual_file_paths"]["dff_blue"],
+                sampling_frequency=SAMPLING_FREQUENCY,
+                process_type="dff_blue",
+            ),
+        ),
+    )
+    for benchmark_name, (extractor_class, kwargs) in imaging_sources.items():
+        records.append(
+            _measure(
+                profiler,
+                benchmark_name,
+                "__init__",
+                lambda: create_extractor(benchmark_name, extractor_class, **kwargs),
+            )
+        )
+        records.append(
+            _measure(
+                profiler,
+                benchmark_name,
+                "get_video",
+                lambda: _read_video(extractors[benchmark_name], frames_per_read=frames_per_read),
+            )
+        )
+
+    segmentation_sources = dict()
+    for mat_version in ("5", "7.3"):
+        segmentation_sources[f"ParcellsSegmentationExtractorV{mat_version}"] = (
+            ParcellsSegmentationExtractor,
+            dict(
+                file_path=data["parcellation_file_paths"][mat_version],
+                sampling_frequency=SAMPLING_FREQUENCY,
+                image_size=data["image_size"],
+            ),
+            "raw",
+        )
+        segmentation_sources[f"CidanSegmentationExtractorV{mat_version}"] = (
+            CidanSegmentationExtractor,
+            dict(
+                **data["cidan_file_paths"][mat_version],
+                sampling_frequency=SAMPLING_FREQUENCY,
+                image_size=data["image_size"],
+            ),
+            "denoised",
+        )
+    for benchmark_name, (extractor_class, kwargs, trace_name) in segmentation_sources.items():
+        records.append(
+            _measure(
+                profiler,
+                benchmark_name,
+                "__init__",
+                lambda: create_extractor(benchmark_name, extractor_class, **kwargs),
+            )
+        )
+        records.append(
+            _measure(
+                profiler,
+                benchmark_name,
+                "get_traces",
+                lambda: _read_traces(extractors[benchmark_name], name=trace_name, frames_per_read=frames_per_read),
+            )
+        )
+        records.append(
+            _measure(
+                profiler,
+                benchmark_name,
+                "get_roi_image_masks",
+                lambda: extractors[benchmark_name].get_roi_image_masks().nbytes,
+            )
+        )
+
+    return records
+
+
+def benchmark_ttl_detection(data: dict) -> List[dict]:
+    """Measure the detection of the TTL pulses and the reading of the processed Spike2 signals.
+
+    Parameters
+    ----------
+    data: dict
+        The output of `generate_benchmark_data`.
+
+    Returns
+    -------
+    records: list of dict
+        One record per (benchmark, stage).
+    """
+    profiler = ConversionProfiler()
+    records = []
+    for channel_name, (_, trace) in data["ttl_traces"].items():
+        records.append(
+            _measure(
+                profiler, channel_name, "get_rising_frames_from_ttl", lambda: get_rising_frames_from_ttl(trace).nbytes
+            )
+        )
+
+    def read_smrx_signals() -> int:
+        wheel_speed, _ = get_channel_trace_from_mat(
+            file_path=data["smrx_signals_file_path"], variable_name="wheelspeed"
+        )
+        start_times, stop_times = get_event_times_from_mat(
+            file_path=data["smrx_signals_file_path"],
+            start_time_variable_name="wheelOn",
+            end_time_variable_name="wheelOff",
+        )
+        return wheel_speed.nbytes + start_times.nbytes + stop_times.nbytes
+
+    records.append(_measure(profiler, "smrx_signals", "read_mat", read_smrx_signals))
+    return records
+
+
+def benchmark_session_conversion(
+    data: dict,
+    nwbfile_path: FilePathType,
+    pipelined_write: bool = True,
+    plan_datasets: bool = True,
+    backend: Literal["hdf5", "zarr"] = "hdf5",
+) -> List[dict]:
+    """Measure the conversion of a synthetic dual imaging session, interface by interface.
+
+    The session has the raw and processed widefield imaging, the CIDAN segmentation and the Facemap output, and is
+    converted by the Benisty 2024 converter.
+
+    Parameters
+    ----------
+    data: dict
+        The output of `generate_benchmark_data`.
+    nwbfile_path: str or Path
+        The path to the NWB file to write, overwritten if it exists.
+    pipelined_write: bool, default: True
+        Whether the imaging data is written with the pipelined engine.
+    plan_datasets: bool, default: True
+        Whether the chunking and compression are planned per dataset (see `configure_datasets`), otherwise the
+        defaults of neuroconv are used.
+    backend: {"hdf5", "zarr"}, default: "hdf5"
+        The backend of the NWB file.
+
+    Returns
+    -------
+    records: list of dict
+        The records of the profiler of the converter, and a "session" record for the whole conversion with the size
+        of the NWB file (or Zarr folder) as number of bytes. Each record has the "category" and the "estimated_bytes"
+        (read and written) of the header-only estimate of its interface, to calibrate the estimate on the measured
+        wall times (see `calibrate_throughputs`).
+    """
+    source_data = dict()
+    conversion_options = dict()
+    for photon_series_index, (interface_name, channel_first_frame_index) in enumerate(
+        [("OnePhotonImaging", 0), ("OnePhotonImagingIsosbestic", 1)]
+    ):
+        source_data[interface_name] = dict(
+            folder_path=str(data["tiff_stacks_folder_path"]),
+            file_pattern="widefield*.tif",
+            number_of_channels=2,
+            channel_first_frame_index=channel_first_frame_index,
+            sampling_frequency=SAMPLING_FREQUENCY,
+        )
+        conversion_options[interface_name] = dict(
+            photon_series_type="OnePhotonSeries",
+            photon_series_index=photon_series_index,
+            pipelined_write=pipelined_write,
+        )
+    for photon_series_index, (interface_name, process_type) in enumerate(
+        [
+            ("DffOnePhotonImaging", "dff_blue"),
+            ("DffOnePhotonImagingIsosbestic", "dff_uv"),
+            ("HemodynamicCorrectedOnePhotonImaging", "dff_final"),
+        ],
+        start=2,
+    ):
+        source_data[interface_name] = dict(
+            file_path=str(data["processed_dual_file_paths"][process_type]),
+            sampling_frequency=SAMPLING_FREQUENCY,
+            process_type=process_type,
+        )
+        conversion_options[interface_name] = dict(
+            photon_series_type="OnePhotonSeries",
+            photon_series_index=photon_series_index,
+            parent_container="processing/ophys",
+            pipelined_write=pipelined_write,
+        )
+    source_data["CIDANSegmentation"] = dict(
+        **{key: str(value) for key, value in data["cidan_file_paths"]["7.3"].items()},
+        sampling_frequency=SAMPLING_FREQUENCY,
+        image_size=data["image_size"],
+    )
+    source_data["FacemapInterface"] = dict(
+        mat_file_path=str(data["facemap_file_path"]),
+        svd_mask_names=["Face", "Whiskers"],
+        first_n_components=data["num_components"],
+        verbose=False,
+    )
+
+    benisty_2024_folder_path = Path(__file__).parent.parent / "benisty_2024"
+    ophys_metadata = load_dict_from_file(
+        benisty_2024_folder_path / "metadata" / "benisty_2024_dual_ophys_metadata.yaml"
+    )
+    converter = SyntheticSessionNWBConverter(
+        source_data=source_data,
+        ophys_metadata=ophys_metadata,
+        ttl_traces=data["ttl_traces"],
+        profile=True,
+        plan_datasets=plan_datasets,
+        backend=backend,
+    )
+    metadata = converter.get_metadata()
+    metadata = dict_deep_update(metadata, load_dict_from_file(benisty_2024_folder_path / "benisty_2024_metadata.yaml"))
+    metadata["NWBFile"].update(session_id=data["session_id"], session_start_time=datetime.now(ZoneInfo("US/Eastern")))
+    metadata["Subject"].update(subject_id="synthetic")
+
+    nwbfile_path = Path(nwbfile_path)
+
+    def run_conversion() -> int:
+        converter.run_conversion(
+            metadata=metadata, nwbfile_path=nwbfile_path, conversion_options=conversion_options, overwrite=True
+        )
+        return get_nwbfile_size(nwbfile_path)
+
+    estimate = {
+        record["interface_name"]: record
+        for record in estimate_conversion(
+            source_data=source_data,
+            data_interface_classes=converter.data_interface_classes,
+            conversion_options=conversion_options,
+        )
+    }
+    session_record = _measure(converter.profiler, "session", "conversion", run_conversion)
+    interface_records = [record for record in converter.profiler.get_report() if record["interface_name"] != "session"]
+    records = interface_records + [session_record]
+    for record in records:
+        interface_estimate = estimate.get(record["interface_name"])
+        if interface_estimate is not None:
+            record.update(
+                category=interface_estimate["category"],
+                estimated_bytes=interface_estimate["bytes_to_read"] + interface_estimate["bytes_to_write"],
+            )
+    return records
+
+
+def benchmark_read_latency(nwbfile_path: FilePathType, num_reads: int = 20, seed: int = 0) -> List[dict]:
+    """Measure the latency of the frame-wise and pixel-wise reads of the photon series of an HDF5 or Zarr NWB file.
+
+    Each photon series is read `num_reads` times at random frames ("read_frame") and random pixels ("read_pixel_trace",
+    the whole time series of one pixel), with the HDF5 chunk cache disabled so that every read decompresses its chunks
+    (Zarr has no chunk cache).
+
+    Parameters
+    ----------
+    nwbfile_path: str or Path
+        The path to the NWB file, an HDF5 file or a Zarr folder.
+    num_reads: int, default: 20
+        The number of reads of each kind per photon series.
+    seed: int, default: 0
+        The seed of the random frames and pixels.
+
+    Returns
+    -------
+    records: list of dict
+        One record per (photon series, read kind), with the mean latency of a read in seconds.
+    """
+    random_number_generator = np.random.default_rng(seed)
+    photon_series_paths = []
+
+    def find_photon_series(name: str, h5py_object) -> None:
+        if not hasattr(h5py_object, "shape") and h5py_object.attrs.get("neurodata_type") in (
+            "OnePhotonSeries",
+            "TwoPhotonSeries",
+        ):
+            photon_series_paths.append(name)
+
+    is_zarr = Path(nwbfile_path).is_dir()
+    if is_zarr:
+        import zarr
+
+        file = zarr.open_group(str(nwbfile_path), mode="r")
+    else:
+        file = h5py.File(nwbfile_path, "r", rdcc_nbytes=0)
+
+    records = []
+    try:
+        file.visititems(find_photon_series)
+        for photon_series_path in photon_series_paths:
+            dataset = file[photon_series_path]["data"]
+            frame_indices = random_number_generator.integers(0, dataset.shape[0], size=num_reads)
+            pixel_indices = [random_number_generator.integers(0, size, size=num_reads) for size in dataset.shape[1:3]]
+            read_functions = dict(
+                read_frame=lambda read_index: dataset[frame_indices[read_index]],
+                read_pixel_trace=lambda read_index: dataset[
+                    :, pixel_indices[0][read_index], pixel_indices[1][read_index]
+                ],
+            )
+            for stage, read_function in read_functions.items():
+                start_time = time.perf_counter()
+                for read_index in range(num_reads):
+                    read_function(read_index)
+                records.append(
+                    dict(
+                        interface_name=photon_series_path,
+                        stage=stage,
+                        calls=num_reads,
+                        wall_time_s=(time.perf_counter() - start_time) / num_reads,
+                        chunks=dataset.chunks,
+                        compression=str(dataset.compressor) if is_zarr else dataset.compression,
+                    )
+                )
+    finally:
+        if not is_zarr:
+            file.close()
+    return records
+
+
+def run_benchmarks(
+    folder_path: FolderPathType,
+    sizes: Sequence[str] = ("small", "medium"),
+    report_file_path: Optional[FilePathType] = None,
+    frames_per_read: int = 100,
+) -> List[dict]:
+    """Generate the data and run all the benchmarks for several sizes.
+
+    Parameters
+    ----------
+    folder_path: str or Path
+        The folder where the synthetic data and the NWB files are written, one subfolder per size.
+    sizes: list of str, default: ("small", "medium")
+        The names of the sizes in BENCHMARK_SIZES.
+    report_file_path: str or Path, optional
+        The path to the JSON report, by default the report is only returned.
+    frames_per_read: int, default: 100
+        The number of frames read by each call of the extractor benchmarks.
+
+    Returns
+    -------
+    records: list of dict
+        One record per (size, benchmark, stage). The conversion records are made with and without the planned
+        chunking and compression ("dataset_layout" is "planned" or "default") and with the HDF5 and the Zarr
+        backends ("backend"), each followed by the read latencies of the photon series of the NWB file written.
+    """
+    folder_path = Path(folder_path)
+    records = []
+    for size in sizes:
+        print(f"Generating the '{size}' synthetic data")
+        data = generate_benchmark_data(folder_path=folder_path / size, size=size)
+        size_records = benchmark_extractors(data=data, frames_per_read=frames_per_read)
+        size_records += benchmark_ttl_detection(data=data)
+        for backend, pipelined_write, plan_datasets in itertools.product(
+            ("hdf5", "zarr"), (False, True), (False, True)
+        ):
+            write_mode = "pipelined" if pipelined_write else "iterative"
+            dataset_layout = "planned" if plan_datasets else "default"
+            print(
+                f"Converting the '{size}' synthetic session to {backend} with the {write_mode} imaging write "
+                f"({dataset_layout})"
+            )
+            nwbfile_suffix = ".nwb.zarr" if backend == "zarr" else ".nwb"
+            nwbfile_path = folder_path / size / f"synthetic_session_{write_mode}_{dataset_layout}{nwbfile_suffix}"
+            conversion_records = benchmark_session_conversion(
+                data=data,
+                nwbfile_path=nwbfile_path,
+                pipelined_write=pipelined_write,
+                plan_datasets=plan_datasets,
+                backend=backend,
+            )
+            conversion_records += benchmark_read_latency(nwbfile_path=nwbfile_path)
+            size_records += [
+                dict(record, write_mode=write_mode, dataset_layout=dataset_layout, backend=backend)
+                for record in conversion_records
+            ]
+        records += [dict(record, size=size) for record in size_records]
+
+    if report_file_path is not None:
+        report_file_path = Path(report_file_path)
+        report_file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_file_path, "w") as file:
+            json.dump(dict(benchmark_sizes=BENCHMARK_SIZES, benchmarks=records), file, indent=2)
+    return records
+
+
+if __name__ == "__main__":
+
+    # Parameters for the benchmarks
+    root_path = Path("G:")
+    folder_path = root_path / "Higley-conversion_benchmarks"
+    sizes = ["small", "medium"]
+    records = run_benchmarks(
+        folder_path=folder_path, sizes=sizes, report_file_path=folder_path / "benchmark_report.json"
+    )
+    for record in records:
+        throughput = f"{record['throughput_mb_per_s']:.1f} MB/s" if record.get("throughput_mb_per_s") else ""
+        print(
+            f"{record['size']:<8}{record['interface_name']:<48}{record['stage']:<28}"
+            f"{record['wall_time_s']:>10.3f} s {throughput:>14}"
+        )
@@ -0,0 +1,199 @@
+"""Spatially binned and temporally decimated copies of the imaging series, written from the frames read to write them.
+
+Browsing a full resolution 256x256 or 512x512 movie reads far more data than a quick look needs. The pipelined write
+(see `write_imaging_data_pipelined`) can write, in the same pass, a copy of the series where each frame is averaged
+over square bins of pixels (e.g. 4x4) and consecutive frames are averaged together, so it costs no second read of the
+sources. The reader threads bin each block of frames they read with a BinnedSeriesWriter and the writer of the series
+writes the binned block, the blocks being aligned on the frames averaged together.
+
+The binned series is a photon series of the ophys processing module, of the same type, imaging plane, unit, conversion
+and offset as the full resolution series, named after it with the binning as suffix (e.g. "OnePhotonSeriesBinned4x4"
+or "OnePhotonSeriesBinned4x4Decimated2"). Its frames are in the orientation of the full resolution frames, the bins
+on the edges average the remaining pixels and frames, and the integer series are rounded to their dtype. Each binned
+frame is timed at the first of its frames.
+
+Functions
+---------
+get_binned_series_name
+    Return the name of the binned copy of a photon series.
+bin_frames
+    Average a block of frames over square bins of pixels and groups of consecutive frames.
+add_deferred_binned_series
+    Add the binned copy of a photon series to an NWB file, with data written after the file is closed.
+
+Classes
+-------
+BinnedSeriesWriter
+    The binning of the blocks of frames of a series, for the dataset of its binned copy.
+"""
+
+import math
+from typing import TYPE_CHECKING, Tuple, Union
+
+import numpy as np
+from hdmf.backends.hdf5 import H5DataIO
+from neuroconv.tools.nwb_helpers import get_module
+from pynwb import NWBFile
+from pynwb.ophys import OnePhotonSeries, TwoPhotonSeries
+
+from .pipelined_imaging_write import DeferredDataChunkIterator
+
+if TYPE_CHECKING:
+    import h5py
+    import zarr
+
+
+def get_binned_series_name(photon_series_name: str, spatial_binning: int, temporal_decimation: int = 1) -> str:
+    """Return the name of the binned copy of a photon series, e.g. "OnePhotonSeriesBinned4x4Decimated2"."""
+    name = f"{photon_series_name}Binned{spatial_binning}x{spatial_binning}"
+    if temporal_decimation > 1:
+        name += f"Decimated{temporal_decimation}"
+    return name
+
+
+def bin_frames(frames: np.ndarray, spatial_binning: int, temporal_decimation: int = 1) -> np.ndarray:
+    """Average a block of frames over square bins of pixels and groups of consecutive frames.
+
+    Parameters
+    ----------
+    frames: np.ndarray
+        The (frames, width, height) or (frames, width, height, planes) block of frames.
+    spatial_binning: int
+        The side of the square bins of pixels, in pixels.
+    temporal_decimation: int, default: 1
+        The number of consecutive frames averaged together.
+
+    Returns
+    -------
+    binned_frames: np.ndarray
+        The binned frames, in the dtype of `frames` (rounded for the integer dtypes). The bins on the edges average
+        the remaining pixels and frames.
+    """
+    binned_frames = frames
+    for axis, factor in zip(range(3), (temporal_decimation, spatial_binning, spatial_binning)):
+        if factor > 1:
+            binned_frames = np.add.reduceat(
+                binned_frames, np.arange(0, frames.shape[axis], factor), axis=axis, dtype="float64"
+            )
+    bin_sizes = [
+        np.diff(np.append(np.arange(0, size, factor), size))
+        for size, factor in zip(frames.shape[:3], (temporal_decimation, spatial_binning, spatial_binning))
+    ]
+    bin_counts = np.einsum("i,j,k->ijk", *bin_sizes).reshape(binned_frames.shape[:3] + (1,) * (frames.ndim - 3))
+    binned_frames = binned_frames / bin_counts
+    if np.issubdtype(frames.dtype, np.integer):
+        binned_frames = np.rint(binned_frames)
+    return binned_frames.astype(frames.dtype)
+
+
+class BinnedSeriesWriter:
+    """The binning of the blocks of frames of a series, for the dataset of its binned copy.
+
+    The blocks must start on a multiple of `temporal_decimation` frames, so that no group of averaged frames is split
+    between two blocks.
+    """
+
+    def __init__(
+        self, dataset: Union["h5py.Dataset", "zarr.Array"], spatial_binning: int, temporal_decimation: int = 1
+    ):
+        """Bin the blocks of frames of a series for the dataset of its binned copy.
+
+        Parameters
+        ----------
+        dataset: h5py.Dataset or zarr.Array
+            The dataset of the binned series, opened in a writable file.
+        spatial_binning: int
+            The side of the square bins of pixels, in pixels.
+        temporal_decimation: int, default: 1
+            The number of consecutive frames averaged together.
+        """
+        self.dataset = dataset
+        self.spatial_binning = spatial_binning
+        self.temporal_decimation = temporal_decimation
+
+    def bin_block(self, start_frame: int, frames: np.ndarray) -> Tuple[Tuple[int, ...], np.ndarray]:
+        """Return the offset in the binned dataset and the binned frames of the block of frames at `start_frame`."""
+        if start_frame % self.temporal_decimation:
+            raise ValueError(
+                f"The block starting at frame {start_frame} splits a group of {self.temporal_decimation} frames."
+            )
+        binned_frames = bin_frames(
+            frames=frames, spatial_binning=self.spatial_binning, temporal_decimation=self.temporal_decimation
+        )
+        offset = (start_frame // self.temporal_decimation,) + (0,) * (binned_frames.ndim - 1)
+        return offset, binned_frames.astype(self.dataset.dtype, copy=False)
+
+
+def add_deferred_binned_series(
+    nwbfile: NWBFile,
+    photon_series: Union[OnePhotonSeries, TwoPhotonSeries],
+    spatial_binning: int,
+    temporal_decimation: int = 1,
+) -> str:
+    """Add the binned copy of a photon series to an NWB file, with data written after the file is closed.
+
+    Parameters
+    ----------
+    nwbfile: NWBFile
+        The in-memory NWB file.
+    photon_series: OnePhotonSeries or TwoPhotonSeries
+        The full resolution photon series, with a deferred data iterator (see `DeferredDataChunkIterator`).
+    spatial_binning: int
+        The side of the square bins of pixels, in pixels.
+    temporal_decimation: int, default: 1
+        The number of consecutive frames averaged together.
+
+    Returns
+    -------
+    dataset_path: str
+        The path to the dataset of the binned series in the NWB file.
+    """
+    if spatial_binning < 1 or temporal_decimation < 1:
+        raise ValueError("The spatial binning and the temporal decimation must be positive integers.")
+    data_iterator = photon_series.data.data if isinstance(photon_series.data, H5DataIO) else photon_series.data
+    maxshape = data_iterator.maxshape
+    binned_maxshape = (
+        math.ceil(maxshape[0] / temporal_decimation),
+        math.ceil(maxshape[1] / spatial_binning),
+        math.ceil(maxshape[2] / spatial_binning),
+    ) + tuple(maxshape[3:])
+    binned_chunk_shape = None
+    chunk_shape = data_iterator.recommended_chunk_shape()
+    if chunk_shape is not None:
+        binned_chunk_shape = (min(chunk_shape[0], binned_maxshape[0]),) + binned_maxshape[1:]
+
+    if photon_series.timestamps is not None:
+        timing_kwargs = dict(timestamps=np.asarray(photon_series.timestamps)[::temporal_decimation])
+    else:
+        timing_kwargs = dict(starting_time=photon_series.starting_time, rate=photon_series.rate / temporal_decimation)
+    binning_kwargs = dict(binning=spatial_binning) if isinstance(photon_series, OnePhotonSeries) else dict()
+    averaged_frames = f" and {temporal_decimation} consecutive frames" if temporal_decimation > 1 else ""
+    binned_series = type(photon_series)(
+        name=get_binned_series_name(
+            photon_series_name=photon_series.name,
+            spatial_binning=spatial_binning,
+            temporal_decimation=temporal_decimation,
+        ),
+        description=(
+            f"The frames of '{photon_series.name}' averaged over bins of {spatial_binning}x{spatial_binning} pixels"
+            f"{averaged_frames}, for a quick look at the series."
+        ),
+        imaging_plane=photon_series.imaging_plane,
+        data=H5DataIO(
+            data=DeferredDataChunkIterator(
+                maxshape=binned_maxshape, dtype=data_iterator.dtype, chunk_shape=binned_chunk_shape
+            ),
+            chunks=binned_chunk_shape,
+            compression="gzip",
+            compression_opts=4,
+            shuffle=True,
+        ),
+        unit=photon_series.unit,
+        conversion=photon_series.conversion,
+        offset=photon_series.offset,
+        comments=f"Binned from '{photon_series.name}', each frame is timed at the first of its averaged frames.",
+        **binning_kwargs,
+        **timing_kwargs,
+    )
+    get_module(nwbfile, name="ophys").add(binned_series)
+    return f"/processing/ophys/{binned_series.name}/data"
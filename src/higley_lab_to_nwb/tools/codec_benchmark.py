@@ -0,0 +1,560 @@
+"""Benchmark of the HDF5 compression codecs on chunks of the raw and processed imaging series.
+
+The planned compression of the imaging series (see `higley_lab_to_nwb.tools.dataset_planner`) is gzip with the byte
+shuffle. This harness measures the alternatives on frames of the imaging extractors, real or synthetic: gzip at
+several levels, LZF, and Blosc with zstd or LZ4 through `hdf5plugin`, with no shuffle, the byte shuffle or (Blosc
+only) the bit shuffle, for several chunk shapes, where a None size spans the whole axis (e.g. (16, None, None) for
+chunks of 16 whole frames), so that series of several frame sizes share their chunk shapes. Each configuration is
+written to an in-memory HDF5 file with the filters of h5py, as the converters would write it, and reported with:
+
+- "compression_ratio": the uncompressed bytes divided by the bytes stored.
+- "encode_throughput_mb_per_s": the uncompressed MB written per second, by a single thread.
+- "decode_latency_ms": the median time to read one chunk, with the chunk cache disabled.
+
+The frames are sampled as blocks of consecutive frames at random positions of the series, in the orientation they
+are stored (transposed, see `write_imaging_data_pipelined`). The pipelined write compresses the gzip chunks on
+several threads, while the other codecs are applied by HDF5 in the writer thread: the single-thread throughput
+compares them fairly, but the gzip write scales with the cores.
+
+The Blosc codecs need `hdf5plugin`, which is optional: they are skipped when it is not installed, and it must be
+imported to read the files written with them.
+
+Run the module as a script to benchmark the codecs on the synthetic data and write the report. Its "codec_choices"
+are the configurations compressing best among the ones fast enough to write and to read, by access pattern, and
+`load_codec_choices` turns them into the `access_pattern_io_overrides` of the converters. With the Zarr backend, the
+choices are translated to the equivalent `numcodecs` compressors: Blosc for the Blosc codecs, GZip for gzip without
+shuffle and Blosc with zlib for gzip with the byte shuffle. LZF has no Zarr equivalent.
+
+Functions
+---------
+get_codec_data_io_kwargs
+    Return the H5DataIO or ZarrDataIO compression arguments of a codec configuration.
+sample_imaging_frames
+    Read blocks of consecutive frames at random positions of an imaging extractor, as stored.
+benchmark_codecs
+    Measure the compression ratio, encode throughput and decode latency of codec configurations on frames.
+benchmark_extractor_codecs
+    Measure the codec configurations on the frames of an imaging extractor.
+select_codec_choices
+    Select the best codec configuration of each access pattern.
+run_codec_benchmarks
+    Benchmark the codecs on the synthetic raw and processed imaging and write the report.
+load_codec_choices
+    Return the H5DataIO or ZarrDataIO arguments of the codec choices of a report, by access pattern.
+"""
+
+import itertools
+import json
+import time
+import uuid
+import warnings
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+import h5py
+import numpy as np
+from neuroconv.utils import FilePathType, FolderPathType
+from roiextractors import ImagingExtractor
+
+from .dataset_planner import _clip_chunk_shape
+
+# the codec configurations benchmarked by default, the level is None for the codecs without levels
+DEFAULT_CODECS = (
+    dict(codec="gzip", level=1),
+    dict(codec="gzip", level=4),
+    dict(codec="gzip", level=6),
+    dict(codec="lzf", level=None),
+    dict(codec="blosc_zstd", level=1),
+    dict(codec="blosc_zstd", level=5),
+    dict(codec="blosc_lz4", level=5),
+)
+DEFAULT_SHUFFLES = ("none", "byte", "bit")
+# the encode throughput under which a configuration would slow down the conversion, in MB/s
+DEFAULT_MIN_ENCODE_THROUGHPUT_MB_PER_S = 50.0
+_BLOSC_CODECS = dict(blosc_zstd="zstd", blosc_lz4="lz4")
+
+
+def get_codec_data_io_kwargs(
+    codec: Literal["gzip", "lzf", "blosc_zstd", "blosc_lz4"],
+    level: Optional[int] = None,
+    shuffle: Literal["none", "byte", "bit"] = "byte",
+    backend: Literal["hdf5", "zarr"] = "hdf5",
+) -> dict:
+    """Return the H5DataIO (or h5py `create_dataset`) or ZarrDataIO compression arguments of a codec configuration.
+
+    Parameters
+    ----------
+    codec: {"gzip", "lzf", "blosc_zstd", "blosc_lz4"}
+        The codec, the Blosc ones through `hdf5plugin`.
+    level: int, optional
+        The compression level of gzip (0 to 9) or Blosc (0 to 9), ignored by LZF.
+    shuffle: {"none", "byte", "bit"}, default: "byte"
+        The shuffle filter, the bit shuffle is only available with Blosc.
+    backend: {"hdf5", "zarr"}, default: "hdf5"
+        The backend of the NWB file. With "zarr", the codec is translated to its `numcodecs` compressor.
+
+    Returns
+    -------
+    data_io_kwargs: dict
+        The "compression", "compression_opts" and "shuffle" arguments, or the "compressor" with the Zarr backend.
+
+    Raises
+    ------
+    ImportError
+        If the codec is a Blosc codec and `hdf5plugin` is not installed, with the HDF5 backend.
+    ValueError
+        If the codec has no Zarr equivalent (LZF), with the Zarr backend.
+    """
+    if backend == "zarr":
+        return dict(compressor=_get_zarr_codec_compressor(codec=codec, level=level, shuffle=shuffle))
+    if codec in _BLOSC_CODECS:
+        try:
+            import hdf5plugin
+        except ImportError as error:
+            raise ImportError(f"The '{codec}' codec requires hdf5plugin: pip install hdf5plugin") from error
+        blosc_shuffles = dict(
+            none=hdf5plugin.Blosc.NOSHUFFLE, byte=hdf5plugin.Blosc.SHUFFLE, bit=hdf5plugin.Blosc.BITSHUFFLE
+        )
+        blosc_filter = hdf5plugin.Blosc(cname=_BLOSC_CODECS[codec], clevel=level, shuffle=blosc_shuffles[shuffle])
+        # Blosc shuffles the bytes itself
+        return dict(
+            compression=blosc_filter["compression"],
+            compression_opts=tuple(blosc_filter["compression_opts"]),
+            shuffle=False,
+        )
+    if shuffle == "bit":
+        raise ValueError(f"The bit shuffle is only available with the Blosc codecs, not with '{codec}'.")
+    if codec == "gzip":
+        return dict(compression="gzip", compression_opts=level, shuffle=shuffle == "byte")
+    if codec == "lzf":
+        return dict(compression="lzf", shuffle=shuffle == "byte")
+    raise ValueError(f"Unknown codec '{codec}'.")
+
+
+def _get_zarr_codec_compressor(codec: str, level: Optional[int], shuffle: str):
+    """Return the `numcodecs` compressor of a codec configuration, for the Zarr backend."""
+    from numcodecs import Blosc, GZip
+
+    blosc_shuffles = dict(none=Blosc.NOSHUFFLE, byte=Blosc.SHUFFLE, bit=Blosc.BITSHUFFLE)
+    if codec in _BLOSC_CODECS:
+        return Blosc(cname=_BLOSC_CODECS[codec], clevel=level, shuffle=blosc_shuffles[shuffle])
+    if shuffle == "bit":
+        raise ValueError(f"The bit shuffle is only available with the Blosc codecs, not with '{codec}'.")
+    if codec == "gzip":
+        # numcodecs has no shuffle filter independent of the item size: the shuffled deflate is Blosc's zlib
+        return GZip(level=level) if shuffle == "none" else Blosc(cname="zlib", clevel=level, shuffle=Blosc.SHUFFLE)
+    if codec == "lzf":
+        raise ValueError("The 'lzf' codec has no Zarr equivalent, choose the codecs of a Zarr conversion without it.")
+    raise ValueError(f"Unknown codec '{codec}'.")
+
+
+def sample_imaging_frames(
+    imaging_extractor: ImagingExtractor, num_frames_per_sample: int, num_samples: int = 4, seed: int = 0
+) -> np.ndarray:
+    """Read blocks of consecutive frames at random positions of an imaging extractor, as stored.
+
+    Parameters
+    ----------
+    imaging_extractor: ImagingExtractor
+        The imaging extractor, e.g. a MesoscopicImagingMultiTiffStackExtractor, a
+        MesoscopicImagingMultiTiffSingleFrameExtractor or a ProcessedImagingExtractor.
+    num_frames_per_sample: int
+        The number of consecutive frames of each block.
+    num_samples: int, default: 4
+        The number of blocks.
+    seed: int, default: 0
+        The seed of the positions of the blocks.
+
+    Returns
+    -------
+    frames: np.ndarray
+        The (frames, columns, rows) blocks concatenated along time, in the dtype of the extractor.
+    """
+    num_frames = imaging_extractor.get_num_frames()
+    num_frames_per_sample = min(num_frames_per_sample, num_frames)
+    random_generator = np.random.default_rng(seed)
+    start_frames = np.sort(random_generator.integers(0, num_frames - num_frames_per_sample + 1, size=num_samples))
+    blocks = []
+    for start_frame in start_frames:
+        video = imaging_extractor.get_video(
+            start_frame=int(start_frame), end_frame=int(start_frame) + num_frames_per_sample
+        )
+        video = np.asarray(video).transpose((0, 2, 1) if video.ndim == 3 else (0, 2, 1, 3))
+        blocks.append(video.astype(imaging_extractor.get_dtype(), copy=False))
+    return np.concatenate(blocks, axis=0)
+
+
+def _measure_codec(frames: np.ndarray, chunk_shape: Tuple[int, ...], data_io_kwargs: dict, num_reads: int, seed: int):
+    """Write the frames with a configuration to an in-memory HDF5 file and measure its size, write and read times."""
+    file_name = f"codec_benchmark_{uuid.uuid4().hex}.h5"
+    # without chunk cache, every read decodes its chunk
+    with h5py.File(file_name, "w", driver="core", backing_store=False, rdcc_nbytes=0) as file:
+        dataset = file.create_dataset(
+            "data", shape=frames.shape, dtype=frames.dtype, chunks=chunk_shape, **data_io_kwargs
+        )
+        start_time = time.perf_counter()
+        dataset[...] = frames
+        file.flush()
+        encode_time = time.perf_counter() - start_time
+        stored_bytes = dataset.id.get_storage_size()
+
+        random_generator = np.random.default_rng(seed)
+        chunk_grid = [range(0, size, chunk_size) for size, chunk_size in zip(frames.shape, chunk_shape)]
+        read_times = []
+        for _ in range(num_reads):
+            starts = [int(random_generator.choice(axis_grid)) for axis_grid in chunk_grid]
+            selection = tuple(slice(start, start + chunk_size) for start, chunk_size in zip(starts, chunk_shape))
+            start_time = time.perf_counter()
+            dataset[selection]
+            read_times.append(time.perf_counter() - start_time)
+    return stored_bytes, encode_time, float(np.median(read_times))
+
+
+def benchmark_codecs(
+    frames: np.ndarray,
+    chunk_shapes: Sequence[Tuple[Optional[int], ...]],
+    codecs: Sequence[dict] = DEFAULT_CODECS,
+    shuffles: Sequence[str] = DEFAULT_SHUFFLES,
+    num_reads: int = 20,
+    seed: int = 0,
+) -> List[dict]:
+    """Measure the compression ratio, encode throughput and decode latency of codec configurations on frames.
+
+    Parameters
+    ----------
+    frames: np.ndarray
+        The frames to compress, as stored, see `sample_imaging_frames`.
+    chunk_shapes: list of tuple
+        The chunk shapes to benchmark, clipped to the shape of the frames, a None size spanning the whole axis.
+    codecs: list of dict, default: DEFAULT_CODECS
+        The "codec" and "level" of each codec configuration, see `get_codec_data_io_kwargs`.
+    shuffles: list of str, default: ("none", "byte", "bit")
+        The shuffle filters to combine with each codec, the bit shuffle only with the Blosc codecs.
+    num_reads: int, default: 20
+        The number of chunks read to measure the decode latency.
+    seed: int, default: 0
+        The seed of the chunks read.
+
+    Returns
+    -------
+    records: list of dict
+        One record per (chunk shape, codec, level, shuffle), with the benchmarked "chunks" and the "stored_chunks"
+        they resolve to. The Blosc codecs are skipped with a warning when `hdf5plugin` is not installed.
+    """
+    uncompressed_bytes = frames.nbytes
+    records, skipped_codecs = [], set()
+    for chunk_shape, codec_configuration, shuffle in itertools.product(chunk_shapes, codecs, shuffles):
+        codec, level = codec_configuration["codec"], codec_configuration.get("level")
+        if shuffle == "bit" and codec not in _BLOSC_CODECS:
+            continue
+        try:
+            data_io_kwargs = get_codec_data_io_kwargs(codec=codec, level=level, shuffle=shuffle)
+        except ImportError:
+            skipped_codecs.add(codec)
+            continue
+        stored_chunk_shape = _clip_chunk_shape(chunk_shape=chunk_shape, shape=frames.shape)
+        stored_bytes, encode_time, decode_time = _measure_codec(
+            frames=frames, chunk_shape=stored_chunk_shape, data_io_kwargs=data_io_kwargs, num_reads=num_reads, seed=seed
+        )
+        records.append(
+            dict(
+                codec=codec,
+                level=level,
+                shuffle=shuffle,
+                chunks=list(chunk_shape),
+                stored_chunks=list(stored_chunk_shape),
+                dtype=str(frames.dtype),
+                uncompressed_bytes=uncompressed_bytes,
+                stored_bytes=stored_bytes,
+                compression_ratio=uncompressed_bytes / max(stored_bytes, 1),
+                encode_throughput_mb_per_s=uncompressed_bytes / encode_time / 1e6,
+                decode_latency_ms=decode_time * 1e3,
+            )
+        )
+    if skipped_codecs:
+        warnings.warn(f"The codecs {sorted(skipped_codecs)} were skipped: they require hdf5plugin.")
+    return records
+
+
+# the chunk shapes benchmarked by default: whole frames, or square tiles over many frames
+DEFAULT_CHUNK_SHAPES = dict(
+    frames=((4, None, None), (16, None, None), (64, None, None)),
+    tiles=((64, 32, 32), (256, 32, 32), (64, 64, 64)),
+)
+
+
+def benchmark_extractor_codecs(
+    imaging_extractor: ImagingExtractor,
+    access_pattern: Literal["frames", "tiles"],
+    chunk_shapes: Optional[Sequence[Tuple[Optional[int], ...]]] = None,
+    codecs: Sequence[dict] = DEFAULT_CODECS,
+    shuffles: Sequence[str] = DEFAULT_SHUFFLES,
+    num_samples: int = 4,
+    seed: int = 0,
+) -> List[dict]:
+    """Measure the codec configurations on the frames of an imaging extractor.
+
+    Parameters
+    ----------
+    imaging_extractor: ImagingExtractor
+        The imaging extractor, of real or synthetic data.
+    access_pattern: {"frames", "tiles"}
+        The read pattern of the series, "frames" for the raw imaging and "tiles" for the processed imaging, see
+        `get_access_pattern`. It sets the default chunk shapes and is recorded for `select_codec_choices`.
+    chunk_shapes: list of tuple, optional
+        The chunk shapes to benchmark, in the orientation of the stored frames, a None size spanning the whole axis.
+        By default the DEFAULT_CHUNK_SHAPES of the access pattern: whole frames over 4, 16 and 64 frames ("frames")
+        or tiles of 32x32 and 64x64 pixels over 64 and 256 frames ("tiles").
+    codecs: list of dict, default: DEFAULT_CODECS
+        The "codec" and "level" of each codec configuration, see `get_codec_data_io_kwargs`.
+    shuffles: list of str, default: ("none", "byte", "bit")
+        The shuffle filters to combine with each codec.
+    num_samples: int, default: 4
+        The number of blocks of frames sampled, each as long as the longest chunk.
+    seed: int, default: 0
+        The seed of the sampled frames and of the chunks read.
+
+    Returns
+    -------
+    records: list of dict
+        The records of `benchmark_codecs`, with the "access_pattern".
+    """
+    chunk_shapes = chunk_shapes or DEFAULT_CHUNK_SHAPES[access_pattern]
+    frames = sample_imaging_frames(
+        imaging_extractor=imaging_extractor,
+        num_frames_per_sample=max(chunk_shape[0] for chunk_shape in chunk_shapes),
+        num_samples=num_samples,
+        seed=seed,
+    )
+    records = benchmark_codecs(frames=frames, chunk_shapes=chunk_shapes, codecs=codecs, shuffles=shuffles, seed=seed)
+    return [dict(record, access_pattern=access_pattern) for record in records]
+
+
+def select_codec_choices(
+    records: List[dict],
+    min_encode_throughput_mb_per_s: float = DEFAULT_MIN_ENCODE_THROUGHPUT_MB_PER_S,
+    max_decode_latency_ms: Optional[float] = None,
+) -> Dict[str, dict]:
+    """Select the best codec configuration of each access pattern.
+
+    The configurations are ranked on the total of their records of the access pattern (over several extractors):
+    the best compression ratio among the ones writing at `min_encode_throughput_mb_per_s` or more and reading a chunk
+    in `max_decode_latency_ms` or less, or the fastest to write if none does.
+
+    Parameters
+    ----------
+    records: list of dict
+        The records of `benchmark_extractor_codecs`.
+    min_encode_throughput_mb_per_s: float, default: 50.0
+        The slowest acceptable write, in MB/s.
+    max_decode_latency_ms: float, optional
+        The slowest acceptable read of a chunk, in ms, by default any.
+
+    Returns
+    -------
+    codec_choices: dict
+        The "codec", "level", "shuffle" and "chunks" of the selected configuration, with its measures, by access
+        pattern.
+    """
+    configurations = dict()
+    for record in records:
+        # the records of several extractors share their benchmarked chunk shapes, not the stored ones
+        key = (record["access_pattern"], record["codec"], record["level"], record["shuffle"], tuple(record["chunks"]))
+        configuration = configurations.setdefault(
+            key, dict(uncompressed_bytes=0, stored_bytes=0, encode_time_s=0.0, decode_latencies_ms=[])
+        )
+        configuration["uncompressed_bytes"] += record["uncompressed_bytes"]
+        configuration["stored_bytes"] += record["stored_bytes"]
+        configuration["encode_time_s"] += record["uncompressed_bytes"] / (record["encode_throughput_mb_per_s"] * 1e6)
+        configuration["decode_latencies_ms"].append(record["decode_latency_ms"])
+
+    candidates = dict()
+    for (access_pattern, codec, level, shuffle, chunks), configuration in configurations.items():
+        candidates.setdefault(access_pattern, []).append(
+            dict(
+                codec=codec,
+                level=level,
+                shuffle=shuffle,
+                chunks=list(chunks),
+                compression_ratio=configuration["uncompressed_bytes"] / max(configuration["stored_bytes"], 1),
+                encode_throughput_mb_per_s=configuration["uncompressed_bytes"] / configuration["encode_time_s"] / 1e6,
+                decode_latency_ms=float(np.max(configuration["decode_latencies_ms"])),
+            )
+        )
+
+    codec_choices = dict()
+    for access_pattern, access_pattern_candidates in candidates.items():
+        acceptable_candidates = [
+            candidate
+            for candidate in access_pattern_candidates
+            if candidate["encode_throughput_mb_per_s"] >= min_encode_throughput_mb_per_s
+            and (max_decode_latency_ms is None or candidate["decode_latency_ms"] <= max_decode_latency_ms)
+        ]
+        if acceptable_candidates:
+            codec_choices[access_pattern] = max(
+                acceptable_candidates,
+                key=lambda candidate: (candidate["compression_ratio"], -candidate["decode_latency_ms"]),
+            )
+        else:
+            codec_choices[access_pattern] = max(
+                access_pattern_candidates, key=lambda candidate: candidate["encode_throughput_mb_per_s"]
+            )
+    return codec_choices
+
+
+def run_codec_benchmarks(
+    folder_path: FolderPathType,
+    size: str = "small",
+    report_file_path: Optional[FilePathType] = None,
+    min_encode_throughput_mb_per_s: float = DEFAULT_MIN_ENCODE_THROUGHPUT_MB_PER_S,
+    max_decode_latency_ms: Optional[float] = None,
+) -> dict:
+    """Benchmark the codecs on the synthetic raw and processed imaging and write the report.
+
+    The raw imaging is read with a MesoscopicImagingMultiTiffStackExtractor and a
+    MesoscopicImagingMultiTiffSingleFrameExtractor ("frames"), the processed imaging with ProcessedImagingExtractor
+    of the 1p and dual configurations ("tiles").
+
+    Parameters
+    ----------
+    folder_path: str or Path
+        The folder where the synthetic data is written, see `generate_benchmark_data`.
+    size: str, default: "small"
+        The name of the size in BENCHMARK_SIZES.
+    report_file_path: str or Path, optional
+        The path to the JSON report, by default the report is only returned.
+    min_encode_throughput_mb_per_s: float, default: 50.0
+        The slowest acceptable write, see `select_codec_choices`.
+    max_decode_latency_ms: float, optional
+        The slowest acceptable read of a chunk, see `select_codec_choices`.
+
+    Returns
+    -------
+    report: dict
+        The "benchmarks" records, by extractor as "benchmark_name", and the "codec_choices" by access pattern.
+    """
+    from ..extractors import (
+        MesoscopicImagingMultiTiffSingleFrameExtractor,
+        MesoscopicImagingMultiTiffStackExtractor,
+        ProcessedImagingExtractor,
+    )
+    from .benchmarks import SAMPLING_FREQUENCY, generate_benchmark_data
+
+    data = generate_benchmark_data(folder_path=folder_path, size=size)
+    imaging_extractors = dict(
+        MesoscopicImagingMultiTiffStackExtractor=(
+            MesoscopicImagingMultiTiffStackExtractor(
+                folder_path=data["tiff_stacks_folder_path"],
+                file_pattern="widefield*.tif",
+                number_of_channels=2,
+                channel_first_frame_index=0,
+                sampling_frequency=SAMPLING_FREQUENCY,
+            ),
+            "frames",
+        ),
+        MesoscopicImagingMultiTiffSingleFrameExtractor=(
+            MesoscopicImagingMultiTiffSingleFrameExtractor(
+                folder_path=data["single_frame_folder_path"],
+                file_pattern=data["session_id"],
+                number_of_channels=3,
+                channel_first_frame_index=0,
+                sampling_frequency=SAMPLING_FREQUENCY,
+            ),
+            "frames",
+        ),
+        ProcessedImagingExtractor1p=(
+            ProcessedImagingExtractor(
+                file_path=data["processed_1p_file_path"], sampling_frequency=SAMPLING_FREQUENCY, process_type="blue"
+            ),
+            "tiles",
+        ),
+        ProcessedImagingExtractorDual=(
+            ProcessedImagingExtractor(
+                file_path=data["processed_dual_file_paths"]["dff_final"],
+                sampling_frequency=SAMPLING_FREQUENCY,
+                process_type="dff_final",
+            ),
+            "tiles",
+        ),
+    )
+
+    records = []
+    for benchmark_name, (imaging_extractor, access_pattern) in imaging_extractors.items():
+        print(f"Benchmarking the codecs on the '{size}' {benchmark_name} frames")
+        records += [
+            dict(record, benchmark_name=benchmark_name, size=size)
+            for record in benchmark_extractor_codecs(imaging_extractor=imaging_extractor, access_pattern=access_pattern)
+        ]
+    report = dict(
+        benchmarks=records,
+        codec_choices=select_codec_choices(
+            records=records,
+            min_encode_throughput_mb_per_s=min_encode_throughput_mb_per_s,
+            max_decode_latency_ms=max_decode_latency_ms,
+        ),
+    )
+
+    if report_file_path is not None:
+        report_file_path = Path(report_file_path)
+        report_file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_file_path, "w") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+
+def load_codec_choices(
+    report_file_path: FilePathType, include_chunks: bool = True, backend: Literal["hdf5", "zarr"] = "hdf5"
+) -> Dict[str, dict]:
+    """Return the H5DataIO or ZarrDataIO arguments of the codec choices of a report, by access pattern.
+
+    The result is meant as the `access_pattern_io_overrides` of the converters (see `configure_datasets`), e.g.
+    `Benisty2024NWBConverter(..., access_pattern_io_overrides=load_codec_choices(report_file_path))`, with the same
+    `backend` as the converter. The Blosc choices of the HDF5 backend import `hdf5plugin`, which registers their filter
+    with HDF5.
+
+    Parameters
+    ----------
+    report_file_path: str or Path
+        The path to the JSON report of `run_codec_benchmarks`.
+    include_chunks: bool, default: True
+        Whether to include the chunk shape of the choices, clipped to the shape of each dataset (a None size spans
+        the whole axis). The chunk tiles benchmarked on frames of another size than the session are better left out.
+    backend: {"hdf5", "zarr"}, default: "hdf5"
+        The backend of the conversion, see `get_codec_data_io_kwargs`.
+
+    Returns
+    -------
+    access_pattern_io_overrides: dict
+        The "compression", "compression_opts", "shuffle" (or the "compressor" with the Zarr backend) and "chunks" of
+        the choice of each access pattern.
+    """
+    with open(report_file_path, "r") as file:
+        report = json.load(file)
+    access_pattern_io_overrides = dict()
+    for access_pattern, codec_choice in report["codec_choices"].items():
+        data_io_kwargs = get_codec_data_io_kwargs(
+            codec=codec_choice["codec"], level=codec_choice["level"], shuffle=codec_choice["shuffle"], backend=backend
+        )
+        if include_chunks:
+            data_io_kwargs["chunks"] = tuple(codec_choice["chunks"])
+        access_pattern_io_overrides[access_pattern] = data_io_kwargs
+    return access_pattern_io_overrides
+
+
+if __name__ == "__main__":
+
+    # Parameters for the codec benchmarks
+    root_path = Path("G:")
+    folder_path = root_path / "Higley-conversion_benchmarks"
+    size = "medium"
+    report = run_codec_benchmarks(
+        folder_path=folder_path / size, size=size, report_file_path=folder_path / "codec_benchmark_report.json"
+    )
+    for record in report["benchmarks"]:
+        print(
+            f"{record['benchmark_name']:<48}{record['codec']:<12}{str(record['level']):<6}{record['shuffle']:<6}"
+            f"{str(tuple(record['chunks'])):<20}{record['compression_ratio']:>8.2f}"
+            f"{record['encode_throughput_mb_per_s']:>10.1f} MB/s{record['decode_latency_ms']:>10.3f} ms"
+        )
+    for access_pattern, codec_choice in report["codec_choices"].items():
+        print(f"{access_pattern}: {codec_choice}")
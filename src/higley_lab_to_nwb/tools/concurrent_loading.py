@@ -0,0 +1,55 @@
+"""Concurrent loading of the independent sources of a session.
+
+The non-imaging sources of a session (the Spike2 streams, the MATLab files of the processed signals, the stimulus
+CSV, the Facemap output and the parcellation) don't depend on each other until the alignment, so they can be read at
+the same time: the setup latency of the session is then the one of the slowest source instead of the sum of all of
+them. The reads overlap on a thread pool, where the loaded objects are shared with the caller without copies; a
+process pool can be used for CPU-bound parsers, at the cost of pickling the results back.
+
+Functions
+---------
+run_concurrently
+    Run independent loading functions on a pool and return their results by name.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+def run_concurrently(
+    tasks: Dict[str, Callable[[], Any]],
+    max_workers: Optional[int] = None,
+    use_processes: bool = False,
+) -> Dict[str, Any]:
+    """Run independent loading functions on a pool and return their results by name.
+
+    Parameters
+    ----------
+    tasks: dict
+        The functions to run, without arguments (e.g. a `functools.partial`), by name.
+    max_workers: int, optional
+        The number of workers of the pool, by default one per task.
+    use_processes: bool, default: False
+        Whether to run the functions in separate processes rather than threads. The functions and their results must
+        then be picklable.
+
+    Returns
+    -------
+    results: dict
+        The result of each function, in the order of `tasks`.
+
+    Raises
+    ------
+    Exception
+        The exception of the first failing function, in the order of `tasks`, once all the functions have returned.
+    """
+    if not tasks:
+        return dict()
+    max_workers = max_workers or len(tasks)
+    if max_workers == 1:
+        return {name: task() for name, task in tasks.items()}
+
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(task) for name, task in tasks.items()}
+    return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,385 @@
+"""Header-only estimate of the size and duration of the conversion of a session (dry run).
+
+The source files of each data interface are inspected without reading their bulk data: the page counts and shapes
+of the TIFF files, the shapes and dtypes of the MAT variables (h5py for v7.3 files, `scipy.io.whosmat` for v5 files),
+the lengths of the Spike2 streams, the frame counts of the videos and the sizes of the other files. For each
+interface the estimate holds the number of frames, the bytes to read, the uncompressed bytes to write and the expected
+wall time, that is the bytes read and written divided by the throughput of the category of the interface ("imaging",
+"processed_imaging", "segmentation", "signals", "video" or "behavior"). The videos, linked as external files, and the
+video of the Facemap output are not counted as read.
+The default throughputs are conservative; `calibrate_throughputs` replaces them with the throughputs measured by
+`higley_lab_to_nwb.tools.benchmarks`.
+
+Functions
+---------
+estimate_interface
+    Estimate the frames, bytes read, bytes written and wall time of the conversion of a data interface.
+estimate_conversion
+    Estimate the conversion of each data interface of a session, and of the whole session.
+calibrate_throughputs
+    Return the throughput of each category measured by the session conversion benchmarks.
+load_throughputs
+    Return the throughputs calibrated from a benchmark report file.
+print_estimate
+    Print the estimate of a session as a table.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from neuroconv.utils import FilePathType
+
+from ..extractors.mat_file_utils import get_mat_variable_info
+from ..extractors.mesoscopic_imaging_extractor import _FRAME_SIDE_NUM_COLUMNS, get_tiff_header_info
+
+# the throughput of the conversion of each category of interface, in MB read and written per second
+DEFAULT_THROUGHPUTS_MB_PER_S = dict(
+    imaging=50.0,
+    processed_imaging=50.0,
+    segmentation=100.0,
+    signals=50.0,
+    video=200.0,
+    behavior=100.0,
+)
+_INTERFACE_CLASS_CATEGORIES = dict(
+    MesoscopicImagingMultiTiffStackInterface="imaging",
+    MesoscopicImagingMultiTiffSingleFrameInterface="imaging",
+    ScanImageMultiFileImagingInterface="imaging",
+    ProcessedImagingInterface="processed_imaging",
+    CidanSegmentationInterface="segmentation",
+    ParcellsSegmentationInterface="segmentation",
+    Suite2pSegmentationInterface="segmentation",
+    Spike2SignalsInterface="signals",
+    VideoInterface="video",
+)
+# the number of frames written by the interfaces with `stub_test=True`
+_STUB_FRAMES = 100
+
+
+def _inspect_tiff_stacks(source_data: dict) -> dict:
+    """Inspect the TIFF stacks of an imaging interface, one frame of the channel every `number_of_channels` pages."""
+    from natsort import natsorted
+
+    number_of_channels = source_data.get("number_of_channels", 1)
+    num_frames, num_bytes = 0, 0
+    for file_path in natsorted(Path(source_data["folder_path"]).glob(source_data.get("file_pattern", "*.tif"))):
+        num_pages, page_shape, dtype = get_tiff_header_info(file_path=file_path)
+        num_file_frames = num_pages // number_of_channels
+        num_frames += num_file_frames
+        num_bytes += num_file_frames * int(np.prod(page_shape)) * dtype.itemsize
+    return dict(num_frames=num_frames, bytes_to_read=num_bytes, bytes_to_write=num_bytes)
+
+
+def _inspect_single_frame_tiffs(source_data: dict) -> dict:
+    """Inspect the single frame TIFF files of a MesoscopicImagingMultiTiffSingleFrameInterface, one side of each."""
+    from natsort import natsorted
+
+    file_paths = natsorted(Path(source_data["folder_path"]).glob(source_data["file_pattern"] + "*.tif"))
+    file_paths = file_paths[source_data["channel_first_frame_index"] :: source_data["number_of_channels"]]
+    if not file_paths:
+        return dict(num_frames=0, bytes_to_read=0, bytes_to_write=0)
+    _, (num_rows, num_columns), dtype = get_tiff_header_info(file_path=file_paths[0])
+    if source_data.get("frame_side", "left") == "left":
+        side_num_columns = min(num_columns, _FRAME_SIDE_NUM_COLUMNS)
+    else:
+        side_num_columns = max(num_columns - _FRAME_SIDE_NUM_COLUMNS, 0)
+    frame_bytes = num_rows * side_num_columns * dtype.itemsize
+    num_frames = len(file_paths)
+    return dict(num_frames=num_frames, bytes_to_read=num_frames * frame_bytes, bytes_to_write=num_frames * frame_bytes)
+
+
+def _inspect_processed_imaging(source_data: dict, conversion_options: dict) -> dict:
+    """Inspect the pixels matrix of a ProcessedImagingInterface, without reading it."""
+    import h5py
+
+    process_type = source_data["process_type"]
+    with h5py.File(source_data["file_path"], "r") as file:
+        if process_type in ["dff_final", "dff_blue", "dff_uv"]:
+            pixels_matrix = file[process_type]
+            num_rows, num_columns = file["mask"].shape
+        else:
+            pixels_matrix = file["dFoF"][process_type]
+            num_rows, num_columns = int(file["R"][()].squeeze()), int(file["C"][()].squeeze())
+        (num_frames, num_pixels), itemsize = pixels_matrix.shape, pixels_matrix.dtype.itemsize
+
+    written_pixels = num_pixels if conversion_options.get("masked_pixels", False) else num_rows * num_columns
+    written_itemsize = 2 if conversion_options.get("quantized", False) else itemsize
+    return dict(
+        num_frames=num_frames,
+        # the extractor loads the whole pixels matrix, whatever the number of frames written
+        bytes_to_read=num_frames * num_pixels * itemsize,
+        bytes_to_write=num_frames * written_pixels * written_itemsize,
+    )
+
+
+def _inspect_spike2_signals(source_data: dict) -> dict:
+    """Inspect the lengths of the streams of a Spike2SignalsInterface from the header of the Spike2 file."""
+    from neo import io
+
+    reader = io.CedIO(filename=str(source_data["file_path"]))
+    signal_channels = reader.header["signal_channels"]
+    channel_ids = list(source_data["ttl_stream_ids_to_names_map"]) + list(
+        source_data["behavioral_stream_ids_to_names_map"]
+    )
+    bytes_to_read, bytes_to_write = 0, 0
+    for stream_index, stream_id in enumerate(reader.header["signal_streams"]["id"]):
+        stream_channels = signal_channels[signal_channels["stream_id"] == stream_id]
+        for channel in stream_channels:
+            if channel["id"] not in channel_ids:
+                continue
+            channel_bytes = reader.get_signal_size(block_index=0, seg_index=0, stream_index=stream_index)
+            channel_bytes *= np.dtype(channel["dtype"]).itemsize
+            bytes_to_read += channel_bytes
+            # the TTL streams are written as event times, negligible next to the behavioral traces
+            if channel["id"] in source_data["behavioral_stream_ids_to_names_map"]:
+                bytes_to_write += channel_bytes
+    return dict(num_frames=None, bytes_to_read=bytes_to_read, bytes_to_write=bytes_to_write)
+
+
+def _inspect_videos(source_data: dict) -> dict:
+    """Inspect the frame counts of the videos of a VideoInterface from their headers.
+
+    The videos are linked as external files, only their timestamps are written.
+    """
+    import cv2
+
+    num_frames = 0
+    for file_path in source_data["file_paths"]:
+        video_capture = cv2.VideoCapture(str(file_path))
+        try:
+            num_frames += int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        finally:
+            video_capture.release()
+    return dict(num_frames=num_frames, bytes_to_read=0, bytes_to_write=num_frames * np.dtype("float64").itemsize)
+
+
+def _inspect_facemap(source_data: dict) -> dict:
+    """Inspect the variables of the MAT file of a Facemap interface, the video is only referenced for its timing."""
+    mat_file_bytes = _get_source_bytes(source_data["mat_file_path"])
+    return dict(num_frames=None, bytes_to_read=mat_file_bytes, bytes_to_write=mat_file_bytes)
+
+
+def _get_source_bytes(value) -> int:
+    """Return the number of bytes of a source: the numeric variables of a MAT file, the size of other files and
+    folders, the bytes of in-memory arrays."""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        try:
+            array = np.asarray(value)
+        except ValueError:  # ragged sequences
+            array = None
+        if array is not None and array.dtype.kind in "biuf":
+            return array.nbytes
+        return sum(_get_source_bytes(element) for element in value)
+    if not isinstance(value, (str, Path)):
+        return 0
+    path = Path(value)
+    try:
+        if path.is_dir():
+            return sum(file_path.stat().st_size for file_path in path.rglob("*") if file_path.is_file())
+        if not path.is_file():
+            return 0
+    except OSError:
+        return 0
+    if path.suffix == ".mat":
+        return sum(
+            int(np.prod(shape)) * dtype.itemsize
+            for shape, dtype in get_mat_variable_info(file_path=path).values()
+            if dtype is not None
+        )
+    return path.stat().st_size
+
+
+def _inspect_other_sources(source_data: dict) -> dict:
+    """Inspect the sources of the other interfaces: all the data read is written."""
+    num_bytes = sum(_get_source_bytes(value) for value in source_data.values())
+    return dict(num_frames=None, bytes_to_read=num_bytes, bytes_to_write=num_bytes)
+
+
+def estimate_interface(
+    interface_class: type,
+    source_data: dict,
+    conversion_options: Optional[dict] = None,
+    throughputs: Optional[Dict[str, float]] = None,
+) -> dict:
+    """Estimate the frames, bytes read, bytes written and wall time of the conversion of a data interface.
+
+    Only the headers of the source files are read, the interface is not instantiated.
+
+    Parameters
+    ----------
+    interface_class: type
+        The class of the data interface.
+    source_data: dict
+        The source data of the interface.
+    conversion_options: dict, optional
+        The conversion options of the interface, `stub_test`, `masked_pixels` and `quantized` change the estimate.
+    throughputs: dict, optional
+        The throughput of each category in MB/s, by default DEFAULT_THROUGHPUTS_MB_PER_S.
+
+    Returns
+    -------
+    estimate: dict
+        The "category", "num_frames" (None for the interfaces that are not frame based), "bytes_to_read",
+        "bytes_to_write" (uncompressed) and "estimated_wall_time_s" of the interface.
+    """
+    conversion_options = conversion_options or dict()
+    throughputs = dict(DEFAULT_THROUGHPUTS_MB_PER_S, **(throughputs or dict()))
+    interface_class_name = interface_class.__name__
+    category = _INTERFACE_CLASS_CATEGORIES.get(interface_class_name, "behavior")
+
+    if interface_class_name == "MesoscopicImagingMultiTiffSingleFrameInterface":
+        estimate = _inspect_single_frame_tiffs(source_data=source_data)
+    elif category == "imaging":
+        estimate = _inspect_tiff_stacks(source_data=source_data)
+    elif category == "processed_imaging":
+        estimate = _inspect_processed_imaging(source_data=source_data, conversion_options=conversion_options)
+    elif category == "signals":
+        estimate = _inspect_spike2_signals(source_data=source_data)
+    elif category == "video":
+        estimate = _inspect_videos(source_data=source_data)
+    elif interface_class_name in ("FacemapInterface", "FacemapPythonInterface"):
+        estimate = _inspect_facemap(source_data=source_data)
+    else:
+        estimate = _inspect_other_sources(source_data=source_data)
+
+    num_frames = estimate["num_frames"]
+    if conversion_options.get("stub_test", False) and num_frames:
+        stub_fraction = min(_STUB_FRAMES, num_frames) / num_frames
+        estimate.update(
+            num_frames=min(_STUB_FRAMES, num_frames),
+            bytes_to_write=int(estimate["bytes_to_write"] * stub_fraction),
+        )
+        if category == "imaging":
+            estimate.update(bytes_to_read=int(estimate["bytes_to_read"] * stub_fraction))
+
+    processed_bytes = estimate["bytes_to_read"] + estimate["bytes_to_write"]
+    estimated_wall_time = processed_bytes / (throughputs[category] * 1e6)
+    return dict(category=category, **estimate, estimated_wall_time_s=estimated_wall_time)
+
+
+def estimate_conversion(
+    source_data: Dict[str, dict],
+    data_interface_classes: Dict[str, type],
+    conversion_options: Optional[Dict[str, dict]] = None,
+    throughputs: Optional[Dict[str, float]] = None,
+) -> List[dict]:
+    """Estimate the conversion of each data interface of a session, and of the whole session.
+
+    Parameters
+    ----------
+    source_data: dict
+        The source data of each interface, as passed to the converter.
+    data_interface_classes: dict
+        The class of each interface, e.g. the `data_interface_classes` of the converter.
+    conversion_options: dict, optional
+        The conversion options of each interface, as passed to `run_conversion`.
+    throughputs: dict, optional
+        The throughput of each category in MB/s, e.g. from `load_throughputs`.
+
+    Returns
+    -------
+    records: list of dict
+        One record per interface with its "interface_name" and its estimate (see `estimate_interface`), then a
+        "session" record with the totals.
+    """
+    conversion_options = conversion_options or dict()
+    records = []
+    for interface_name, interface_source_data in source_data.items():
+        estimate = estimate_interface(
+            interface_class=data_interface_classes[interface_name],
+            source_data=interface_source_data,
+            conversion_options=conversion_options.get(interface_name),
+            throughputs=throughputs,
+        )
+        records.append(dict(interface_name=interface_name, **estimate))
+
+    records.append(
+        dict(
+            interface_name="session",
+            category=None,
+            num_frames=None,
+            bytes_to_read=sum(record["bytes_to_read"] for record in records),
+            bytes_to_write=sum(record["bytes_to_write"] for record in records),
+            estimated_wall_time_s=sum(record["estimated_wall_time_s"] for record in records),
+        )
+    )
+    return records
+
+
+def calibrate_throughputs(benchmark_records: List[dict], write_mode: str = "pipelined") -> Dict[str, float]:
+    """Return the throughput of each category measured by the session conversion benchmarks.
+
+    The imaging categories are calibrated on the `add_to_nwbfile` and `write_pending_data` stages of the imaging
+    interfaces in the pipelined write mode, where these stages include the writing of the imaging data. The other
+    categories are written with the NWB file, so they share the throughput of the rest of the session conversion.
+    The records of the largest benchmark size are used, with the planned dataset layout when it was benchmarked.
+
+    Parameters
+    ----------
+    benchmark_records: list of dict
+        The records of `higley_lab_to_nwb.tools.benchmarks.run_benchmarks`.
+    write_mode: str, default: "pipelined"
+        The imaging write mode of the records to use.
+
+    Returns
+    -------
+    throughputs: dict
+        The throughput of each category in MB/s, the default ones for the categories that were not benchmarked.
+    """
+    conversion_records = [
+        record
+        for record in benchmark_records
+        if record.get("write_mode") == write_mode and record.get("dataset_layout", "planned") == "planned"
+    ]
+    if not conversion_records:
+        return dict(DEFAULT_THROUGHPUTS_MB_PER_S)
+    size = conversion_records[-1].get("size")
+    conversion_records = [record for record in conversion_records if record.get("size") == size]
+
+    category_bytes, category_wall_times = dict(), dict()
+    for record in conversion_records:
+        category = record.get("category")
+        if category not in ("imaging", "processed_imaging") or record["stage"] not in (
+            "add_to_nwbfile",
+            "write_pending_data",
+        ):
+            continue
+        category_wall_times[category] = category_wall_times.get(category, 0.0) + record["wall_time_s"]
+        # the bytes of an interface are counted once, on its add_to_nwbfile stage
+        if record["stage"] == "add_to_nwbfile":
+            category_bytes[category] = category_bytes.get(category, 0) + record["estimated_bytes"]
+
+    throughputs = dict(DEFAULT_THROUGHPUTS_MB_PER_S)
+    for category, wall_time in category_wall_times.items():
+        if wall_time > 0:
+            throughputs[category] = category_bytes.get(category, 0) / wall_time / 1e6
+
+    session_records = [record for record in conversion_records if record["interface_name"] == "session"]
+    if session_records:
+        other_bytes = sum(record["estimated_bytes"] for record in session_records) - sum(category_bytes.values())
+        other_wall_time = sum(record["wall_time_s"] for record in session_records) - sum(category_wall_times.values())
+        if other_bytes > 0 and other_wall_time > 0:
+            for category in ("segmentation", "signals", "video", "behavior"):
+                throughputs[category] = other_bytes / other_wall_time / 1e6
+    return throughputs
+
+
+def load_throughputs(report_file_path: FilePathType, write_mode: str = "pipelined") -> Dict[str, float]:
+    """Return the throughputs calibrated from a benchmark report file, see `calibrate_throughputs`."""
+    with open(report_file_path, "r") as file:
+        report = json.load(file)
+    return calibrate_throughputs(benchmark_records=report["benchmarks"], write_mode=write_mode)
+
+
+def print_estimate(records: List[dict]) -> None:
+    """Print the estimate of a session as a table, with sizes in MB and times in seconds."""
+    print(f"{'interface':<48}{'category':<20}{'frames':>10}{'read MB':>12}{'written MB':>12}{'time (s)':>10}")
+    for record in records:
+        num_frames = record["num_frames"] if record["num_frames"] is not None else "-"
+        print(
+            f"{record['interface_name']:<48}{record['category'] or '':<20}{num_frames:>10}"
+            f"{record['bytes_to_read'] / 1e6:>12.1f}{record['bytes_to_write'] / 1e6:>12.1f}"
+            f"{record['estimated_wall_time_s']:>10.1f}"
+        )
@@ -0,0 +1,194 @@
+"""Bookkeeping of the converted sessions, to resume a batch conversion without redoing up to date sessions.
+
+Functions
+---------
+get_source_hash
+    Hash the file names, sizes and modification times of the source files of a session.
+get_converter_version
+    Return the version of the conversion package and of its main dependencies.
+atomic_nwbfile_path
+    Context manager writing an NWB file through a temporary file that is renamed on success.
+get_final_nwbfile_path
+    Return the path an NWB file will have once written, also for the temporary path of `atomic_nwbfile_path`.
+get_nwbfile_size
+    Return the size of an NWB file, HDF5 file or Zarr folder.
+
+Classes
+-------
+ConversionManifest
+    JSON manifest recording, for each session, the source hash, converter version and status of its conversion.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from neuroconv.utils import FilePathType
+
+
+def _get_source_file_entries(source_path: Path) -> list:
+    if source_path.is_file():
+        file_paths = [source_path]
+    elif source_path.is_dir():
+        file_paths = sorted(file_path for file_path in source_path.rglob("*") if file_path.is_file())
+    else:
+        return [[str(source_path), None, None]]
+
+    entries = []
+    for file_path in file_paths:
+        stat = file_path.stat()
+        relative_path = file_path.relative_to(source_path) if source_path.is_dir() else Path(file_path.name)
+        entries.append([relative_path.as_posix(), stat.st_size, stat.st_mtime_ns])
+    return entries
+
+
+def get_source_hash(source_paths: Iterable[FilePathType], session_kwargs: Optional[dict] = None) -> str:
+    """Hash the source files of a session from their names, sizes and modification times.
+
+    The content of the files is not read, so the hash is cheap to compute even for sessions of several hundreds GB.
+
+    Parameters
+    ----------
+    source_paths: list of str or Path
+        The files and folders read by the conversion of the session, folders are listed recursively.
+    session_kwargs: dict, optional
+        The arguments of the conversion of the session, so that e.g. a change of `stub_test` invalidates the output.
+
+    Returns
+    -------
+    source_hash: str
+        The SHA-256 hex digest of the listing of the source files.
+    """
+    listing = dict(
+        sources=[_get_source_file_entries(Path(source_path)) for source_path in source_paths],
+        session_kwargs=session_kwargs or dict(),
+    )
+    serialized_listing = json.dumps(listing, sort_keys=True, default=str)
+    return hashlib.sha256(serialized_listing.encode("utf-8")).hexdigest()
+
+
+def get_converter_version() -> str:
+    """Return the versions of higley-lab-to-nwb and of the packages writing the NWB files."""
+    package_versions = []
+    for package_name in ("higley-lab-to-nwb", "neuroconv", "roiextractors", "pynwb", "hdmf"):
+        try:
+            package_versions.append(f"{package_name}=={version(package_name)}")
+        except PackageNotFoundError:
+            package_versions.append(f"{package_name}==unknown")
+    return ";".join(package_versions)
+
+
+def _get_temporary_nwbfile_path(nwbfile_path: Path) -> Path:
+    # the suffix is kept, so that e.g. pynwb recognizes the temporary path of an NWB file
+    return nwbfile_path.with_name(f".{nwbfile_path.stem}.partial{nwbfile_path.suffix}")
+
+
+def get_final_nwbfile_path(nwbfile_path: FilePathType) -> Path:
+    """Return the path an NWB file will have once written, also for the temporary path of `atomic_nwbfile_path`."""
+    nwbfile_path = Path(nwbfile_path)
+    if nwbfile_path.name.startswith(".") and nwbfile_path.stem.endswith(".partial"):
+        return nwbfile_path.with_name(f"{nwbfile_path.stem[1 : -len('.partial')]}{nwbfile_path.suffix}")
+    # the temporary path of a file without suffix
+    if nwbfile_path.name.startswith(".") and nwbfile_path.suffix == ".partial":
+        return nwbfile_path.with_name(nwbfile_path.stem[1:])
+    return nwbfile_path
+
+
+def get_nwbfile_size(nwbfile_path: FilePathType) -> Optional[int]:
+    """Return the size in bytes of an NWB file, HDF5 file or Zarr folder, None if it doesn't exist."""
+    nwbfile_path = Path(nwbfile_path)
+    if nwbfile_path.is_dir():
+        return sum(file_path.stat().st_size for file_path in nwbfile_path.rglob("*") if file_path.is_file())
+    if nwbfile_path.is_file():
+        return nwbfile_path.stat().st_size
+    return None
+
+
+def _remove_nwbfile(nwbfile_path: Path) -> None:
+    if nwbfile_path.is_dir():
+        shutil.rmtree(nwbfile_path)
+    else:
+        nwbfile_path.unlink(missing_ok=True)
+
+
+@contextmanager
+def atomic_nwbfile_path(nwbfile_path: FilePathType) -> Iterator[Path]:
+    """Yield a temporary path to write the NWB file to, renamed to `nwbfile_path` only if the block succeeds.
+
+    A conversion interrupted halfway therefore never leaves a partially written file at `nwbfile_path`: either the
+    previous file is kept or the temporary file is removed. A Zarr folder can't replace an existing folder in one
+    rename, so the previous folder is removed just before the rename.
+    """
+    nwbfile_path = Path(nwbfile_path)
+    temporary_nwbfile_path = _get_temporary_nwbfile_path(nwbfile_path)
+    _remove_nwbfile(temporary_nwbfile_path)
+    try:
+        yield temporary_nwbfile_path
+    except BaseException:
+        _remove_nwbfile(temporary_nwbfile_path)
+        raise
+    if temporary_nwbfile_path.is_dir():
+        _remove_nwbfile(nwbfile_path)
+    os.replace(temporary_nwbfile_path, nwbfile_path)
+
+
+class ConversionManifest:
+    """A JSON manifest recording the state of the conversion of each session of a dataset.
+
+    For each session the manifest holds the hash of its source files, the converter version, the status of the
+    conversion ("running", "succeeded" or "failed") and the path and size of the NWB file written.
+    A session is up to date when its last conversion succeeded with the same sources and converter version and its
+    NWB file is still there with the recorded size; sessions left "running" by a crash are therefore redone.
+    """
+
+    def __init__(self, file_path: FilePathType):
+        """Load the manifest from `file_path`, or start an empty one if the file doesn't exist.
+
+        Parameters
+        ----------
+        file_path: str or Path
+            The path to the JSON manifest.
+        """
+        self.file_path = Path(file_path)
+        self.sessions = dict()
+        if self.file_path.is_file():
+            with open(self.file_path, "r") as file:
+                self.sessions = json.load(file).get("sessions", dict())
+
+    def get_session_entry(self, session_id: str) -> Optional[dict]:
+        return self.sessions.get(session_id)
+
+    def is_up_to_date(self, session_id: str, source_hash: str, converter_version: str) -> bool:
+        """Whether the session was converted successfully from the same sources with the same converter version."""
+        entry = self.get_session_entry(session_id)
+        if entry is None or entry.get("status") != "succeeded":
+            return False
+        if entry.get("source_hash") != source_hash or entry.get("converter_version") != converter_version:
+            return False
+        nwbfile_path = entry.get("nwbfile_path")
+        if nwbfile_path is None:
+            return False
+        output_size_bytes = get_nwbfile_size(nwbfile_path)
+        return output_size_bytes is not None and output_size_bytes == entry.get("output_size_bytes")
+
+    def update_session(self, session_id: str, **fields) -> None:
+        """Update the entry of a session and save the manifest."""
+        entry = self.sessions.setdefault(session_id, dict())
+        entry.update(fields, updated=datetime.now().isoformat(timespec="seconds"))
+        if entry.get("status") == "succeeded" and entry.get("nwbfile_path"):
+            entry.update(output_size_bytes=get_nwbfile_size(entry["nwbfile_path"]))
+        self.save()
+
+    def save(self) -> None:
+        """Write the manifest through a temporary file, so that it is never left half written."""
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_file_path = self.file_path.with_name(f".{self.file_path.name}.partial")
+        with open(temporary_file_path, "w") as file:
+            json.dump(dict(sessions=self.sessions), file, indent=2)
+        os.replace(temporary_file_path, self.file_path)
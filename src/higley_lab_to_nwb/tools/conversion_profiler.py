@@ -0,0 +1,210 @@
+"""Profiling of the conversion of a session, interface by interface.
+
+Classes
+-------
+ConversionProfiler
+    Record the wall time, CPU time, bytes read and written and peak memory of each stage of each interface.
+"""
+
+import csv
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import psutil
+from neuroconv.utils import FilePathType
+
+# the methods of the data interfaces that are profiled, and the stage they are reported under
+_PROFILED_INTERFACE_METHODS = dict(
+    get_metadata="get_metadata",
+    preload="preload",
+    get_original_timestamps="alignment",
+    get_timestamps="alignment",
+    set_aligned_timestamps="alignment",
+    set_aligned_starting_time="alignment",
+    set_aligned_segment_starting_times="alignment",
+    add_to_nwbfile="add_to_nwbfile",
+    write_pending_data="write_pending_data",
+)
+_REPORT_FIELDS = [
+    "interface_name",
+    "stage",
+    "calls",
+    "wall_time_s",
+    "cpu_time_s",
+    "bytes_read",
+    "bytes_written",
+    "peak_rss_bytes",
+]
+
+
+class ConversionProfiler:
+    """Record the resources used by each stage of each data interface during the conversion of a session.
+
+    For every (interface, stage) pair the profiler accumulates the number of calls, the wall time, the CPU time of
+    the process, the bytes read from and written to the storage and the peak resident memory (RSS) of the process.
+    Bytes are counted at the storage level (see `psutil.Process.io_counters`), so reads served by the page cache are
+    not included, and they are not available on macOS.
+    The memory is sampled by a background thread every `sampling_interval` seconds while a stage is running.
+    The stages are inclusive, e.g. the time of a `get_metadata` call made by `add_to_nwbfile` is also counted in
+    `add_to_nwbfile`, and the stages of the converter itself include the stages of its interfaces.
+    """
+
+    def __init__(self, sampling_interval: float = 0.01):
+        """Create an empty profiler.
+
+        Parameters
+        ----------
+        sampling_interval: float, default: 0.01
+            The interval between two samples of the resident memory, in seconds.
+        """
+        self.sampling_interval = sampling_interval
+        self.records: Dict[tuple, dict] = dict()
+        self._process = psutil.Process()
+        self._active_peaks: Dict[int, int] = dict()
+        self._active_peaks_lock = threading.Lock()
+        self._measurement_ids = itertools.count()
+        self._active_stages = threading.local()
+        self._sampler_thread = None
+
+    def _get_rss(self) -> int:
+        return self._process.memory_info().rss
+
+    def _get_io_counters(self) -> Optional[tuple]:
+        try:
+            io_counters = self._process.io_counters()
+        except (AttributeError, psutil.AccessDenied):
+            return None
+        return io_counters.read_bytes, io_counters.write_bytes
+
+    def _sample_rss(self) -> None:
+        while True:
+            with self._active_peaks_lock:
+                if not self._active_peaks:
+                    self._sampler_thread = None
+                    return
+                rss = self._get_rss()
+                for measurement_id, peak_rss in self._active_peaks.items():
+                    self._active_peaks[measurement_id] = max(peak_rss, rss)
+            time.sleep(self.sampling_interval)
+
+    @contextmanager
+    def profile(self, interface_name: str, stage: str) -> Iterator[None]:
+        """Context manager adding the resources used by the enclosed block to the record of (interface, stage)."""
+        if not hasattr(self._active_stages, "keys"):
+            self._active_stages.keys = set()
+        active_stages = self._active_stages.keys
+        # recursive calls of the same stage are accounted once
+        if (interface_name, stage) in active_stages:
+            yield
+            return
+
+        active_stages.add((interface_name, stage))
+        measurement_id = next(self._measurement_ids)
+        with self._active_peaks_lock:
+            self._active_peaks[measurement_id] = self._get_rss()
+            if self._sampler_thread is None:
+                self._sampler_thread = threading.Thread(target=self._sample_rss, daemon=True)
+                self._sampler_thread.start()
+        start_io_counters = self._get_io_counters()
+        start_cpu_time = time.process_time()
+        start_wall_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start_wall_time
+            cpu_time = time.process_time() - start_cpu_time
+            end_io_counters = self._get_io_counters()
+            with self._active_peaks_lock:
+                peak_rss = max(self._active_peaks.pop(measurement_id), self._get_rss())
+            active_stages.discard((interface_name, stage))
+
+            record = self.records.setdefault(
+                (interface_name, stage),
+                dict(
+                    interface_name=interface_name,
+                    stage=stage,
+                    calls=0,
+                    wall_time_s=0.0,
+                    cpu_time_s=0.0,
+                    bytes_read=None,
+                    bytes_written=None,
+                    peak_rss_bytes=0,
+                ),
+            )
+            record["calls"] += 1
+            record["wall_time_s"] += wall_time
+            record["cpu_time_s"] += cpu_time
+            record["peak_rss_bytes"] = max(record["peak_rss_bytes"], peak_rss)
+            if start_io_counters is not None and end_io_counters is not None:
+                record["bytes_read"] = (record["bytes_read"] or 0) + end_io_counters[0] - start_io_counters[0]
+                record["bytes_written"] = (record["bytes_written"] or 0) + end_io_counters[1] - start_io_counters[1]
+
+    def instrument(self, name: str, obj, method_to_stage: Optional[Dict[str, str]] = None) -> None:
+        """Profile the methods of an object, by default the metadata, alignment and writing methods of an interface.
+
+        Parameters
+        ----------
+        name: str
+            The name of the object in the report, e.g. the name of the interface in the converter.
+        obj: object
+            The data interface or converter instance whose methods are profiled.
+        method_to_stage: dict, optional
+            The names of the methods to profile and the stage they are reported under.
+        """
+        method_to_stage = method_to_stage or _PROFILED_INTERFACE_METHODS
+        for method_name, stage in method_to_stage.items():
+            method = getattr(obj, method_name, None)
+            if method is None:
+                continue
+
+            def profiled_method(*args, method=method, stage=stage, **kwargs):
+                with self.profile(interface_name=name, stage=stage):
+                    return method(*args, **kwargs)
+
+            setattr(obj, method_name, wraps(method)(profiled_method))
+
+    def create_data_interface(self, interface_name: str, data_interface_class: type, source_data: dict):
+        """Create a data interface, profiling its `__init__`, and instrument its methods."""
+        with self.profile(interface_name=interface_name, stage="__init__"):
+            data_interface = data_interface_class(**source_data)
+        self.instrument(name=interface_name, obj=data_interface)
+        return data_interface
+
+    def get_report(self) -> List[dict]:
+        """Return one record per (interface, stage), in the order they were first recorded."""
+        return [dict(record) for record in self.records.values()]
+
+    def save_report(self, file_path: FilePathType) -> None:
+        """Save the report as a JSON file, or as a CSV file if `file_path` ends with '.csv'."""
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        report = self.get_report()
+        if file_path.suffix == ".csv":
+            with open(file_path, "w", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=_REPORT_FIELDS)
+                writer.writeheader()
+                writer.writerows(report)
+        else:
+            with open(file_path, "w") as file:
+                json.dump(dict(interfaces=report), file, indent=2)
+
+    def print_report(self) -> None:
+        """Print the report as a table, with times in seconds and sizes in MB."""
+        print(
+            f"{'interface':<40}{'stage':<20}{'wall (s)':>10}{'cpu (s)':>10}"
+            f"{'read MB':>10}{'written MB':>12}{'peak MB':>10}"
+        )
+        for record in self.get_report():
+            bytes_read = f"{record['bytes_read'] / 1e6:.1f}" if record["bytes_read"] is not None else "-"
+            bytes_written = f"{record['bytes_written'] / 1e6:.1f}" if record["bytes_written"] is not None else "-"
+            print(
+                f"{record['interface_name']:<40}{record['stage']:<20}{record['wall_time_s']:>10.2f}"
+                f"{record['cpu_time_s']:>10.2f}{bytes_read:>10}{bytes_written:>12}"
+                f"{record['peak_rss_bytes'] / 1e6:>10.1f}"
+            )
@@ -0,0 +1,416 @@
+"""Post-write verification of an NWB file: a random sample of the chunks of its series compared with the sources.
+
+`nwbinspector` checks the NWB file against the schema and the best practices, not that the pixels and traces written
+are the ones of the sources. The verification rebuilds, in memory, the objects each data interface adds to the NWB
+file, so that the data of each TimeSeries (the imaging series, the segmentation traces, the Spike2 channels, the
+Facemap series...) is read lazily from its sources as neuroconv would write it. The data and timestamps datasets of
+these series in the written NWB file are then split into their chunks (blocks of rows for the contiguous datasets), and
+a random sample of the chunks, with the last chunk of each dataset where the padding of the edges would show, is read
+from the NWB file and from the sources. Each chunk matches when the SHA-256 checksums of both, in the dtype of the
+dataset, are equal. The starting time and rate of the regularly sampled series are compared with the sources as well,
+so that a series shifted by the alignment is not verified.
+
+The interfaces are rebuilt with their conversion options, without the pipelined write: the summary images and the
+binned copies of the series, computed during the pipelined write, are not verified. The rebuilding reads the small
+sources again (e.g. the MAT files of the traces), the imaging sources are only read for the sampled chunks.
+The chunks are verified by worker processes, forked so that the sources of the rebuilt objects are shared with them,
+where fork is the default start method of the platform, and by threads otherwise.
+
+Functions
+---------
+verify_nwbfile
+    Compare a random sample of the chunks of the series of an NWB file with the sources of the converter.
+print_verification
+    Print the verification of an NWB file as a table.
+"""
+
+import hashlib
+import math
+import multiprocessing
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import h5py
+import numpy as np
+from hdmf.data_utils import AbstractDataChunkIterator, DataIO, GenericDataChunkIterator
+from neuroconv.tools.roiextractors.imagingextractordatachunkiterator import ImagingExtractorDataChunkIterator
+from neuroconv.utils import FilePathType
+from pynwb import NWBFile, ProcessingModule, TimeSeries
+
+if TYPE_CHECKING:
+    from higley_lab_to_nwb.higley_lab_nwbconverter import HigleyLabNWBConverter
+
+# the conversion options of the pipelined write, dropped to rebuild the interfaces with their sources as data
+_PIPELINED_WRITE_OPTIONS = ("pipelined_write", "pipeline_options", "add_summary_images", "add_binned_series")
+# the size of the blocks of rows sampled in the contiguous datasets
+_CONTIGUOUS_BLOCK_BYTES = 2**20
+
+
+def _get_source_reader(data) -> Optional[Callable[[Tuple[slice, ...]], np.ndarray]]:
+    """Return the function reading a selection of the data of an in-memory series, None if it can't be sliced."""
+    if isinstance(data, DataIO):
+        data = data.data
+    if isinstance(data, ImagingExtractorDataChunkIterator):
+        imaging_extractor = data.imaging_extractor
+
+        def read_frames(selection: Tuple[slice, ...]) -> np.ndarray:
+            video = np.asarray(imaging_extractor.get_video(start_frame=selection[0].start, end_frame=selection[0].stop))
+            return video.transpose((0, 2, 1) if video.ndim == 3 else (0, 2, 1, 3))[(slice(None),) + selection[1:]]
+
+        return read_frames
+    if isinstance(data, GenericDataChunkIterator):
+        return data._get_data
+    if isinstance(data, (AbstractDataChunkIterator, TimeSeries)) or data is None:
+        # the timestamps linked to another series are verified with it
+        return None
+    array = np.asarray(data)
+    return lambda selection: array[selection]
+
+
+def _get_source_shape(data) -> Tuple[int, ...]:
+    """Return the shape of the data of an in-memory series."""
+    if isinstance(data, DataIO):
+        data = data.data
+    if isinstance(data, AbstractDataChunkIterator):
+        return tuple(data.maxshape)
+    return np.shape(data)
+
+
+def _get_object_path(neurodata_object) -> Optional[str]:
+    """Return the path of an object of the acquisition or of a processing module in the NWB file, None otherwise."""
+    names = []
+    while not isinstance(neurodata_object.parent, NWBFile):
+        if neurodata_object.parent is None:
+            return None
+        names.append(neurodata_object.name)
+        neurodata_object = neurodata_object.parent
+    nwbfile = neurodata_object.parent
+    if isinstance(neurodata_object, ProcessingModule):
+        names += [neurodata_object.name, "processing"]
+    elif neurodata_object.name in nwbfile.acquisition:
+        names += [neurodata_object.name, "acquisition"]
+    else:
+        return None
+    return "/".join(reversed(names))
+
+
+def _get_interface_sources(
+    data_interface, metadata: dict, conversion_options: dict
+) -> Tuple[Dict[str, Tuple], Dict[str, Tuple[float, float]]]:
+    """Rebuild the objects of a data interface in memory.
+
+    Returns the (shape, reader) of each series dataset, and the (starting_time, rate) of each regularly sampled series.
+    """
+    conversion_options = {
+        key: value for key, value in conversion_options.items() if key not in _PIPELINED_WRITE_OPTIONS
+    }
+    nwbfile = NWBFile(
+        session_description="The reference objects of the verification of an NWB file.",
+        identifier=str(uuid4()),
+        session_start_time=datetime.now().astimezone(),
+    )
+    data_interface.add_to_nwbfile(nwbfile=nwbfile, metadata=deepcopy(metadata), **conversion_options)
+
+    sources, timings = dict(), dict()
+    for neurodata_object in nwbfile.objects.values():
+        if not isinstance(neurodata_object, TimeSeries):
+            continue
+        series_path = _get_object_path(neurodata_object)
+        if series_path is None:
+            continue
+        for field_name in ("data", "timestamps"):
+            data = neurodata_object.fields.get(field_name)
+            reader = _get_source_reader(data)
+            if reader is not None:
+                sources[f"{series_path}/{field_name}"] = (_get_source_shape(data), reader)
+        if neurodata_object.rate is not None:
+            timings[series_path] = (neurodata_object.starting_time, neurodata_object.rate)
+    return sources, timings
+
+
+def _verify_timing(file, series_path: str, starting_time: float, rate: float) -> Optional[str]:
+    """Compare the starting time and rate of a series of the NWB file with the sources, return the error if any."""
+    starting_time_path = f"{series_path}/starting_time"
+    if starting_time_path not in file:
+        return f"The series '{series_path}' has no starting time in the NWB file."
+    starting_time_dataset = file[starting_time_path]
+    nwb_starting_time = float(starting_time_dataset[()])
+    nwb_rate = float(starting_time_dataset.attrs["rate"])
+    if not np.isclose(nwb_starting_time, starting_time) or not np.isclose(nwb_rate, rate):
+        return (
+            f"The starting time {nwb_starting_time} and rate {nwb_rate} of the series differ from the sources "
+            f"{starting_time} and {rate}."
+        )
+    return None
+
+
+def _get_checksum(array: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+
+def _sample_chunks(
+    shape: Tuple[int, ...],
+    chunks: Optional[Tuple[int, ...]],
+    itemsize: int,
+    sample_fraction: float,
+    min_sampled_chunks: int,
+    random_number_generator: np.random.Generator,
+) -> Tuple[int, List[Tuple[slice, ...]]]:
+    """Return the number of chunks of a dataset and the selections of a random sample of them, with the last one."""
+    if chunks is None:
+        row_bytes = itemsize * int(np.prod(shape[1:]))
+        chunks = (max(1, _CONTIGUOUS_BLOCK_BYTES // max(1, row_bytes)),) + tuple(shape[1:])
+    grid_shape = tuple(math.ceil(size / chunk_size) for size, chunk_size in zip(shape, chunks))
+    num_chunks = int(np.prod(grid_shape))
+    if num_chunks == 0:
+        return 0, []
+    num_sampled_chunks = min(num_chunks, max(min_sampled_chunks, math.ceil(sample_fraction * num_chunks)))
+    chunk_indices = set(random_number_generator.choice(num_chunks, size=num_sampled_chunks, replace=False).tolist())
+    chunk_indices.add(num_chunks - 1)
+    selections = []
+    for chunk_index in sorted(chunk_indices):
+        grid_index = np.unravel_index(chunk_index, grid_shape)
+        selections.append(
+            tuple(
+                slice(index * chunk_size, min((index + 1) * chunk_size, size))
+                for index, chunk_size, size in zip(grid_index, chunks, shape)
+            )
+        )
+    return num_chunks, selections
+
+
+def _open_nwbfile(nwbfile_path: Path):
+    if nwbfile_path.is_dir():
+        import zarr
+
+        return zarr.open_group(str(nwbfile_path), mode="r")
+    return h5py.File(nwbfile_path, "r")
+
+
+def _verify_chunks(nwbfile_path: Path, tasks: List[Tuple[str, Callable, Tuple[slice, ...]]]) -> List[tuple]:
+    """Read the chunks of the tasks from the NWB file and the sources, return their offset and checksums or error."""
+    results = []
+    file = _open_nwbfile(nwbfile_path)
+    try:
+        for dataset_path, reader, selection in tasks:
+            offset = tuple(selection_slice.start for selection_slice in selection)
+            try:
+                dataset = file[dataset_path]
+                nwb_chunk = dataset[selection]
+                source_chunk = np.asarray(reader(selection)).astype(dataset.dtype, copy=False)
+                source_checksum = _get_checksum(source_chunk) if source_chunk.shape == nwb_chunk.shape else None
+                results.append((dataset_path, offset, _get_checksum(nwb_chunk), source_checksum, None))
+            except Exception:
+                results.append((dataset_path, offset, None, None, traceback.format_exc()))
+    finally:
+        if isinstance(file, h5py.File):
+            file.close()
+    return results
+
+
+def _verify_chunks_in_worker(
+    worker_index: int, nwbfile_path: Path, tasks: list, result_queue: multiprocessing.Queue
+) -> None:
+    """Verify the chunks of the tasks in a worker process, and report their results."""
+    try:
+        results = _verify_chunks(nwbfile_path=nwbfile_path, tasks=tasks)
+    except Exception:
+        error = traceback.format_exc()
+        results = [(dataset_path, None, None, None, error) for dataset_path, _, _ in tasks]
+    result_queue.put((worker_index, results))
+
+
+def _run_verification_workers(nwbfile_path: Path, tasks: list, max_workers: int) -> List[tuple]:
+    """Verify the chunks of the tasks in forked worker processes, or in threads where fork isn't the default."""
+    # the tasks are dealt round-robin so that each worker reads chunks of every dataset
+    worker_tasks = [tasks[worker_index::max_workers] for worker_index in range(max_workers)]
+    worker_tasks = [tasks_of_worker for tasks_of_worker in worker_tasks if tasks_of_worker]
+    # the readers of the sources can't be pickled for spawned workers, and forking is unsafe where it isn't the default
+    # (e.g. on macOS)
+    if multiprocessing.get_start_method() != "fork" or len(worker_tasks) <= 1:
+        with ThreadPoolExecutor(max_workers=max(1, len(worker_tasks))) as executor:
+            worker_results = executor.map(
+                lambda tasks_of_worker: _verify_chunks(nwbfile_path, tasks_of_worker), worker_tasks
+            )
+            return [result for results in worker_results for result in results]
+
+    context = multiprocessing.get_context("fork")
+    result_queue = context.Queue()
+    processes = {
+        worker_index: context.Process(
+            target=_verify_chunks_in_worker,
+            args=(worker_index, nwbfile_path, tasks_of_worker, result_queue),
+            name=f"verify-{worker_index}",
+        )
+        for worker_index, tasks_of_worker in enumerate(worker_tasks)
+    }
+    for process in processes.values():
+        process.start()
+    results = []
+    while processes:
+        try:
+            worker_index, worker_results = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            # workers killed before reporting (e.g. by the out-of-memory killer) have their chunks recorded as failed
+            for worker_index, process in list(processes.items()):
+                if not process.is_alive():
+                    processes.pop(worker_index)
+                    error = f"The verification worker process exited with code {process.exitcode}."
+                    results += [
+                        (dataset_path, None, None, None, error) for dataset_path, _, _ in worker_tasks[worker_index]
+                    ]
+            continue
+        processes.pop(worker_index).join()
+        results += worker_results
+    return results
+
+
+def verify_nwbfile(
+    converter: "HigleyLabNWBConverter",
+    nwbfile_path: FilePathType,
+    metadata: Optional[dict] = None,
+    conversion_options: Optional[dict] = None,
+    interface_names: Optional[List[str]] = None,
+    sample_fraction: float = 0.01,
+    min_sampled_chunks: int = 4,
+    max_workers: Optional[int] = None,
+    seed: int = 0,
+    raise_on_mismatch: bool = False,
+) -> List[dict]:
+    """Compare a random sample of the chunks of the series of an NWB file with the sources of the converter.
+
+    Parameters
+    ----------
+    converter: HigleyLabNWBConverter
+        The converter that wrote the NWB file, or a converter of the same sources. Its interfaces are aligned with
+        `converter.align_data_interfaces` unless they already are, as they are for the conversion.
+    nwbfile_path: str or Path
+        The path to the NWB file, an HDF5 file or a Zarr folder. The series files of the "multi_file" output layout
+        are read through the external links of the NWB file.
+    metadata: dict, optional
+        The metadata of the conversion, by default `converter.get_metadata()`.
+    conversion_options: dict, optional
+        The conversion options of each interface, by name.
+    interface_names: list of str, optional
+        The interfaces to verify, by default all the interfaces of the converter.
+    sample_fraction: float, default: 0.01
+        The fraction of the chunks of each dataset to verify.
+    min_sampled_chunks: int, default: 4
+        The minimum number of chunks of each dataset to verify, all of them for the smaller datasets.
+    max_workers: int, optional
+        The number of worker processes reading the chunks, by default the number of CPUs.
+    seed: int, default: 0
+        The seed of the random sample of chunks.
+    raise_on_mismatch: bool, default: False
+        Whether to raise a RuntimeError when a dataset doesn't match its sources.
+
+    Returns
+    -------
+    records: list of dict
+        One record per verified dataset, with the "interface_name", the "dataset_path", the "shape" and "chunks"
+        of the dataset, the "num_chunks" and "num_sampled_chunks", the "mismatched_chunks" (the offsets of the chunks
+        whose checksums differ), the "checksums" of the sampled chunks of the NWB file by offset, the "error" if the
+        dataset couldn't be read and whether it is "verified". The starting time of each regularly sampled series has
+        a record with its "error" if it or the rate differs from the sources.
+    """
+    nwbfile_path = Path(nwbfile_path)
+    metadata = metadata or converter.get_metadata()
+    conversion_options = conversion_options or dict()
+    interface_names = interface_names or list(converter.data_interface_objects)
+    random_number_generator = np.random.default_rng(seed)
+    converter.align_data_interfaces()
+
+    records, tasks = dict(), []
+    file = _open_nwbfile(nwbfile_path)
+    try:
+        for interface_name in interface_names:
+            try:
+                sources, timings = _get_interface_sources(
+                    data_interface=converter.data_interface_objects[interface_name],
+                    metadata=metadata,
+                    conversion_options=conversion_options.get(interface_name, dict()),
+                )
+            except Exception:
+                records[interface_name] = dict(
+                    interface_name=interface_name, dataset_path=None, error=traceback.format_exc(), verified=False
+                )
+                continue
+            for series_path, (starting_time, rate) in timings.items():
+                dataset_path = f"{series_path}/starting_time"
+                records[dataset_path] = dict(
+                    interface_name=interface_name,
+                    dataset_path=dataset_path,
+                    error=_verify_timing(file=file, series_path=series_path, starting_time=starting_time, rate=rate),
+                )
+            for dataset_path, (source_shape, reader) in sources.items():
+                record = dict(interface_name=interface_name, dataset_path=dataset_path, error=None)
+                records[dataset_path] = record
+                if dataset_path not in file:
+                    record["error"] = f"The dataset '{dataset_path}' is not in the NWB file."
+                    continue
+                dataset = file[dataset_path]
+                record.update(shape=tuple(dataset.shape), chunks=dataset.chunks)
+                if tuple(dataset.shape) != tuple(source_shape):
+                    record[
+                        "error"
+                    ] = f"The shape of the dataset {dataset.shape} differs from the sources {source_shape}."
+                    continue
+                record["num_chunks"], selections = _sample_chunks(
+                    shape=dataset.shape,
+                    chunks=dataset.chunks,
+                    itemsize=dataset.dtype.itemsize,
+                    sample_fraction=sample_fraction,
+                    min_sampled_chunks=min_sampled_chunks,
+                    random_number_generator=random_number_generator,
+                )
+                record.update(num_sampled_chunks=len(selections), mismatched_chunks=[], checksums=dict())
+                tasks += [(dataset_path, reader, selection) for selection in selections]
+    finally:
+        # the worker processes are forked with the NWB file closed
+        if isinstance(file, h5py.File):
+            file.close()
+
+    max_workers = max(1, max_workers or multiprocessing.cpu_count())
+    for dataset_path, offset, nwb_checksum, source_checksum, error in _run_verification_workers(
+        nwbfile_path=nwbfile_path, tasks=tasks, max_workers=max_workers
+    ):
+        record = records[dataset_path]
+        if error is not None:
+            record["error"] = record["error"] or error
+            continue
+        record["checksums"][str(offset)] = nwb_checksum
+        if nwb_checksum != source_checksum:
+            record["mismatched_chunks"].append(offset)
+
+    records = list(records.values())
+    for record in records:
+        record["verified"] = record["error"] is None and not record.get("mismatched_chunks")
+        if record.get("mismatched_chunks"):
+            record["mismatched_chunks"] = sorted(record["mismatched_chunks"])
+    failed_records = [record for record in records if not record["verified"]]
+    if raise_on_mismatch and failed_records:
+        raise RuntimeError(
+            "\n".join(
+                f"The dataset '{record['dataset_path']}' of '{record['interface_name']}' doesn't match its sources: "
+                + (record["error"] or f"the chunks at {record['mismatched_chunks']} differ.")
+                for record in failed_records
+            )
+        )
+    return records
+
+
+def print_verification(records: List[dict]) -> None:
+    """Print the verification of an NWB file as a table, with the number of sampled and mismatched chunks."""
+    print(f"{'interface':<40}{'dataset':<72}{'sampled':>10}{'mismatched':>12}  status")
+    for record in records:
+        status = "ok" if record["verified"] else ("error" if record["error"] else "MISMATCH")
+        print(
+            f"{record['interface_name']:<40}{record['dataset_path'] or '-':<72}"
+            f"{record.get('num_sampled_chunks', '-'):>10}{len(record.get('mismatched_chunks', [])):>12}  {status}"
+        )
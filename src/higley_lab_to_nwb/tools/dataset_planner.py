@@ -0,0 +1,361 @@
+"""Chunking and compression of the datasets of an NWB file, planned from their shape, dtype and read pattern.
+
+The default chunking of the backend ignores how the data is read back. The planner picks the chunk shape and the
+compression of the data of each TimeSeries from the way it is expected to be read:
+
+- "frames": raw imaging, read frame by frame. The chunks hold whole frames and the compression is fast (gzip level 1)
+  because these are the largest datasets and their write throughput dominates the conversion.
+- "tiles": processed imaging (e.g. dF/F), read frame by frame and pixel by pixel. The chunks are square tiles of
+  the frame spanning many frames, so a pixel trace is read from a few chunks.
+- "traces": time series with few channels (analog signals, motion SVD components, ROI traces), read channel by
+  channel over long time windows. The chunks are long along time.
+
+Datasets smaller than one chunk are written contiguous and uncompressed. The planned chunking and compression of an
+access pattern can be replaced, e.g. by the codec chosen by `higley_lab_to_nwb.tools.codec_benchmark`.
+
+With the Zarr backend, the chunks are the same and the compression is Blosc with zstd at the same level, with the
+byte shuffle. The other datasets wrapped in a H5DataIO by neuroconv are wrapped in a ZarrDataIO with the same chunks,
+since hdmf-zarr can't write a H5DataIO.
+
+Functions
+---------
+get_access_pattern
+    Return the expected read pattern of the data of a TimeSeries.
+plan_dataset_io
+    Return the H5DataIO or ZarrDataIO arguments (chunks and compression) of a dataset.
+validate_data_io_overrides
+    Raise a ValueError if the DataIO arguments replacing the planned ones are not arguments of the backend.
+configure_datasets
+    Apply the planned chunking and compression to the data of all the TimeSeries of an in-memory NWB file.
+use_zarr_data_io
+    Replace the H5DataIO of all the datasets of an in-memory NWB file by ZarrDataIO.
+"""
+
+from typing import Dict, Literal, Optional, Tuple
+
+import h5py
+import numpy as np
+from hdmf.backends.hdf5 import H5DataIO
+from hdmf.data_utils import AbstractDataChunkIterator, DataIO
+from neuroconv.tools.roiextractors.imagingextractordatachunkiterator import ImagingExtractorDataChunkIterator
+from pynwb import NWBFile, ProcessingModule, TimeSeries
+from pynwb.ophys import OnePhotonSeries, TwoPhotonSeries
+
+from .masked_pixel_series import MaskedPixelsDataChunkIterator
+
+# the size under which the datasets are written contiguous and uncompressed
+_MINIMUM_CHUNKED_DATASET_BYTES = 64 * 1024
+# the compression of each access pattern, with the byte shuffle filter
+_ACCESS_PATTERN_COMPRESSION_LEVELS = dict(frames=1, tiles=4, traces=4)
+# the number of channels of a "traces" chunk
+_MAXIMUM_TRACES_CHUNK_CHANNELS = 64
+
+
+def get_access_pattern(time_series: TimeSeries) -> Literal["frames", "tiles", "traces"]:
+    """Return the expected read pattern of the data of a TimeSeries.
+
+    The photon series in the acquisition are raw movies ("frames"), the ones in a processing module are processed
+    movies ("tiles"), all the other series are "traces".
+    """
+    if isinstance(time_series, (OnePhotonSeries, TwoPhotonSeries)):
+        return "frames" if isinstance(time_series.parent, NWBFile) else "tiles"
+    return "traces"
+
+
+# the DataIO arguments of each backend that the DataIO of the other backend doesn't take
+_BACKEND_DATA_IO_ARGUMENTS = dict(
+    hdf5=("compression", "compression_opts", "shuffle", "fletcher32", "allow_plugin_filters"),
+    zarr=("compressor", "filters"),
+)
+
+
+def _get_zarr_compressor(compression_level: int, shuffle: bool):
+    """Return the Blosc zstd compressor of the Zarr arrays."""
+    from numcodecs import Blosc
+
+    return Blosc(cname="zstd", clevel=compression_level, shuffle=Blosc.SHUFFLE if shuffle else Blosc.NOSHUFFLE)
+
+
+def plan_dataset_io(
+    shape: Tuple[int, ...],
+    dtype: np.dtype,
+    access_pattern: Literal["frames", "tiles", "traces"],
+    chunk_mb: float = 1.0,
+    backend: Literal["hdf5", "zarr"] = "hdf5",
+) -> dict:
+    """Return the H5DataIO or ZarrDataIO arguments of a dataset: chunk shape, compression and shuffle.
+
+    Parameters
+    ----------
+    shape: tuple of int
+        The shape of the dataset, with time as first axis.
+    dtype: np.dtype
+        The dtype of the dataset.
+    access_pattern: "frames", "tiles" or "traces"
+        The expected read pattern, see `get_access_pattern`.
+    chunk_mb: float, default: 1.0
+        The target size of a chunk, in MB.
+    backend: {"hdf5", "zarr"}, default: "hdf5"
+        The backend the dataset is written with.
+
+    Returns
+    -------
+    data_io_kwargs: dict
+        The arguments of H5DataIO, or of ZarrDataIO with the Zarr backend, empty for the datasets written contiguous
+        and uncompressed.
+    """
+    shape = tuple(int(size) for size in shape)
+    itemsize = np.dtype(dtype).itemsize
+    if len(shape) == 0 or 0 in shape or int(np.prod(shape)) * itemsize <= _MINIMUM_CHUNKED_DATASET_BYTES:
+        return dict()
+
+    chunk_elements = max(1, int(chunk_mb * 1e6) // itemsize)
+    if access_pattern == "frames" and len(shape) >= 3:
+        # whole frames, or bands of rows for the frames larger than a chunk
+        frame_shape = list(shape[1:])
+        frame_elements = int(np.prod(frame_shape))
+        if frame_elements > chunk_elements:
+            frame_shape[0] = max(1, chunk_elements // (frame_elements // frame_shape[0]))
+            frame_elements = int(np.prod(frame_shape))
+        chunk_shape = [max(1, chunk_elements // frame_elements)] + frame_shape
+    elif access_pattern == "tiles" and len(shape) >= 3:
+        tile_shape = [min(size, 64) for size in shape[1:3]] + list(shape[3:])
+        chunk_shape = [max(1, chunk_elements // int(np.prod(tile_shape)))] + tile_shape
+    else:
+        channel_shape = list(shape[1:])
+        if channel_shape:
+            channel_shape[0] = min(channel_shape[0], _MAXIMUM_TRACES_CHUNK_CHANNELS)
+        chunk_shape = [max(1, chunk_elements // max(1, int(np.prod(channel_shape))))] + channel_shape
+    chunk_shape = tuple(min(chunk_size, size) for chunk_size, size in zip(chunk_shape, shape))
+
+    if backend == "zarr":
+        return dict(
+            chunks=chunk_shape,
+            compressor=_get_zarr_compressor(
+                compression_level=_ACCESS_PATTERN_COMPRESSION_LEVELS[access_pattern], shuffle=itemsize > 1
+            ),
+        )
+    return dict(
+        chunks=chunk_shape,
+        compression="gzip",
+        compression_opts=_ACCESS_PATTERN_COMPRESSION_LEVELS[access_pattern],
+        shuffle=itemsize > 1,
+    )
+
+
+def _clip_chunk_shape(chunk_shape: Tuple[Optional[int], ...], shape: Tuple[int, ...]) -> Tuple[int, ...]:
+    """Return a chunk shape clipped to the shape of a dataset, the None sizes and the missing axes spanning the axis."""
+    chunk_shape = tuple(chunk_shape) + (None,) * (len(shape) - len(chunk_shape))
+    return tuple(size if chunk_size is None else min(chunk_size, size) for chunk_size, size in zip(chunk_shape, shape))
+
+
+def _get_shape_and_dtype(data) -> Optional[Tuple[Tuple[int, ...], np.dtype]]:
+    """Return the shape and dtype of the data of a TimeSeries, or None if they can't be known before writing."""
+    if isinstance(data, DataIO):
+        data = data.data
+    if isinstance(data, AbstractDataChunkIterator):
+        if data.maxshape is None or None in data.maxshape:
+            return None
+        return tuple(data.maxshape), np.dtype(data.dtype)
+    if isinstance(data, (list, tuple)):
+        data = np.asarray(data)
+    if hasattr(data, "shape") and hasattr(data, "dtype"):
+        return tuple(data.shape), np.dtype(data.dtype)
+    return None
+
+
+def _get_location(neurodata_object) -> str:
+    """Return the path of an object in the NWB file, e.g. "processing/ophys/DffOnePhotonSeries"."""
+    names = []
+    while not isinstance(neurodata_object, NWBFile):
+        names.insert(0, neurodata_object.name)
+        parent = neurodata_object.parent
+        if isinstance(neurodata_object, ProcessingModule):
+            names.insert(0, "processing")
+        elif isinstance(parent, NWBFile) and neurodata_object in parent.acquisition.values():
+            names.insert(0, "acquisition")
+        neurodata_object = parent
+    return "/".join(names)
+
+
+def use_zarr_data_io(nwbfile: NWBFile, compression_level: int = 4) -> int:
+    """Replace the H5DataIO of all the datasets of an in-memory NWB file by ZarrDataIO, keeping their chunks.
+
+    Parameters
+    ----------
+    nwbfile: NWBFile
+        The in-memory NWB file, to be written with the Zarr backend.
+    compression_level: int, default: 4
+        The zstd level of the compressed datasets.
+
+    Returns
+    -------
+    num_replaced: int
+        The number of datasets whose H5DataIO was replaced.
+    """
+    from hdmf_zarr import ZarrDataIO
+
+    num_replaced = 0
+    for neurodata_object in nwbfile.all_children():
+        for field_name, value in list(getattr(neurodata_object, "fields", dict()).items()):
+            if not isinstance(value, H5DataIO):
+                continue
+            io_settings = value.io_settings
+            compressor = None
+            if io_settings.get("compression") is not None:
+                compressor = _get_zarr_compressor(
+                    compression_level=compression_level, shuffle=bool(io_settings.get("shuffle"))
+                )
+            chunks = io_settings.get("chunks")
+            neurodata_object.fields[field_name] = ZarrDataIO(
+                data=value.data, chunks=chunks if isinstance(chunks, tuple) else None, compressor=compressor
+            )
+            num_replaced += 1
+    return num_replaced
+
+
+def validate_data_io_overrides(
+    backend: Literal["hdf5", "zarr"],
+    dataset_io_overrides: Optional[Dict[str, dict]] = None,
+    access_pattern_io_overrides: Optional[Dict[str, dict]] = None,
+) -> None:
+    """Raise a ValueError if the DataIO arguments replacing the planned ones are not arguments of the backend.
+
+    The converters check their overrides when they are created, before an NWB file is written: hdmf-zarr would only
+    fail on a H5DataIO argument once the Zarr folder is created.
+
+    Parameters
+    ----------
+    backend: {"hdf5", "zarr"}
+        The backend the NWB file is written with.
+    dataset_io_overrides: dict, optional
+        The DataIO arguments of some datasets, by location, see `configure_datasets`.
+    access_pattern_io_overrides: dict, optional
+        The DataIO arguments of the datasets of some access patterns, see `configure_datasets`.
+    """
+    other_backend_arguments = [
+        argument
+        for other_backend, arguments in _BACKEND_DATA_IO_ARGUMENTS.items()
+        if other_backend != backend
+        for argument in arguments
+    ]
+    for overrides_name, overrides in (
+        ("dataset_io_overrides", dataset_io_overrides),
+        ("access_pattern_io_overrides", access_pattern_io_overrides),
+    ):
+        for key, data_io_kwargs in (overrides or dict()).items():
+            invalid_arguments = [argument for argument in data_io_kwargs if argument in other_backend_arguments]
+            if invalid_arguments:
+                raise ValueError(
+                    f"The {overrides_name} of '{key}' have the arguments {invalid_arguments}, which the DataIO of the "
+                    f"'{backend}' backend doesn't take. With the codec choices of the codec benchmark, use "
+                    f"`load_codec_choices(..., backend='{backend}')`."
+                )
+
+
+def configure_datasets(
+    nwbfile: NWBFile,
+    chunk_mb: float = 1.0,
+    backend: Literal["hdf5", "zarr"] = "hdf5",
+    dataset_io_overrides: Optional[Dict[str, dict]] = None,
+    access_pattern_io_overrides: Optional[Dict[str, dict]] = None,
+) -> Dict[str, dict]:
+    """Apply the planned chunking and compression to the data of all the TimeSeries of an in-memory NWB file.
+
+    The data already wrapped in a H5DataIO (e.g. the photon series written by neuroconv) has its settings replaced,
+    and the imaging iterators are recreated with the planned chunk shape so that their buffers stay aligned with the
+    chunks. Must be called before the NWB file is written.
+
+    Parameters
+    ----------
+    nwbfile: NWBFile
+        The in-memory NWB file.
+    chunk_mb: float, default: 1.0
+        The target size of a chunk, in MB.
+    backend: {"hdf5", "zarr"}, default: "hdf5"
+        The backend the NWB file is written with. With "zarr", the datasets are wrapped in ZarrDataIO, including the
+        ones that are not planned (see `use_zarr_data_io`).
+    dataset_io_overrides: dict, optional
+        The H5DataIO or ZarrDataIO arguments replacing the planned ones of some datasets, by location, e.g.
+        `{"acquisition/OnePhotonSeries/data": dict(chunks=(16, 512, 512))}`.
+    access_pattern_io_overrides: dict, optional
+        The H5DataIO or ZarrDataIO arguments replacing the planned ones of the chunked datasets of an access pattern,
+        by access pattern, e.g. the codec choices of `load_codec_choices`. Their chunk shape is clipped to the shape
+        of each dataset, a None size spanning the whole axis, and the `dataset_io_overrides` of a location are applied
+        on top of them.
+
+    Returns
+    -------
+    dataset_plans: dict
+        The H5DataIO or ZarrDataIO arguments applied to each dataset, by location (e.g.
+        "acquisition/OnePhotonSeries/data").
+    """
+    validate_data_io_overrides(
+        backend=backend,
+        dataset_io_overrides=dataset_io_overrides,
+        access_pattern_io_overrides=access_pattern_io_overrides,
+    )
+    data_io_class = H5DataIO
+    if backend == "zarr":
+        from hdmf_zarr import ZarrDataIO
+
+        data_io_class = ZarrDataIO
+    dataset_io_overrides = dataset_io_overrides or dict()
+    access_pattern_io_overrides = access_pattern_io_overrides or dict()
+    dataset_plans = dict()
+    for neurodata_object in nwbfile.all_children():
+        if not isinstance(neurodata_object, TimeSeries) or isinstance(neurodata_object.data, TimeSeries):
+            continue
+        data = neurodata_object.data
+        # other backends' DataIO and the datasets already written (NWB file read in append mode) are left as they are
+        if isinstance(data, h5py.Dataset) or (isinstance(data, DataIO) and not isinstance(data, H5DataIO)):
+            continue
+        shape_and_dtype = _get_shape_and_dtype(data)
+        if shape_and_dtype is None or shape_and_dtype[1].kind not in "biuf":
+            continue
+
+        shape, dtype = shape_and_dtype
+        location = f"{_get_location(neurodata_object)}/data"
+        access_pattern = get_access_pattern(neurodata_object)
+        data_io_kwargs = plan_dataset_io(
+            shape=shape, dtype=dtype, access_pattern=access_pattern, chunk_mb=chunk_mb, backend=backend
+        )
+        # the datasets planned contiguous stay contiguous
+        if data_io_kwargs and access_pattern in access_pattern_io_overrides:
+            access_pattern_io_kwargs = dict(access_pattern_io_overrides[access_pattern])
+            chunks = access_pattern_io_kwargs.pop("chunks", None)
+            if chunks is not None and len(chunks) <= len(shape):
+                data_io_kwargs["chunks"] = _clip_chunk_shape(chunk_shape=chunks, shape=shape)
+            # the options of the planned codec don't apply to another one
+            if "compression" in access_pattern_io_kwargs:
+                data_io_kwargs.pop("compression_opts", None)
+            data_io_kwargs.update(access_pattern_io_kwargs)
+        data_io_kwargs.update(dataset_io_overrides.get(location, dict()))
+        if isinstance(data, H5DataIO):
+            data_iterator = data.data
+            if isinstance(data_iterator, ImagingExtractorDataChunkIterator) and "chunks" in data_io_kwargs:
+                data_iterator = ImagingExtractorDataChunkIterator(
+                    imaging_extractor=data_iterator.imaging_extractor, chunk_shape=data_io_kwargs["chunks"]
+                )
+            elif isinstance(data_iterator, MaskedPixelsDataChunkIterator) and "chunks" in data_io_kwargs:
+                data_iterator = MaskedPixelsDataChunkIterator(
+                    imaging_extractor=data_iterator.imaging_extractor,
+                    end_frame=data_iterator.end_frame,
+                    conversion=data_iterator.conversion,
+                    offset=data_iterator.offset,
+                    dtype=data_iterator.quantized_dtype,
+                    chunk_shape=data_io_kwargs["chunks"],
+                )
+            neurodata_object.fields["data"] = data_io_class(data=data_iterator, **data_io_kwargs)
+        elif data_io_kwargs:
+            neurodata_object.set_data_io(
+                dataset_name="data", data_io_class=data_io_class, data_io_kwargs=data_io_kwargs
+            )
+        else:
+            continue
+
+        dataset_plans[location] = data_io_kwargs
+
+    if backend == "zarr":
+        use_zarr_data_io(nwbfile=nwbfile)
+    return dataset_plans
@@ -0,0 +1,142 @@
+"""Measure the import time of the converters with `python -X importtime` and check it against a budget.
+
+Each measurement imports the module in a fresh interpreter, so that the modules already imported by the current
+process are counted. The modules of `IMPORT_TIME_BASELINE_MODULES` (neuroconv, and with it pynwb and hdmf) are imported
+first: their import time doesn't depend on this package, only the import time added by the module is measured.
+The subpackages import their modules on first access, so the budgets are on the modules a conversion imports: the
+converters and the session scripts. Run the module as a script to check the budgets of `IMPORT_TIME_BUDGETS`, it exits
+with an error if one of them is exceeded:
+
+    python -m higley_lab_to_nwb.tools.import_time
+
+Functions
+---------
+measure_import_time
+    Return the import time of a module and of the modules it imports.
+check_import_time_budgets
+    Raise an error if the import time of a module exceeds its budget.
+"""
+
+import subprocess
+import sys
+from typing import Dict, List, Optional, Sequence
+
+# the modules imported before the measured module, their import time is not counted
+IMPORT_TIME_BASELINE_MODULES = ("neuroconv",)
+# the maximum import time of the modules, in addition to the baseline modules, in seconds
+IMPORT_TIME_BUDGETS = {
+    "higley_lab_to_nwb.higley_lab_nwbconverter": 0.25,
+    "higley_lab_to_nwb.benisty_2024.benisty_2024_nwbconverter": 0.25,
+    "higley_lab_to_nwb.lohani_2022.lohani_2022nwbconverter": 0.25,
+    "higley_lab_to_nwb.benisty_2024.benisty_2024_convert_dual_imaging_session": 0.6,
+    "higley_lab_to_nwb.benisty_2024.benisty_2024_convert_2p_only_session": 0.6,
+    "higley_lab_to_nwb.lohani_2022.lohani_2022_convert_session": 0.6,
+}
+
+
+def _get_baseline_end(lines: List[str], baseline_module_names: Sequence[str]) -> int:
+    """Return the index of the line following the record of the last baseline module."""
+    baseline_module_names = set(baseline_module_names)
+    baseline_end = 0
+    for index, line in enumerate(lines):
+        if line.startswith("import time:") and line.rsplit("|", 1)[-1].strip() in baseline_module_names:
+            baseline_end = index + 1
+    return baseline_end
+
+
+def measure_import_time(
+    module_name: str, baseline_module_names: Sequence[str] = IMPORT_TIME_BASELINE_MODULES, repeats: int = 3
+) -> List[dict]:
+    """Return the import time of a module and of the modules it imports, with `python -X importtime`.
+
+    Parameters
+    ----------
+    module_name: str
+        The name of the module to import.
+    baseline_module_names: list of str, default: IMPORT_TIME_BASELINE_MODULES
+        The modules imported first, the modules they import are not counted in the import time of `module_name`.
+    repeats: int, default: 3
+        The number of measurements, each in a fresh interpreter. The fastest one is returned, the first one usually
+        includes the compilation of the modules.
+
+    Returns
+    -------
+    records: list of dict
+        One record per imported module with the "module", its "self_time_s" and its "cumulative_time_s" (including
+        the modules it imports), in the order of `-X importtime`: the last record is `module_name` itself.
+    """
+    import_statements = "; ".join(f"import {name}" for name in [*baseline_module_names, module_name])
+    fastest_records = None
+    for _ in range(repeats):
+        completed_process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", import_statements],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        records = []
+        # the records of the baseline modules are before the first record of the measured module
+        lines = completed_process.stderr.splitlines()
+        for line in lines[_get_baseline_end(lines=lines, baseline_module_names=baseline_module_names) :]:
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_time, cumulative_time, module = line[len("import time:") :].split("|")
+            records.append(
+                dict(
+                    module=module.strip(),
+                    self_time_s=int(self_time) / 1e6,
+                    cumulative_time_s=int(cumulative_time) / 1e6,
+                )
+            )
+        if fastest_records is None or records[-1]["cumulative_time_s"] < fastest_records[-1]["cumulative_time_s"]:
+            fastest_records = records
+    return fastest_records
+
+
+def check_import_time_budgets(budgets: Optional[Dict[str, float]] = None, verbose: bool = True) -> Dict[str, float]:
+    """Raise an error if the import time of a module, in addition to the baseline modules, exceeds its budget.
+
+    Parameters
+    ----------
+    budgets: dict, optional
+        The maximum import time of each module, in seconds, by default `IMPORT_TIME_BUDGETS`.
+    verbose: bool, default: True
+        Whether to print the import time of each module.
+
+    Returns
+    -------
+    import_times: dict
+        The import time of each module, in seconds.
+
+    Raises
+    ------
+    RuntimeError
+        If a module exceeds its budget, with the modules it imports that take the most time.
+    """
+    budgets = budgets or IMPORT_TIME_BUDGETS
+    name_width = max(len(module_name) for module_name in budgets) + 2
+    import_times = dict()
+    errors = []
+    for module_name, budget in budgets.items():
+        records = measure_import_time(module_name=module_name)
+        import_times[module_name] = records[-1]["cumulative_time_s"]
+        if verbose:
+            print(f"{module_name:<{name_width}}{import_times[module_name]:>8.3f} s (budget: {budget:.3f} s)")
+        if import_times[module_name] > budget:
+            slowest_records = sorted(records[:-1], key=lambda record: record["self_time_s"], reverse=True)[:10]
+            slowest_modules = ", ".join(
+                f"{record['module']} ({record['self_time_s']:.3f} s)" for record in slowest_records
+            )
+            errors.append(
+                f"Importing '{module_name}' takes {import_times[module_name]:.3f} s, "
+                f"over its budget of {budget:.3f} s. "
+                f"The slowest imported modules are: {slowest_modules}."
+            )
+    if errors:
+        raise RuntimeError("\n".join(errors))
+    return import_times
+
+
+if __name__ == "__main__":
+
+    check_import_time_budgets()
@@ -0,0 +1,341 @@
+"""Incremental conversion: add or replace the data of some interfaces in an existing NWB file.
+
+Rerunning a processing step (parcellation, hemodynamic correction, Facemap) only changes the sources of a few
+interfaces, so their data can be replaced in the NWB file of the session without rewriting the raw imaging.
+The converters record in the NWB file, as the "conversion_record" scratch data, the hash of the sources of each
+interface and the object IDs of the objects it added. An incremental conversion then compares the hashes of the
+sources with the recorded ones, removes the objects of the interfaces whose sources changed, and adds these
+interfaces again in append mode.
+
+The objects shared by several interfaces (devices, imaging planes) are kept, and the containers shared by several
+interfaces (processing modules, image segmentations, frame masks) are only removed when they become empty.
+HDF5 doesn't reclaim the space of the removed datasets: repack the file (e.g. with `h5repack`) to shrink it after
+many replacements of large datasets.
+
+Functions
+---------
+get_interface_source_hash
+    Hash the sources and the conversion options of a data interface.
+add_data_interfaces_to_nwbfile
+    Add data interfaces to an in-memory NWB file and record the objects they added.
+read_conversion_record
+    Read the conversion record of an NWB file.
+append_changed_interfaces
+    Add or replace, in an existing NWB file, the interfaces of a converter whose sources changed.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+import h5py
+import numpy as np
+from hdmf.container import AbstractContainer
+from neuroconv import BaseDataInterface
+from neuroconv.utils import FilePathType
+from pynwb import NWBHDF5IO, NWBFile
+from pynwb.core import MultiContainerInterface
+from pynwb.device import Device
+from pynwb.file import ScratchData
+from pynwb.ophys import ImagingPlane
+
+from .conversion_manifest import get_source_hash
+
+if TYPE_CHECKING:
+    from higley_lab_to_nwb.higley_lab_nwbconverter import HigleyLabNWBConverter
+
+CONVERSION_RECORD_NAME = "conversion_record"
+# the objects referenced by the objects of several interfaces, never removed with an interface
+_SHARED_OBJECT_TYPES = (Device, ImagingPlane)
+
+
+def _serialize_source_value(value) -> str:
+    """Serialize the arrays of the source data by their hash, so that a change of their values changes the hash."""
+    if isinstance(value, np.ndarray):
+        array_hash = hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+        return f"ndarray(shape={value.shape}, dtype={value.dtype}, sha256={array_hash})"
+    if isinstance(value, np.generic):
+        return str(value.item())
+    return str(value)
+
+
+def get_interface_source_hash(data_interface: BaseDataInterface, conversion_options: Optional[dict] = None) -> str:
+    """Hash the sources and the conversion options of a data interface.
+
+    The files and folders of the source data are hashed from their names, sizes and modification times (see
+    `get_source_hash`), the other source data and the conversion options from their values.
+
+    Parameters
+    ----------
+    data_interface: BaseDataInterface
+        The data interface, whose `source_data` are hashed.
+    conversion_options: dict, optional
+        The conversion options of the interface.
+
+    Returns
+    -------
+    source_hash: str
+        The SHA-256 hex digest of the sources and options.
+    """
+    source_paths, source_values = [], dict()
+    for key, value in data_interface.source_data.items():
+        if isinstance(value, (str, Path)) and Path(value).exists():
+            source_paths.append(value)
+        else:
+            source_values[key] = value
+    session_kwargs = json.loads(
+        json.dumps(
+            dict(source_data=source_values, conversion_options=conversion_options or dict()),
+            sort_keys=True,
+            default=_serialize_source_value,
+        )
+    )
+    return get_source_hash(source_paths=source_paths, session_kwargs=session_kwargs)
+
+
+def _get_added_object_ids(nwbfile: NWBFile, previous_object_ids: Iterable[str]) -> Dict[str, List[str]]:
+    """Return the IDs of the objects added to an NWB file since `previous_object_ids`.
+
+    Only the roots of the added subtrees are returned as "object_ids". The added containers of several objects
+    (e.g. a processing module) are returned as "container_ids" and their added children are looked at instead, so
+    that another interface adding to the same container later doesn't lose its objects when this one is removed.
+    """
+    previous_object_ids = set(previous_object_ids)
+    added_object_ids = dict(object_ids=[], container_ids=[])
+
+    def add_subtree(neurodata_object: AbstractContainer) -> None:
+        if isinstance(neurodata_object, _SHARED_OBJECT_TYPES):
+            return
+        if isinstance(neurodata_object, MultiContainerInterface):
+            added_object_ids["container_ids"].append(neurodata_object.object_id)
+            for child in neurodata_object.children:
+                add_subtree(child)
+        else:
+            added_object_ids["object_ids"].append(neurodata_object.object_id)
+
+    # `nwbfile.objects` is cached, `all_children` lists the objects added since
+    for neurodata_object in nwbfile.all_children():
+        if neurodata_object.object_id in previous_object_ids:
+            continue
+        parent = neurodata_object.parent
+        if parent is not None and parent.object_id in previous_object_ids:
+            add_subtree(neurodata_object)
+    return added_object_ids
+
+
+def add_data_interfaces_to_nwbfile(
+    nwbfile: NWBFile,
+    metadata: dict,
+    data_interface_objects: Dict[str, BaseDataInterface],
+    conversion_options: Optional[dict] = None,
+    conversion_record: Optional[dict] = None,
+    add_conversion_record: bool = True,
+) -> dict:
+    """Add data interfaces to an in-memory NWB file and record the objects they added.
+
+    Parameters
+    ----------
+    nwbfile: NWBFile
+        The in-memory NWB file, new or read in append mode.
+    metadata: dict
+        The metadata of the conversion.
+    data_interface_objects: dict
+        The data interfaces to add, by name.
+    conversion_options: dict, optional
+        The conversion options of each interface, by name.
+    conversion_record: dict, optional
+        The record of the interfaces already in the NWB file, updated with the added interfaces.
+    add_conversion_record: bool, default: True
+        Whether to add the record to the NWB file as the "conversion_record" scratch data. The incremental conversion
+        updates the record of the NWB file itself, once the data of the interfaces is written.
+
+    Returns
+    -------
+    conversion_record: dict
+        The hash of the sources and the object IDs of each interface of the NWB file, also written in the NWB file as
+        the "conversion_record" scratch data.
+    """
+    conversion_options = conversion_options or dict()
+    conversion_record = dict(conversion_record or dict())
+    for interface_name, data_interface in data_interface_objects.items():
+        interface_conversion_options = conversion_options.get(interface_name, dict())
+        previous_object_ids = [neurodata_object.object_id for neurodata_object in nwbfile.all_children()]
+        data_interface.add_to_nwbfile(nwbfile=nwbfile, metadata=metadata, **interface_conversion_options)
+        conversion_record[interface_name] = dict(
+            source_hash=get_interface_source_hash(
+                data_interface=data_interface, conversion_options=interface_conversion_options
+            ),
+            **_get_added_object_ids(nwbfile=nwbfile, previous_object_ids=previous_object_ids),
+        )
+
+    if not add_conversion_record:
+        return conversion_record
+    if CONVERSION_RECORD_NAME in nwbfile.scratch:
+        raise ValueError(f"The NWB file already has a '{CONVERSION_RECORD_NAME}', remove it before adding interfaces.")
+    nwbfile.add_scratch(
+        ScratchData(
+            name=CONVERSION_RECORD_NAME,
+            data=json.dumps(conversion_record, sort_keys=True),
+            description="The hash of the sources and the object IDs of the objects of each data interface, "
+            "to replace the interfaces whose sources changed with higley_lab_to_nwb.tools.append_changed_interfaces.",
+        )
+    )
+    return conversion_record
+
+
+def read_conversion_record(nwbfile_path: FilePathType) -> Optional[dict]:
+    """Read the conversion record of an NWB file, None if it was written without one."""
+    with h5py.File(nwbfile_path, "r") as file:
+        record_path = f"scratch/{CONVERSION_RECORD_NAME}"
+        if record_path not in file:
+            return None
+        conversion_record = file[record_path][()]
+    if isinstance(conversion_record, bytes):
+        conversion_record = conversion_record.decode("utf-8")
+    return json.loads(conversion_record)
+
+
+def _write_conversion_record(nwbfile_path: FilePathType, conversion_record: dict) -> None:
+    """Replace the conversion record of an NWB file, in place."""
+    with h5py.File(nwbfile_path, "r+") as file:
+        file[f"scratch/{CONVERSION_RECORD_NAME}"][()] = json.dumps(conversion_record, sort_keys=True)
+
+
+def _remove_objects(nwbfile_path: FilePathType, interface_records: List[dict]) -> None:
+    """Remove the objects of the interfaces from an NWB file, and the emptied containers."""
+    with h5py.File(nwbfile_path, "r+") as file:
+        object_paths = dict()
+
+        def find_object_id(name: str, h5py_object) -> None:
+            object_id = h5py_object.attrs.get("object_id")
+            if object_id is not None:
+                object_paths[object_id.decode("utf-8") if isinstance(object_id, bytes) else object_id] = name
+
+        file.visititems(find_object_id)
+
+        for interface_record in interface_records:
+            for object_id in interface_record["object_ids"]:
+                if object_id in object_paths and object_paths[object_id] in file:
+                    del file[object_paths[object_id]]
+        # the deepest containers first, so that their parents can become empty
+        container_paths = [
+            object_paths[object_id]
+            for interface_record in interface_records
+            for object_id in interface_record["container_ids"]
+            if object_id in object_paths
+        ]
+        for container_path in sorted(set(container_paths), key=lambda path: path.count("/"), reverse=True):
+            if container_path in file and len(file[container_path]) == 0:
+                del file[container_path]
+
+
+def append_changed_interfaces(
+    converter: "HigleyLabNWBConverter",
+    nwbfile_path: FilePathType,
+    metadata: Optional[dict] = None,
+    conversion_options: Optional[dict] = None,
+    interface_names: Optional[List[str]] = None,
+) -> List[str]:
+    """Add or replace, in an existing NWB file, the interfaces of a converter whose sources changed.
+
+    The interfaces that are not in the conversion record of the NWB file are added, the ones whose sources or
+    conversion options changed since the record are removed and added again, the others are left untouched.
+    The interfaces are aligned with `converter.align_data_interfaces` before being added, unless they already are, so
+    the converter must have all the sources needed for the alignment. The objects of the replaced interfaces are
+    removed before the new ones are written. The record of the changed interfaces is cleared of their source hash
+    before the removal, and only updated with it once all their data is written, including the imaging data of the
+    pipelined write: an interrupted incremental conversion leaves them recorded as changed, and it can be run again to
+    replace them.
+
+    Parameters
+    ----------
+    converter: HigleyLabNWBConverter
+        The converter of the session, Lohani2022NWBConverter or Benisty2024NWBConverter.
+    nwbfile_path: str or Path
+        The path to the NWB file written by a complete conversion of the session.
+    metadata: dict, optional
+        The metadata of the conversion, by default `converter.get_metadata()`.
+    conversion_options: dict, optional
+        The conversion options of each interface, by name.
+    interface_names: list of str, optional
+        The interfaces to consider, by default all the interfaces of the converter.
+
+    Returns
+    -------
+    interface_names: list of str
+        The names of the interfaces added or replaced.
+
+    Raises
+    ------
+    ValueError
+        If the NWB file was written without a conversion record.
+    """
+    conversion_options = conversion_options or dict()
+    conversion_record = read_conversion_record(nwbfile_path=nwbfile_path)
+    if conversion_record is None:
+        raise ValueError(
+            f"The NWB file '{nwbfile_path}' has no '{CONVERSION_RECORD_NAME}' to know which objects each interface "
+            "added. Convert the session once with the current version of the converter to enable the incremental "
+            "conversions."
+        )
+
+    interface_names = interface_names or list(converter.data_interface_objects)
+    changed_interface_names = [
+        interface_name
+        for interface_name in interface_names
+        if conversion_record.get(interface_name, dict()).get("source_hash")
+        != get_interface_source_hash(
+            data_interface=converter.data_interface_objects[interface_name],
+            conversion_options=conversion_options.get(interface_name),
+        )
+    ]
+    if not changed_interface_names:
+        return []
+
+    metadata = metadata or converter.get_metadata()
+    converter.align_data_interfaces()
+    # the changed interfaces keep their objects in the record, without a source hash, until they are written again
+    replaced_interface_records = [
+        conversion_record[interface_name]
+        for interface_name in changed_interface_names
+        if interface_name in conversion_record
+    ]
+    conversion_record.update(
+        {
+            interface_name: dict(interface_record, source_hash=None)
+            for interface_name, interface_record in conversion_record.items()
+            if interface_name in changed_interface_names
+        }
+    )
+    _write_conversion_record(nwbfile_path=nwbfile_path, conversion_record=conversion_record)
+    _remove_objects(nwbfile_path=nwbfile_path, interface_records=replaced_interface_records)
+
+    with NWBHDF5IO(nwbfile_path, mode="a") as io:
+        nwbfile = io.read()
+        conversion_record = converter.add_to_nwbfile(
+            nwbfile=nwbfile,
+            metadata=metadata,
+            conversion_options=conversion_options,
+            interface_names=changed_interface_names,
+            conversion_record=conversion_record,
+            add_conversion_record=False,
+        )
+        io.write(nwbfile)
+    # the interfaces whose imaging data is still to be written are recorded with their new objects, as changed
+    _write_conversion_record(
+        nwbfile_path=nwbfile_path,
+        conversion_record={
+            interface_name: (
+                dict(interface_record, source_hash=None)
+                if getattr(converter.data_interface_objects.get(interface_name), "_pending_pipelined_write", None)
+                is not None
+                else interface_record
+            )
+            for interface_name, interface_record in conversion_record.items()
+        },
+    )
+    converter.write_pending_imaging_data(nwbfile_path=nwbfile_path)
+    _write_conversion_record(nwbfile_path=nwbfile_path, conversion_record=conversion_record)
+
+    return changed_interface_names
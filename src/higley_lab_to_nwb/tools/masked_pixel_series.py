@@ -0,0 +1,254 @@
+"""Storage of processed imaging series as the traces of the pixels of a frame mask.
+
+The dF/F of the dual imaging sessions ("dff_blue" and "dff_uv") is only defined inside the brain mask. Instead of full
+frames zero-filled outside the mask, the series can be stored as the (frames, masked pixels) matrix of the MATLab
+files, in a TimeSeries, and the mask once, as a GrayscaleImage in the "FrameMasks" Images of the same container,
+named after the series with a "Mask" suffix.
+The mask image is in the orientation of the photon series frames (the transpose of the MATLab mask), so the frames
+rebuilt by `get_masked_pixel_frames` are the frames the photon series would have stored.
+
+Classes
+-------
+MaskedPixelsDataChunkIterator
+    Iterator over the (frames, masked pixels) matrix of a processed imaging extractor, quantized or not.
+
+Functions
+---------
+add_masked_pixel_series
+    Add the masked pixel traces of a processed imaging series and its frame mask to an NWB file.
+unmask_frames
+    Rebuild full frames from masked pixel traces.
+get_masked_pixel_frames
+    Read a window of frames of a masked pixel series from an NWB file.
+"""
+
+from typing import Literal, Optional, Tuple, Union
+
+import numpy as np
+from hdmf.backends.hdf5 import H5DataIO
+from hdmf.data_utils import GenericDataChunkIterator
+from neuroconv.tools.nwb_helpers import get_module
+from pynwb import NWBFile, TimeSeries
+from pynwb.base import Images
+from pynwb.image import GrayscaleImage
+
+from ..extractors.processed_imaging_extractor import ProcessedImagingExtractor, get_masked_pixel_coordinates
+from ..extractors.quantized_imaging_extractor import quantize
+
+FRAME_MASKS_NAME = "FrameMasks"
+
+
+class MaskedPixelsDataChunkIterator(GenericDataChunkIterator):
+    """Iterator over the (frames, masked pixels) matrix of a processed imaging extractor, quantized or not."""
+
+    def __init__(
+        self,
+        imaging_extractor: ProcessedImagingExtractor,
+        end_frame: Optional[int] = None,
+        conversion: Optional[float] = None,
+        offset: float = 0.0,
+        dtype: Union[str, np.dtype] = "int16",
+        buffer_gb: Optional[float] = None,
+        buffer_shape: Optional[Tuple[int, int]] = None,
+        chunk_mb: Optional[float] = None,
+        chunk_shape: Optional[Tuple[int, int]] = None,
+        display_progress: bool = False,
+        progress_bar_options: Optional[dict] = None,
+    ):
+        """Create an iterator over the masked pixels of the frames of a processed imaging extractor.
+
+        Parameters
+        ----------
+        imaging_extractor: ProcessedImagingExtractor
+            The processed imaging extractor of a pixels matrix with a frame mask.
+        end_frame: int, optional
+            End frame index (exclusive), defaults to the number of frames.
+        conversion: float, optional
+            The NWB conversion of the quantized masked pixels, the masked pixels are not quantized when None.
+        offset: float, default: 0.0
+            The NWB offset of the quantized masked pixels.
+        dtype: str or np.dtype, default: "int16"
+            The integer dtype of the quantized masked pixels.
+        buffer_gb, buffer_shape, chunk_mb, chunk_shape, display_progress, progress_bar_options
+            See `hdmf.data_utils.GenericDataChunkIterator`.
+        """
+        self.imaging_extractor = imaging_extractor
+        self.end_frame = imaging_extractor.get_num_frames() if end_frame is None else end_frame
+        self.conversion = conversion
+        self.offset = offset
+        self.quantized_dtype = np.dtype(dtype)
+        super().__init__(
+            buffer_gb=buffer_gb,
+            buffer_shape=buffer_shape,
+            chunk_mb=chunk_mb,
+            chunk_shape=chunk_shape,
+            display_progress=display_progress,
+            progress_bar_options=progress_bar_options,
+        )
+
+    def _get_data(self, selection: Tuple[slice, slice]) -> np.ndarray:
+        masked_pixels = self.imaging_extractor.get_masked_pixels(
+            start_frame=selection[0].start, end_frame=selection[0].stop
+        )[:, selection[1]]
+        if self.conversion is None:
+            return masked_pixels
+        return quantize(data=masked_pixels, conversion=self.conversion, offset=self.offset, dtype=self.quantized_dtype)
+
+    def _get_dtype(self) -> np.dtype:
+        if self.conversion is None:
+            return np.dtype(self.imaging_extractor.get_dtype())
+        return self.quantized_dtype
+
+    def _get_maxshape(self) -> Tuple[int, int]:
+        num_masked_pixels = self.imaging_extractor.get_masked_pixels(start_frame=0, end_frame=1).shape[1]
+        return self.end_frame, num_masked_pixels
+
+
+def add_masked_pixel_series(
+    nwbfile: NWBFile,
+    masked_pixels: Union[np.ndarray, MaskedPixelsDataChunkIterator],
+    frame_mask: np.ndarray,
+    name: str,
+    description: str,
+    unit: str = "n.a.",
+    parent_container: Literal["acquisition", "processing/ophys"] = "processing/ophys",
+    starting_time: Optional[float] = None,
+    rate: Optional[float] = None,
+    timestamps: Optional[np.ndarray] = None,
+    conversion: float = 1.0,
+    offset: float = 0.0,
+    comments: Optional[str] = None,
+) -> TimeSeries:
+    """Add the masked pixel traces of a processed imaging series and its frame mask to an NWB file.
+
+    Parameters
+    ----------
+    nwbfile: NWBFile
+        The in-memory NWB file.
+    masked_pixels: np.ndarray or MaskedPixelsDataChunkIterator
+        The (frames, masked pixels) matrix, with the pixels in the order of `get_masked_pixel_coordinates`, or an
+        iterator over it.
+    frame_mask: np.ndarray
+        The (rows, columns) frame mask of the MATLab file.
+    name: str
+        The name of the series, the mask image is named f"{name}Mask".
+    description: str
+        The description of the series.
+    unit: str, default: "n.a."
+        The unit of the series.
+    parent_container: "acquisition" or "processing/ophys", default: "processing/ophys"
+        The container of the series and of the frame masks.
+    starting_time, rate: float, optional
+        The timing of a regular series.
+    timestamps: np.ndarray, optional
+        The timestamps of an irregular series.
+    conversion, offset: float, default: 1.0 and 0.0
+        The NWB conversion and offset of quantized masked pixels, see `higley_lab_to_nwb.extractors.quantize`.
+    comments: str, optional
+        Comments appended to the description of the pixel order.
+
+    Returns
+    -------
+    time_series: TimeSeries
+        The series added to the NWB file.
+    """
+    num_masked_pixels = int(np.count_nonzero(frame_mask))
+    shape = masked_pixels.maxshape if isinstance(masked_pixels, GenericDataChunkIterator) else masked_pixels.shape
+    if shape[1] != num_masked_pixels:
+        raise ValueError(
+            f"The number of pixels {shape[1]} does not match the non-zero elements in the frame mask "
+            f"{num_masked_pixels}."
+        )
+
+    pixel_order_comments = (
+        f"The traces of the {num_masked_pixels} non-zero pixels of the frame mask '{FRAME_MASKS_NAME}/{name}Mask', "
+        "from the last row and the last column of the frame."
+    )
+    time_series = TimeSeries(
+        name=name,
+        description=description,
+        comments=pixel_order_comments if comments is None else f"{pixel_order_comments} {comments}",
+        data=H5DataIO(data=masked_pixels, compression=True),
+        unit=unit,
+        conversion=conversion,
+        offset=offset,
+        starting_time=starting_time,
+        rate=rate,
+        timestamps=timestamps,
+    )
+    mask_image = GrayscaleImage(
+        name=f"{name}Mask",
+        data=(np.asarray(frame_mask) != 0).T.astype("uint8"),
+        description=f"The frame mask of the pixels of '{name}', in the orientation of the photon series frames.",
+    )
+
+    if parent_container == "acquisition":
+        container = nwbfile.acquisition
+        add = nwbfile.add_acquisition
+    else:
+        ophys = get_module(nwbfile, name="ophys")
+        container = ophys.data_interfaces
+        add = ophys.add
+    if FRAME_MASKS_NAME not in container:
+        add(Images(name=FRAME_MASKS_NAME, description="The frame masks of the masked pixel series."))
+    container[FRAME_MASKS_NAME].add_image(mask_image)
+    add(time_series)
+
+    return time_series
+
+
+def unmask_frames(masked_pixels: np.ndarray, frame_mask: np.ndarray) -> np.ndarray:
+    """Rebuild full frames from masked pixel traces.
+
+    Parameters
+    ----------
+    masked_pixels: np.ndarray
+        The (frames, masked pixels) matrix.
+    frame_mask: np.ndarray
+        The frame mask, in the orientation of the photon series frames, as stored in the NWB file.
+
+    Returns
+    -------
+    frames: np.ndarray
+        The (frames, *frame_mask.shape) frames, zero outside the mask, in the dtype of `masked_pixels`.
+    """
+    pixel_rows, pixel_columns = get_masked_pixel_coordinates(mask=np.asarray(frame_mask).T)
+    frames = np.zeros((masked_pixels.shape[0], *frame_mask.shape), dtype=masked_pixels.dtype)
+    frames[:, pixel_columns, pixel_rows] = masked_pixels
+    return frames
+
+
+def get_masked_pixel_frames(
+    nwbfile: NWBFile,
+    name: str,
+    start_frame: Optional[int] = None,
+    end_frame: Optional[int] = None,
+    parent_container: Literal["acquisition", "processing/ophys"] = "processing/ophys",
+) -> np.ndarray:
+    """Read a window of frames of a masked pixel series from an NWB file.
+
+    Only the masked pixels of the requested frames are read from the file. The frames are the stored values: the
+    values of a quantized series are `frames * time_series.conversion + time_series.offset` inside the mask.
+
+    Parameters
+    ----------
+    nwbfile: NWBFile
+        The NWB file, e.g. read with NWBHDF5IO.
+    name: str
+        The name of the masked pixel series.
+    start_frame: int, optional
+        Start frame index (inclusive).
+    end_frame: int, optional
+        End frame index (exclusive).
+    parent_container: "acquisition" or "processing/ophys", default: "processing/ophys"
+        The container of the series and of the frame masks.
+
+    Returns
+    -------
+    frames: np.ndarray
+        The (frames, columns, rows) frames, as the photon series would have stored them.
+    """
+    container = nwbfile.acquisition if parent_container == "acquisition" else nwbfile.processing["ophys"]
+    time_series = container[name]
+    frame_mask = container[FRAME_MASKS_NAME][f"{name}Mask"].data[:]
+    return unmask_frames(masked_pixels=time_series.data[start_frame:end_frame], frame_mask=frame_mask)
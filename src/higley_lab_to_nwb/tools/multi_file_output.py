@@ -0,0 +1,334 @@
+"""Multi-file output: each large imaging series written to its own HDF5 file, in parallel, linked from the NWB file.
+
+HDF5 allows a single writer per file, so the imaging series of a session are written one after the other in a single
+file layout. In the multi-file layout, the data of each photon series added with `pipelined_write=True` is moved to
+its own HDF5 file, next to the NWB file and named after it and the series (e.g. "session_OnePhotonSeries.h5"), and
+replaced in the NWB file by an external link, with the data of its binned copy if any. The series files are then
+filled at the same time, by one process each. The empty dataset is copied to the series file with its attributes,
+chunking and filters, so that the linked data is read by pynwb as if it were in the NWB file. The links are relative,
+so the NWB file and its series files can be moved together.
+
+The NWB file and its series files can be merged into a single file with `consolidate_nwbfile`, e.g. before the upload
+to DANDI, which expects self-contained files.
+
+A Zarr NWB file stores each chunk in its own file, so its series are written in parallel processes in place, without
+series files nor links (see `write_imaging_series_in_parallel`).
+
+Functions
+---------
+write_imaging_series_files
+    Write the deferred imaging data of a closed NWB file to one HDF5 file per series, in parallel processes.
+write_imaging_series_in_parallel
+    Write the deferred imaging data of a closed Zarr NWB file in place, in parallel processes.
+get_external_links
+    Return the external links of an HDF5 file.
+consolidate_nwbfile
+    Copy the data of the external links of an NWB file into it.
+"""
+
+import multiprocessing
+import os
+import queue
+import shutil
+import traceback
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Tuple
+
+import h5py
+from neuroconv.utils import FilePathType
+
+from .conversion_manifest import get_final_nwbfile_path
+from .binned_imaging_series import BinnedSeriesWriter
+from .pipelined_imaging_write import open_nwbfile_datasets, write_imaging_data_pipelined
+from .summary_images import SummaryImageAccumulator, write_summary_images
+
+
+def _write_series_in_worker(
+    interface_name: str,
+    file_path: str,
+    dataset_path: str,
+    imaging_extractor,
+    pipeline_options: dict,
+    add_summary_images: bool,
+    conversion_and_offset: Tuple[float, float],
+    binned_series: Optional[dict],
+    backend: Literal["hdf5", "zarr"],
+    result_queue: multiprocessing.Queue,
+) -> None:
+    """Fill the dataset of a series in a worker process, and report its summary images or the error if it fails."""
+    error, summary_images = None, None
+    dataset_paths = [dataset_path] if binned_series is None else [dataset_path, binned_series["dataset_path"]]
+    try:
+        with open_nwbfile_datasets(nwbfile_path=file_path, dataset_paths=dataset_paths, backend=backend) as datasets:
+            summary_image_accumulator, binned_series_writer = None, None
+            if add_summary_images:
+                conversion, offset = conversion_and_offset
+                summary_image_accumulator = SummaryImageAccumulator(
+                    frame_shape=datasets[0].shape[1:3], dtype=datasets[0].dtype, conversion=conversion, offset=offset
+                )
+            if binned_series is not None:
+                binned_series_writer = BinnedSeriesWriter(
+                    dataset=datasets[1],
+                    spatial_binning=binned_series["spatial_binning"],
+                    temporal_decimation=binned_series["temporal_decimation"],
+                )
+            write_imaging_data_pipelined(
+                dataset=datasets[0],
+                imaging_extractor=imaging_extractor,
+                summary_image_accumulator=summary_image_accumulator,
+                binned_series_writer=binned_series_writer,
+                **pipeline_options,
+            )
+        if summary_image_accumulator is not None:
+            summary_images = summary_image_accumulator.get_summary_images()
+    except Exception:
+        error = traceback.format_exc()
+    result_queue.put((interface_name, error, summary_images))
+
+
+def _write_series_in_processes(
+    nwbfile_path: Path,
+    file_paths: Dict[str, Path],
+    pending_writes: Dict[str, dict],
+    max_workers: Optional[int],
+    backend: Literal["hdf5", "zarr"],
+    verbose: bool,
+) -> None:
+    """Write the deferred data of each interface to its file, with at most `max_workers` processes at the same time.
+
+    The summary images of the series are sent back by the workers and written in the NWB file by this process.
+    """
+    max_workers = max(1, min(max_workers or len(pending_writes), len(pending_writes) or 1))
+    # forking is unsafe on some platforms (e.g. macOS) and with the threads of the process, their default is kept
+    context = multiprocessing.get_context()
+    result_queue = context.Queue()
+    # the cores are shared between the series written at the same time
+    default_num_compressor_workers = max(1, (os.cpu_count() or 1) // max_workers)
+
+    pending_interface_names = list(pending_writes)
+    running_processes = dict()
+    errors = dict()
+    while pending_interface_names or running_processes:
+        while pending_interface_names and len(running_processes) < max_workers:
+            interface_name = pending_interface_names.pop(0)
+            pending_write = pending_writes[interface_name]
+            pipeline_options = dict(num_compressor_workers=default_num_compressor_workers)
+            pipeline_options.update(pending_write.get("pipeline_options") or dict())
+            process = context.Process(
+                target=_write_series_in_worker,
+                args=(
+                    interface_name,
+                    str(file_paths[interface_name]),
+                    pending_write["dataset_path"],
+                    pending_write["imaging_extractor"],
+                    pipeline_options,
+                    bool(pending_write.get("summary_image_paths")),
+                    pending_write.get("conversion_and_offset", (1.0, 0.0)),
+                    pending_write.get("binned_series"),
+                    backend,
+                    result_queue,
+                ),
+                name=f"write-{interface_name}",
+            )
+            process.start()
+            running_processes[interface_name] = process
+            if verbose:
+                print(f"Writing the imaging data of '{interface_name}' to {file_paths[interface_name]}")
+
+        try:
+            interface_name, error, summary_images = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            # workers killed before reporting (e.g. by the out-of-memory killer) are recorded as failed
+            for interface_name, process in list(running_processes.items()):
+                if not process.is_alive():
+                    running_processes.pop(interface_name)
+                    errors[interface_name] = f"The worker process exited with code {process.exitcode}."
+            continue
+        running_processes.pop(interface_name).join()
+        if error is not None:
+            errors[interface_name] = error
+        elif summary_images is not None:
+            write_summary_images(
+                nwbfile_path=nwbfile_path,
+                dataset_paths=pending_writes[interface_name]["summary_image_paths"],
+                summary_images=summary_images,
+                backend=backend,
+            )
+
+    if errors:
+        raise RuntimeError(
+            "\n".join(f"The imaging data of '{name}' could not be written:\n{error}" for name, error in errors.items())
+        )
+
+
+def _move_datasets_to_series_file(nwbfile_path: Path, dataset_paths: List[str], series_file_path: Path) -> None:
+    """Copy empty datasets to a new series file and replace them by external links in the NWB file."""
+    with h5py.File(nwbfile_path, "r+") as file, h5py.File(series_file_path, "w") as series_file:
+        for dataset_path in dataset_paths:
+            parent_path, dataset_name = dataset_path.rstrip("/").rsplit("/", 1)
+            file.copy(file[dataset_path], series_file.require_group(parent_path or "/"), name=dataset_name)
+            del file[dataset_path]
+            file[dataset_path] = h5py.ExternalLink(series_file_path.name, dataset_path)
+
+
+def write_imaging_series_files(
+    nwbfile_path: FilePathType,
+    pending_writes: Dict[str, dict],
+    max_workers: Optional[int] = None,
+    verbose: bool = False,
+) -> Dict[str, Path]:
+    """Write the deferred imaging data of a closed NWB file to one HDF5 file per series, in parallel processes.
+
+    The worker processes are started with the default start method of the platform: the imaging extractors are pickled
+    for them where they are spawned (e.g. on macOS and Windows).
+
+    Parameters
+    ----------
+    nwbfile_path: str or Path
+        The path to the NWB file with the empty datasets of the deferred series, see
+        `BasePipelinedImagingExtractorInterface`. When it is the temporary path of `atomic_nwbfile_path`, the series
+        files are named after the final NWB file.
+    pending_writes: dict
+        The "dataset_path", "imaging_extractor" and "pipeline_options" of the deferred write of each interface, by
+        interface name, see `BasePipelinedImagingExtractorInterface`.
+    max_workers: int, optional
+        The number of series written at the same time, by default all of them.
+    verbose: bool, default: False
+        Whether to print the series files as they are written.
+
+    Returns
+    -------
+    series_file_paths: dict
+        The path to the series file of each interface, by interface name.
+
+    Raises
+    ------
+    RuntimeError
+        If the writing of a series file failed, with the traceback of the worker.
+    """
+    nwbfile_path = Path(nwbfile_path)
+    final_nwbfile_path = get_final_nwbfile_path(nwbfile_path)
+
+    series_file_paths = dict()
+    for interface_name, pending_write in pending_writes.items():
+        series_name = pending_write["dataset_path"].rstrip("/").split("/")[-2]
+        series_file_path = final_nwbfile_path.with_name(f"{final_nwbfile_path.stem}_{series_name}.h5")
+        dataset_paths = [pending_write["dataset_path"]]
+        if pending_write.get("binned_series") is not None:
+            dataset_paths.append(pending_write["binned_series"]["dataset_path"])
+        _move_datasets_to_series_file(
+            nwbfile_path=nwbfile_path, dataset_paths=dataset_paths, series_file_path=series_file_path
+        )
+        series_file_paths[interface_name] = series_file_path
+
+    _write_series_in_processes(
+        nwbfile_path=nwbfile_path,
+        file_paths=series_file_paths,
+        pending_writes=pending_writes,
+        max_workers=max_workers,
+        backend="hdf5",
+        verbose=verbose,
+    )
+    return series_file_paths
+
+
+def write_imaging_series_in_parallel(
+    nwbfile_path: FilePathType,
+    pending_writes: Dict[str, dict],
+    max_workers: Optional[int] = None,
+    verbose: bool = False,
+) -> None:
+    """Write the deferred imaging data of a closed Zarr NWB file in place, in parallel processes.
+
+    Each process fills the Zarr array of one series, the arrays being stored in separate folders.
+
+    Parameters
+    ----------
+    nwbfile_path: str or Path
+        The path to the Zarr NWB file with the empty arrays of the deferred series.
+    pending_writes: dict
+        The "dataset_path", "imaging_extractor" and "pipeline_options" of the deferred write of each interface, by
+        interface name, see `BasePipelinedImagingExtractorInterface`.
+    max_workers: int, optional
+        The number of series written at the same time, by default all of them.
+    verbose: bool, default: False
+        Whether to print the series as they are written.
+
+    Raises
+    ------
+    RuntimeError
+        If the writing of a series failed, with the traceback of the worker.
+    """
+    _write_series_in_processes(
+        nwbfile_path=Path(nwbfile_path),
+        file_paths={interface_name: Path(nwbfile_path) for interface_name in pending_writes},
+        pending_writes=pending_writes,
+        max_workers=max_workers,
+        backend="zarr",
+        verbose=verbose,
+    )
+
+
+def get_external_links(file_path: FilePathType) -> Dict[str, h5py.ExternalLink]:
+    """Return the external links of an HDF5 file, by path in the file."""
+    external_links = dict()
+
+    def find_external_links(group: h5py.Group) -> None:
+        for name in group:
+            link = group.get(name, getlink=True)
+            path = f"{group.name.rstrip('/')}/{name}"
+            if isinstance(link, h5py.ExternalLink):
+                external_links[path] = link
+            elif isinstance(link, h5py.HardLink) and isinstance(group[name], h5py.Group):
+                find_external_links(group[name])
+
+    with h5py.File(file_path, "r") as file:
+        find_external_links(file)
+    return external_links
+
+
+def consolidate_nwbfile(
+    nwbfile_path: FilePathType,
+    output_nwbfile_path: Optional[FilePathType] = None,
+    remove_series_files: bool = False,
+) -> Path:
+    """Copy the data of the external links of an NWB file into it, to get a self-contained NWB file.
+
+    The datasets are copied with their chunks as they are stored, without decompressing them.
+
+    Parameters
+    ----------
+    nwbfile_path: str or Path
+        The path to the NWB file written with the multi-file layout.
+    output_nwbfile_path: str or Path, optional
+        The path to the consolidated NWB file, by default the NWB file is consolidated in place.
+    remove_series_files: bool, default: False
+        Whether to remove the linked files once their data is copied.
+
+    Returns
+    -------
+    output_nwbfile_path: Path
+        The path to the consolidated NWB file.
+    """
+    nwbfile_path = Path(nwbfile_path)
+    output_nwbfile_path = Path(output_nwbfile_path) if output_nwbfile_path is not None else nwbfile_path
+    external_links = get_external_links(nwbfile_path)
+    if output_nwbfile_path != nwbfile_path:
+        shutil.copyfile(nwbfile_path, output_nwbfile_path)
+
+    linked_file_paths = set()
+    with h5py.File(output_nwbfile_path, "r+") as file:
+        for path, link in external_links.items():
+            linked_file_path = Path(link.filename)
+            if not linked_file_path.is_absolute():
+                linked_file_path = nwbfile_path.parent / linked_file_path
+            parent_path, name = path.rsplit("/", 1)
+            del file[path]
+            with h5py.File(linked_file_path, "r") as linked_file:
+                linked_file.copy(linked_file[link.path], file[parent_path or "/"], name=name)
+            linked_file_paths.add(linked_file_path)
+
+    if remove_series_files:
+        for linked_file_path in linked_file_paths:
+            linked_file_path.unlink()
+    return output_nwbfile_path
@@ -0,0 +1,382 @@
+"""Pipelined writing of imaging data into an NWB file: reader threads, compressor workers and a single HDF5 writer.
+
+The photon series is first written by neuroconv with a deferred iterator, which creates the dataset with its final
+shape, chunking and filters but writes no data. Once the file is closed, the dataset is filled by a pipeline where
+reader threads load frames with `get_video`, compressor workers apply the dataset filters (shuffle and gzip) to each
+chunk and a single writer stores the pre-compressed chunks with `write_direct_chunk`. The stages are connected by
+bounded queues, so the disk and the cores are kept busy while the memory used stays bounded. The reader threads can
+also pass each block of frames to a SummaryImageAccumulator, so the summary images of the movie cost no extra read,
+and bin it with a BinnedSeriesWriter, whose binned blocks are written by the writer with the chunks.
+
+With `reader_mode="processes"`, the frames are read by worker processes instead of threads, which hand them to the
+compressor workers through a shared memory ring buffer (see `SharedMemoryFrameReader`), so that the decoding of the
+TIFF files is not limited by the GIL. The summary images and the binned blocks are then computed by the compressor
+workers, on the views of the blocks in the ring buffer.
+
+With the Zarr backend, each chunk is stored in its own object, so there is no single writer: the compressor workers
+write their chunks to the Zarr array themselves, and the codec of the array compresses them.
+
+Functions
+---------
+write_imaging_data_pipelined
+    Fill an empty chunked HDF5 dataset or Zarr array with the frames of an imaging extractor.
+open_nwbfile_dataset
+    Context manager opening a dataset of a closed NWB file for writing, with the HDF5 or the Zarr backend.
+open_nwbfile_datasets
+    Context manager opening several datasets of a closed NWB file for writing, with the HDF5 or the Zarr backend.
+
+Classes
+-------
+DeferredDataChunkIterator
+    A DataChunkIterator yielding no data, used to create a dataset that is filled after the NWB file is written.
+"""
+
+import os
+import queue
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, List, Literal, Optional, Tuple, Union
+
+import h5py
+import numpy as np
+from hdmf.data_utils import AbstractDataChunkIterator, DataChunk
+from neuroconv.utils import FilePathType
+from roiextractors import ImagingExtractor
+
+from .shared_memory_reader import SharedMemoryFrameReader
+
+if TYPE_CHECKING:
+    import zarr
+
+    from .binned_imaging_series import BinnedSeriesWriter
+    from .summary_images import SummaryImageAccumulator
+
+_END_OF_STREAM = None
+
+
+class DeferredDataChunkIterator(AbstractDataChunkIterator):
+    """A DataChunkIterator that creates the dataset with its final shape but doesn't yield any data chunk."""
+
+    def __init__(self, maxshape: Tuple[int, ...], dtype: np.dtype, chunk_shape: Optional[Tuple[int, ...]] = None):
+        self._maxshape = tuple(maxshape)
+        self._dtype = np.dtype(dtype)
+        self._chunk_shape = tuple(chunk_shape) if chunk_shape is not None else None
+
+    def __iter__(self) -> Iterator[DataChunk]:
+        return self
+
+    def __next__(self) -> DataChunk:
+        raise StopIteration
+
+    def recommended_chunk_shape(self) -> Optional[Tuple[int, ...]]:
+        return self._chunk_shape
+
+    def recommended_data_shape(self) -> Tuple[int, ...]:
+        return self._maxshape
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._dtype
+
+    @property
+    def maxshape(self) -> Tuple[int, ...]:
+        return self._maxshape
+
+
+@contextmanager
+def open_nwbfile_dataset(
+    nwbfile_path: FilePathType, dataset_path: str, backend: Literal["hdf5", "zarr"] = "hdf5"
+) -> Iterator[Union[h5py.Dataset, "zarr.Array"]]:
+    """Open a dataset of a closed NWB file for writing, with the HDF5 or the Zarr backend.
+
+    Parameters
+    ----------
+    nwbfile_path: str or Path
+        The path to the NWB file, an HDF5 file or a Zarr folder.
+    dataset_path: str
+        The path to the dataset in the NWB file, e.g. "/acquisition/OnePhotonSeries/data".
+    backend: {"hdf5", "zarr"}, default: "hdf5"
+        The backend of the NWB file.
+    """
+    with open_nwbfile_datasets(nwbfile_path=nwbfile_path, dataset_paths=[dataset_path], backend=backend) as datasets:
+        yield datasets[0]
+
+
+@contextmanager
+def open_nwbfile_datasets(
+    nwbfile_path: FilePathType, dataset_paths: List[str], backend: Literal["hdf5", "zarr"] = "hdf5"
+) -> Iterator[List[Union[h5py.Dataset, "zarr.Array"]]]:
+    """Open several datasets of a closed NWB file for writing, with the HDF5 or the Zarr backend.
+
+    The HDF5 file is opened once, so that the datasets can be written by the same pipeline.
+
+    Parameters
+    ----------
+    nwbfile_path: str or Path
+        The path to the NWB file, an HDF5 file or a Zarr folder.
+    dataset_paths: list of str
+        The paths to the datasets in the NWB file.
+    backend: {"hdf5", "zarr"}, default: "hdf5"
+        The backend of the NWB file.
+    """
+    if backend == "zarr":
+        import zarr
+
+        group = zarr.open_group(str(nwbfile_path), mode="r+")
+        yield [group[dataset_path] for dataset_path in dataset_paths]
+        return
+    with h5py.File(nwbfile_path, "r+") as file:
+        yield [file[dataset_path] for dataset_path in dataset_paths]
+
+
+def _get_chunk_compressor(dataset: h5py.Dataset):
+    """Return the function compressing a chunk as the dataset filters would, or None if a filter is not supported."""
+    if (
+        not isinstance(dataset, h5py.Dataset)
+        or dataset.fletcher32
+        or dataset.scaleoffset is not None
+        or dataset.compression not in (None, "gzip")
+    ):
+        return None
+    shuffle = dataset.shuffle
+    compression_level = dataset.compression_opts if dataset.compression == "gzip" else None
+    itemsize = dataset.dtype.itemsize
+
+    def compress_chunk(chunk: np.ndarray) -> bytes:
+        chunk_bytes = np.ascontiguousarray(chunk).view(np.uint8).reshape(-1)
+        if shuffle and itemsize > 1:
+            chunk_bytes = chunk_bytes.reshape(-1, itemsize).T
+        chunk_bytes = chunk_bytes.tobytes()
+        if compression_level is not None:
+            chunk_bytes = zlib.compress(chunk_bytes, compression_level)
+        return chunk_bytes
+
+    return compress_chunk
+
+
+def _iterate_chunk_selections(block_shape: Tuple[int, ...], chunk_shape: Tuple[int, ...]):
+    """Iterate over the spatial chunks of a block of frames, yielding the (start, stop) of each axis but time."""
+    grid = [range(0, size, chunk_size) for size, chunk_size in zip(block_shape[1:], chunk_shape[1:])]
+    for starts in np.ndindex(*[len(axis_grid) for axis_grid in grid]):
+        yield tuple(
+            (axis_grid[index], min(axis_grid[index] + chunk_size, size))
+            for axis_grid, index, chunk_size, size in zip(grid, starts, chunk_shape[1:], block_shape[1:])
+        )
+
+
+def write_imaging_data_pipelined(
+    dataset: Union[h5py.Dataset, "zarr.Array"],
+    imaging_extractor: ImagingExtractor,
+    num_reader_threads: int = 2,
+    num_compressor_workers: Optional[int] = None,
+    frames_per_read: Optional[int] = None,
+    queue_size: int = 8,
+    summary_image_accumulator: Optional["SummaryImageAccumulator"] = None,
+    binned_series_writer: Optional["BinnedSeriesWriter"] = None,
+    reader_mode: Literal["threads", "processes"] = "threads",
+    num_ring_slots: Optional[int] = None,
+) -> None:
+    """Fill a chunked (frames, width, height) dataset with the video of `imaging_extractor`.
+
+    The frames are written transposed as (frames, columns, rows), following the neuroconv convention for photon series.
+    When the dataset uses filters other than shuffle and gzip, the compressor workers pass the data through and the
+    writer lets HDF5 compress it. The chunks of a Zarr array are written by the compressor workers, in parallel.
+
+    Parameters
+    ----------
+    dataset: h5py.Dataset or zarr.Array
+        The chunked dataset to fill, opened in a writable file.
+    imaging_extractor: ImagingExtractor
+        The imaging extractor to read the frames from, `get_video` must be safe to call from several threads (or
+        processes, with `reader_mode="processes"`).
+    num_reader_threads: int, default: 2
+        The number of threads reading blocks of frames, or of processes with `reader_mode="processes"`.
+    num_compressor_workers: int, optional
+        The number of threads compressing chunks, defaults to the number of CPUs.
+    frames_per_read: int, optional
+        The number of frames read at once, rounded to a multiple of the chunk length along time (and of the frames
+        averaged together by `binned_series_writer`). Defaults to the chunk length along time.
+    queue_size: int, default: 8
+        The maximum number of blocks waiting in each queue between the stages.
+    summary_image_accumulator: SummaryImageAccumulator, optional
+        The accumulator of the summary images of the movie, to which the reader threads add each block of frames as
+        stored.
+    binned_series_writer: BinnedSeriesWriter, optional
+        The binning of the blocks of frames for the dataset of the binned copy of the movie, written by the writer
+        with the chunks.
+    reader_mode: {"threads", "processes"}, default: "threads"
+        Whether the blocks of frames are read by threads, or by processes writing them in a shared memory ring buffer.
+    num_ring_slots: int, optional
+        The number of blocks of frames in the ring buffer with `reader_mode="processes"`, defaults to twice the number
+        of reader processes. The reader processes wait for a free slot when the buffer is full.
+    """
+    num_frames = dataset.shape[0]
+    chunk_shape = dataset.chunks
+    assert chunk_shape is not None, f"The dataset '{dataset.name}' must be chunked to be written with a pipeline."
+    num_compressor_workers = num_compressor_workers or os.cpu_count()
+    if reader_mode not in ("threads", "processes"):
+        raise ValueError(f"The reader mode must be 'threads' or 'processes', not '{reader_mode}'.")
+    block_length = chunk_shape[0]
+    if binned_series_writer is not None:
+        # the frames averaged together are read in the same block
+        block_length = int(np.lcm(block_length, binned_series_writer.temporal_decimation))
+    frames_per_read = max(1, (frames_per_read or block_length) // block_length) * block_length
+    compress_chunk = _get_chunk_compressor(dataset)
+    # the chunks of a Zarr array are independent objects, written by the compressor workers
+    write_in_compressors = not isinstance(dataset, h5py.Dataset)
+
+    block_starts = iter(range(0, num_frames, frames_per_read))
+    block_starts_lock = threading.Lock()
+    blocks_queue = queue.Queue(maxsize=queue_size)
+    chunks_queue = queue.Queue(maxsize=queue_size * num_compressor_workers)
+    stop_event = threading.Event()
+    errors = []
+
+    def put(target_queue: queue.Queue, item) -> bool:
+        while not stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(source_queue: queue.Queue):
+        while not stop_event.is_set():
+            try:
+                return source_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END_OF_STREAM
+
+    def summarize_block(start_frame: int, video: np.ndarray) -> bool:
+        """Add a block to the summary images and queue its binned block, return False if the pipeline stopped."""
+        if summary_image_accumulator is not None:
+            summary_image_accumulator.add_frames(video)
+        if binned_series_writer is not None:
+            offset, binned_video = binned_series_writer.bin_block(start_frame=start_frame, frames=video)
+            return put(chunks_queue, (binned_series_writer.dataset, offset, binned_video, False))
+        return True
+
+    def read_blocks() -> None:
+        try:
+            while not stop_event.is_set():
+                with block_starts_lock:
+                    start_frame = next(block_starts, None)
+                if start_frame is None:
+                    break
+                end_frame = min(start_frame + frames_per_read, num_frames)
+                video = imaging_extractor.get_video(start_frame=start_frame, end_frame=end_frame)
+                video = np.asarray(video).transpose((0, 2, 1) if video.ndim == 3 else (0, 2, 1, 3))
+                video = video.astype(dataset.dtype, copy=False)
+                if not summarize_block(start_frame=start_frame, video=video):
+                    break
+                if not put(blocks_queue, (start_frame, video, None)):
+                    break
+        except Exception as exception:
+            errors.append(exception)
+            stop_event.set()
+
+    def dispatch_blocks() -> None:
+        # the blocks read by the reader processes, in the order they are read
+        try:
+            block_ranges = [(start, min(start + frames_per_read, num_frames)) for start in block_starts]
+            for slot, start_frame, video in frame_reader.iterate_blocks(block_ranges, stop_event=stop_event):
+                if not put(blocks_queue, (start_frame, video, slot)):
+                    frame_reader.release(slot)
+                    break
+        except Exception as exception:
+            errors.append(exception)
+            stop_event.set()
+
+    def compress_blocks() -> None:
+        try:
+            while True:
+                block = get(blocks_queue)
+                if block is _END_OF_STREAM:
+                    break
+                start_frame, video, slot = block
+                # the blocks of the reader processes are summarized here, in parallel, before their slot is released
+                if slot is not None and not summarize_block(start_frame=start_frame, video=video):
+                    return
+                for block_start in range(0, video.shape[0], chunk_shape[0]):
+                    frames = video[block_start : block_start + chunk_shape[0]]
+                    for spatial_selection in _iterate_chunk_selections(frames.shape, chunk_shape):
+                        chunk_slices = tuple(slice(start, stop) for start, stop in spatial_selection)
+                        chunk = frames[(slice(None),) + chunk_slices]
+                        offset = (start_frame + block_start,) + tuple(start for start, _ in spatial_selection)
+                        if write_in_compressors:
+                            selection = tuple(slice(start, start + size) for start, size in zip(offset, chunk.shape))
+                            dataset[selection] = chunk
+                            continue
+                        if compress_chunk is None:
+                            # the slot of the block is reused before the writer writes the chunk
+                            item = (dataset, offset, chunk if slot is None else chunk.copy(), False)
+                        else:
+                            # the chunks on the edges of the dataset are stored padded to the full chunk shape
+                            if chunk.shape != chunk_shape:
+                                padded_chunk = np.zeros(chunk_shape, dtype=dataset.dtype)
+                                padded_chunk[tuple(slice(0, size) for size in chunk.shape)] = chunk
+                                chunk = padded_chunk
+                            item = (dataset, offset, compress_chunk(chunk), True)
+                        if not put(chunks_queue, item):
+                            return
+                if slot is not None:
+                    frame_reader.release(slot)
+        except Exception as exception:
+            errors.append(exception)
+            stop_event.set()
+
+    frame_reader = None
+    if reader_mode == "processes":
+        # the reader processes are started before the threads of the pipeline
+        frame_reader = SharedMemoryFrameReader(
+            imaging_extractor=imaging_extractor,
+            frame_shape=dataset.shape[1:],
+            dtype=dataset.dtype,
+            frames_per_read=frames_per_read,
+            num_processes=num_reader_threads,
+            num_slots=num_ring_slots,
+        )
+        readers = [threading.Thread(target=dispatch_blocks, daemon=True)]
+    else:
+        readers = [threading.Thread(target=read_blocks, daemon=True) for _ in range(num_reader_threads)]
+    compressors = [threading.Thread(target=compress_blocks, daemon=True) for _ in range(num_compressor_workers)]
+    for thread in readers + compressors:
+        thread.start()
+
+    def close_stages() -> None:
+        for thread in readers:
+            thread.join()
+        for _ in compressors:
+            put(blocks_queue, _END_OF_STREAM)
+        for thread in compressors:
+            thread.join()
+        put(chunks_queue, _END_OF_STREAM)
+
+    closer = threading.Thread(target=close_stages, daemon=True)
+    closer.start()
+
+    # the single writer: all the HDF5 calls are made from this thread, it only writes the binned blocks with Zarr
+    try:
+        while True:
+            item = get(chunks_queue)
+            if item is _END_OF_STREAM:
+                break
+            target_dataset, offset, chunk, is_compressed = item
+            if is_compressed:
+                target_dataset.id.write_direct_chunk(offset, chunk)
+            else:
+                selection = tuple(slice(start, start + size) for start, size in zip(offset, chunk.shape))
+                target_dataset[selection] = chunk
+    except BaseException:
+        stop_event.set()
+        raise
+    finally:
+        closer.join()
+        if frame_reader is not None:
+            frame_reader.close()
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,213 @@
+"""Reading of the frames of an imaging extractor in worker processes, through a shared memory ring buffer.
+
+The TIFF decoding of the mesoscopic extractors holds the GIL for a large part of each read, so the reader threads of
+the pipelined write (see `write_imaging_data_pipelined`) can't keep the compressors busy on many cores. With
+`reader_mode="processes"`, the blocks of frames are read by worker processes instead, which write them in the slots
+of a `multiprocessing.shared_memory` block. The pipeline gets each block as a NumPy view of its slot, without a copy
+nor a pickling of the frames, and releases the slot once the block is compressed. The blocks are only handed to the
+workers when a slot is free, so the readers wait for the compressors and writer when the ring buffer is full.
+
+The worker processes are started with the default start method of the platform: the imaging extractor is pickled for
+them where they are spawned (e.g. on macOS and Windows). They only read the sources: the NWB file is never accessed
+from a worker.
+
+Classes
+-------
+SharedMemoryFrameReader
+    Worker processes reading blocks of frames into the slots of a shared memory ring buffer.
+"""
+
+import multiprocessing
+import queue
+import threading
+import traceback
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from roiextractors import ImagingExtractor
+
+_END_OF_STREAM = None
+
+
+def _read_blocks_in_worker(
+    imaging_extractor: ImagingExtractor,
+    shared_memory_name: str,
+    slots_shape: Tuple[int, ...],
+    dtype: np.dtype,
+    task_queue: multiprocessing.Queue,
+    done_queue: multiprocessing.Queue,
+) -> None:
+    """Read the blocks of frames of the tasks into their slot, as stored, until the end of the stream."""
+    shared_memory = SharedMemory(name=shared_memory_name)
+    slots = np.ndarray(slots_shape, dtype=dtype, buffer=shared_memory.buf)
+    try:
+        while True:
+            task = task_queue.get()
+            if task is _END_OF_STREAM:
+                break
+            slot, start_frame, end_frame = task
+            error = None
+            try:
+                video = np.asarray(imaging_extractor.get_video(start_frame=start_frame, end_frame=end_frame))
+                slots[slot, : end_frame - start_frame] = video.transpose((0, 2, 1) if video.ndim == 3 else (0, 2, 1, 3))
+            except Exception:
+                error = traceback.format_exc()
+            done_queue.put((slot, start_frame, end_frame - start_frame, error))
+    finally:
+        del slots
+        shared_memory.close()
+
+
+class SharedMemoryFrameReader:
+    """Worker processes reading blocks of frames into the slots of a shared memory ring buffer.
+
+    The frames are stored transposed as (frames, columns, rows), following the neuroconv convention for photon series,
+    and cast to the dtype of the ring buffer.
+    """
+
+    def __init__(
+        self,
+        imaging_extractor: ImagingExtractor,
+        frame_shape: Tuple[int, ...],
+        dtype: np.dtype,
+        frames_per_read: int,
+        num_processes: int = 2,
+        num_slots: Optional[int] = None,
+    ):
+        """Start the worker processes and the ring buffer of their blocks of frames.
+
+        Parameters
+        ----------
+        imaging_extractor: ImagingExtractor
+            The imaging extractor to read the frames from.
+        frame_shape: tuple of int
+            The shape of the frames, as stored: (columns, rows) or (columns, rows, planes).
+        dtype: np.dtype
+            The dtype of the frames, as stored.
+        frames_per_read: int
+            The maximum number of frames of a block, read at once by a worker.
+        num_processes: int, default: 2
+            The number of worker processes.
+        num_slots: int, optional
+            The number of blocks in the ring buffer, defaults to twice the number of worker processes.
+        """
+        self.num_slots = num_slots or 2 * num_processes
+        if self.num_slots < 1 or num_processes < 1:
+            raise ValueError("The number of worker processes and of slots of the ring buffer must be positive.")
+        self.frames_per_read = frames_per_read
+        slots_shape = (self.num_slots, frames_per_read) + tuple(frame_shape)
+        dtype = np.dtype(dtype)
+        self._shared_memory = SharedMemory(create=True, size=max(1, int(np.prod(slots_shape)) * dtype.itemsize))
+        self._slots = np.ndarray(slots_shape, dtype=dtype, buffer=self._shared_memory.buf)
+        self._free_slots = queue.Queue()
+        for slot in range(self.num_slots):
+            self._free_slots.put(slot)
+
+        # forking is unsafe on some platforms (e.g. macOS) and with the threads of the process, their default is kept
+        context = multiprocessing.get_context()
+        self._task_queue = context.Queue()
+        self._done_queue = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_read_blocks_in_worker,
+                args=(
+                    imaging_extractor,
+                    self._shared_memory.name,
+                    slots_shape,
+                    dtype,
+                    self._task_queue,
+                    self._done_queue,
+                ),
+                name=f"frame-reader-{index}",
+                daemon=True,
+            )
+            for index in range(num_processes)
+        ]
+        for process in self._processes:
+            process.start()
+
+    def __enter__(self) -> "SharedMemoryFrameReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def iterate_blocks(
+        self, block_ranges: List[Tuple[int, int]], stop_event: Optional[threading.Event] = None
+    ) -> Iterator[Tuple[int, int, np.ndarray]]:
+        """Read blocks of frames in the worker processes, yielding them in the order they are read.
+
+        The view of a block is only valid until its slot is released with `release`, which must be called once the
+        block is used, as the blocks are only read when a slot is free.
+
+        Parameters
+        ----------
+        block_ranges: list of (int, int)
+            The (start_frame, end_frame) of each block, of at most `frames_per_read` frames.
+        stop_event: threading.Event, optional
+            An event stopping the reading of the blocks when set.
+
+        Yields
+        ------
+        slot: int
+            The slot of the ring buffer holding the block.
+        start_frame: int
+            The index of the first frame of the block.
+        video: np.ndarray
+            The (frames, columns, rows) view of the block in its slot.
+        """
+        block_ranges = list(block_ranges)
+        num_blocks_in_flight = 0
+        while block_ranges or num_blocks_in_flight:
+            if stop_event is not None and stop_event.is_set():
+                return
+            # hand a block to the workers for each free slot, wait for a slot released when none is being read
+            while block_ranges:
+                try:
+                    slot = self._free_slots.get(block=num_blocks_in_flight == 0, timeout=0.1)
+                except queue.Empty:
+                    break
+                start_frame, end_frame = block_ranges.pop(0)
+                if end_frame - start_frame > self.frames_per_read:
+                    raise ValueError(f"The block of frames {start_frame} to {end_frame} doesn't fit in a slot.")
+                self._task_queue.put((slot, start_frame, end_frame))
+                num_blocks_in_flight += 1
+            if num_blocks_in_flight == 0:
+                continue
+
+            try:
+                slot, start_frame, num_frames, error = self._done_queue.get(timeout=0.1)
+            except queue.Empty:
+                # workers killed before reporting (e.g. by the out-of-memory killer) would never read their block
+                for process in self._processes:
+                    if not process.is_alive():
+                        raise RuntimeError(f"The frame reader process exited with code {process.exitcode}.")
+                continue
+            num_blocks_in_flight -= 1
+            if error is not None:
+                raise RuntimeError(f"The frames from {start_frame} could not be read:\n{error}")
+            yield slot, start_frame, self._slots[slot, :num_frames]
+
+    def release(self, slot: int) -> None:
+        """Release the slot of a block, to be reused by the next blocks read."""
+        self._free_slots.put(slot)
+
+    def close(self) -> None:
+        """Stop the worker processes and free the ring buffer."""
+        for process in self._processes:
+            if process.is_alive():
+                self._task_queue.put(_END_OF_STREAM)
+        for process in self._processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes = []
+        self._slots = None
+        try:
+            self._shared_memory.close()
+        except BufferError:
+            # a view of a block is still referenced, the memory is freed with it
+            pass
+        self._shared_memory.unlink()
@@ -0,0 +1,233 @@
+"""Summary images of the imaging series, accumulated from the frames read to write the series.
+
+The mean, maximum and standard deviation projections and the correlation image of a movie would take a second full
+read of the movie after the conversion. Instead, the pipelined write (see `write_imaging_data_pipelined`) passes each
+block of frames it reads to a SummaryImageAccumulator, which merges the moments of the block into running moments
+(Welford's algorithm, in the pairwise form of Chan et al. to merge whole blocks, in any order). The correlation image
+is the mean correlation of the trace of each pixel with the traces of its 8 neighbours, from the running
+co-moments of the neighbouring pixels.
+
+The summary images are added to the "SummaryImages" Images of the ophys processing module with deferred data, as the
+photon series, and written once the series is written. They are of the values of the series, the stored data scaled by
+its NWB `conversion` and `offset` (e.g. the dF/F values of a series stored as int16 codes, not the codes). They are
+named after the photon series with the name of the statistic as suffix (e.g. "OnePhotonSeriesMean") and are in the
+orientation of the photon series frames.
+
+Functions
+---------
+add_deferred_summary_images
+    Add the summary images of a photon series to an NWB file, with data written after the file is closed.
+write_summary_images
+    Write the summary images of a photon series into a closed NWB file.
+
+Classes
+-------
+SummaryImageAccumulator
+    Running mean, maximum, standard deviation and neighbour correlations of the pixels of a movie.
+"""
+
+import threading
+from typing import Dict, Literal, Tuple
+
+import numpy as np
+from neuroconv.tools.nwb_helpers import get_module
+from neuroconv.utils import FilePathType
+from pynwb import NWBFile
+from pynwb.base import Images
+from pynwb.image import GrayscaleImage
+
+from .pipelined_imaging_write import DeferredDataChunkIterator, open_nwbfile_dataset
+
+SUMMARY_IMAGES_NAME = "SummaryImages"
+# the summary images of a photon series, with the description of their pixels
+SUMMARY_IMAGE_DESCRIPTIONS = dict(
+    Mean="The mean of each pixel over the frames of '{photon_series_name}'.",
+    Max="The maximum of each pixel over the frames of '{photon_series_name}'.",
+    Std="The standard deviation of each pixel over the frames of '{photon_series_name}'.",
+    Correlation=(
+        "The mean correlation of the trace of each pixel with the traces of its 8 neighbouring pixels over the frames "
+        "of '{photon_series_name}'."
+    ),
+)
+# the (row, column) slices of the first and second pixels of the 4 pairs of neighbouring pixels counted once
+_NEIGHBOUR_PAIR_SLICES = (
+    ((slice(None, -1), slice(None)), (slice(1, None), slice(None))),
+    ((slice(None), slice(None, -1)), (slice(None), slice(1, None))),
+    ((slice(None, -1), slice(None, -1)), (slice(1, None), slice(1, None))),
+    ((slice(1, None), slice(None, -1)), (slice(None, -1), slice(1, None))),
+)
+
+
+def _get_max_projection_dtype(dtype: np.dtype, conversion: float, offset: float) -> np.dtype:
+    """Return the dtype of the maximum projection, the dtype of the series unless its values are scaled."""
+    return np.dtype(dtype) if conversion == 1.0 and offset == 0.0 else np.dtype("float32")
+
+
+class SummaryImageAccumulator:
+    """Running mean, maximum, standard deviation and neighbour correlations of the pixels of a movie.
+
+    The blocks of frames can be added from several threads and in any order: the moments of each block are computed
+    outside of the lock, and only merged with the running moments under it.
+    """
+
+    def __init__(self, frame_shape: Tuple[int, int], dtype: np.dtype, conversion: float = 1.0, offset: float = 0.0):
+        """Start the accumulation of the summary images of a movie.
+
+        Parameters
+        ----------
+        frame_shape: tuple of int
+            The shape of the frames, as they are added.
+        dtype: np.dtype
+            The dtype of the frames, and of the maximum projection when the frames are not scaled.
+        conversion: float, default: 1.0
+            The NWB conversion of the series. The summary images are of the values `frames * conversion + offset`:
+            the moments of the stored frames are scaled when the images are computed, which is exact as the
+            statistics are linear in the values (the correlations don't change).
+        offset: float, default: 0.0
+            The NWB offset of the series.
+        """
+        if conversion <= 0:
+            raise ValueError(f"The conversion of the series must be positive, got {conversion}.")
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.conversion = float(conversion)
+        self.offset = float(offset)
+        self.num_frames = 0
+        self._mean = np.zeros(self.frame_shape, dtype="float64")
+        self._sum_of_squares = np.zeros(self.frame_shape, dtype="float64")
+        self._max = None
+        self._co_moments = [
+            np.zeros(np.empty(self.frame_shape)[first_slices].shape, dtype="float64")
+            for first_slices, _ in _NEIGHBOUR_PAIR_SLICES
+        ]
+        self._lock = threading.Lock()
+
+    def add_frames(self, frames: np.ndarray) -> None:
+        """Add a block of (frames, rows, columns) frames to the running moments."""
+        num_frames = frames.shape[0]
+        if num_frames == 0:
+            return
+        block_max = frames.max(axis=0)
+        block_mean = frames.mean(axis=0, dtype="float64")
+        deviations = frames - block_mean
+        block_sum_of_squares = np.einsum("ijk,ijk->jk", deviations, deviations)
+        block_co_moments = [
+            np.einsum("ijk,ijk->jk", deviations[(slice(None),) + first], deviations[(slice(None),) + second])
+            for first, second in _NEIGHBOUR_PAIR_SLICES
+        ]
+
+        with self._lock:
+            total_num_frames = self.num_frames + num_frames
+            delta = block_mean - self._mean
+            weight = self.num_frames * num_frames / total_num_frames
+            for co_moments, block_co_moment, (first, second) in zip(
+                self._co_moments, block_co_moments, _NEIGHBOUR_PAIR_SLICES
+            ):
+                co_moments += block_co_moment + delta[first] * delta[second] * weight
+            self._sum_of_squares += block_sum_of_squares + delta**2 * weight
+            self._mean += delta * num_frames / total_num_frames
+            self._max = block_max if self._max is None else np.maximum(self._max, block_max)
+            self.num_frames = total_num_frames
+
+    def get_summary_images(self) -> Dict[str, np.ndarray]:
+        """Return the summary images of the frames added, by statistic: "Mean", "Max", "Std" and "Correlation"."""
+        with self._lock:
+            if self.num_frames == 0:
+                raise ValueError("No frames were added to the summary images.")
+            correlation_sums = np.zeros(self.frame_shape, dtype="float64")
+            neighbour_counts = np.zeros(self.frame_shape, dtype="float64")
+            for co_moments, (first, second) in zip(self._co_moments, _NEIGHBOUR_PAIR_SLICES):
+                denominator = np.sqrt(self._sum_of_squares[first] * self._sum_of_squares[second])
+                # the pixels with a constant trace have no correlation with their neighbours
+                correlations = np.divide(co_moments, denominator, out=np.zeros_like(co_moments), where=denominator > 0)
+                for pixel_slices in (first, second):
+                    correlation_sums[pixel_slices] += correlations
+                    neighbour_counts[pixel_slices] += 1
+            max_dtype = _get_max_projection_dtype(dtype=self.dtype, conversion=self.conversion, offset=self.offset)
+            if max_dtype == self.dtype:
+                max_projection = self._max.astype(self.dtype)
+            else:
+                max_projection = (self._max * self.conversion + self.offset).astype(max_dtype)
+            return dict(
+                Mean=(self._mean * self.conversion + self.offset).astype("float32"),
+                Max=max_projection,
+                Std=(np.sqrt(self._sum_of_squares / self.num_frames) * self.conversion).astype("float32"),
+                Correlation=(correlation_sums / np.maximum(neighbour_counts, 1)).astype("float32"),
+            )
+
+
+def add_deferred_summary_images(
+    nwbfile: NWBFile,
+    photon_series_name: str,
+    frame_shape: Tuple[int, int],
+    dtype: np.dtype,
+    conversion: float = 1.0,
+    offset: float = 0.0,
+) -> Dict[str, str]:
+    """Add the summary images of a photon series to an NWB file, with data written after the file is closed.
+
+    Parameters
+    ----------
+    nwbfile: NWBFile
+        The in-memory NWB file.
+    photon_series_name: str
+        The name of the photon series.
+    frame_shape: tuple of int
+        The shape of the frames of the photon series, as stored.
+    dtype: np.dtype
+        The dtype of the photon series, the dtype of the maximum projection when the series is not scaled.
+    conversion: float, default: 1.0
+        The NWB conversion of the photon series, the maximum projection of a scaled series is stored as float32.
+    offset: float, default: 0.0
+        The NWB offset of the photon series.
+
+    Returns
+    -------
+    dataset_paths: dict
+        The path to the dataset of each summary image in the NWB file, by statistic.
+    """
+    ophys = get_module(nwbfile, name="ophys")
+    if SUMMARY_IMAGES_NAME not in ophys.data_interfaces:
+        ophys.add(Images(name=SUMMARY_IMAGES_NAME, description="The summary images of the imaging series."))
+    summary_images = ophys.data_interfaces[SUMMARY_IMAGES_NAME]
+
+    dataset_paths = dict()
+    for statistic, description in SUMMARY_IMAGE_DESCRIPTIONS.items():
+        image_dtype = (
+            _get_max_projection_dtype(dtype=dtype, conversion=conversion, offset=offset)
+            if statistic == "Max"
+            else "float32"
+        )
+        image = GrayscaleImage(
+            name=f"{photon_series_name}{statistic}",
+            # the images are small: without a DataIO, the backend picks their storage
+            data=DeferredDataChunkIterator(maxshape=frame_shape, dtype=image_dtype),
+            description=description.format(photon_series_name=photon_series_name),
+        )
+        summary_images.add_image(image)
+        dataset_paths[statistic] = f"/processing/ophys/{SUMMARY_IMAGES_NAME}/{image.name}"
+    return dataset_paths
+
+
+def write_summary_images(
+    nwbfile_path: FilePathType,
+    dataset_paths: Dict[str, str],
+    summary_images: Dict[str, np.ndarray],
+    backend: Literal["hdf5", "zarr"] = "hdf5",
+) -> None:
+    """Write the summary images of a photon series into a closed NWB file.
+
+    Parameters
+    ----------
+    nwbfile_path: str or Path
+        The path to the NWB file, an HDF5 file or a Zarr folder.
+    dataset_paths: dict
+        The path to the dataset of each summary image, by statistic, see `add_deferred_summary_images`.
+    summary_images: dict
+        The summary images, by statistic, see `SummaryImageAccumulator.get_summary_images`.
+    backend: {"hdf5", "zarr"}, default: "hdf5"
+        The backend of the NWB file.
+    """
+    for statistic, dataset_path in dataset_paths.items():
+        with open_nwbfile_dataset(nwbfile_path=nwbfile_path, dataset_path=dataset_path, backend=backend) as dataset:
+            dataset[...] = summary_images[statistic]
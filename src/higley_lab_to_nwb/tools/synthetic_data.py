@@ -0,0 +1,639 @@
+"""Synthetic stand-ins for the source files read by the extractors and interfaces of the package.
+
+The generated files follow the layout of the lab's data (file names, MATLAB variables, dimensions and dtypes) and
+their size is set by the number of frames, the frame dimension and the number of ROIs, so that they can be used to
+measure the performance of the conversion without access to the private data.
+The images are a smooth background modulated in time plus noise, so that they compress like real widefield data
+rather than like white noise.
+
+Functions
+---------
+write_mat_file
+    Write variables to a MATLAB v5 or v7.3 (HDF5) file, with structs, struct arrays and cells.
+write_round_robin_tiff_stacks
+    Write multi-page TIFF stacks with the channels interleaved frame by frame (Benisty 2024 widefield imaging).
+write_single_frame_tiff_folder
+    Write a folder of single-frame TIFF files with the channels interleaved file by file (Lohani 2022 imaging).
+write_processed_imaging_mat
+    Write a dF/F pixel matrix MAT file, with a brain mask, in the 1p-only or the dual imaging layout.
+write_parcellation_mat
+    Write a LSSC parcellation MAT file (parcels_gal and parcels_time_trace).
+write_cidan_output
+    Write the CIDAN parameters and ROI list JSON files and the dF/F traces MAT file.
+write_facemap_proc_mat
+    Write a Facemap (MATLAB implementation) _proc.mat file with pupil, ROIs, motion masks and motion SVDs.
+generate_ttl_trace
+    Generate a Spike2-like analog TTL trace with regular pulses.
+write_smrx_signals_mat
+    Write the smrx_signals.mat file with the wheel speed and the event times extracted from the Spike2 signals.
+"""
+
+import itertools
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Literal, Optional, Sequence, Tuple
+
+import h5py
+import numpy as np
+import scipy.io
+import tifffile
+from neuroconv.utils import FilePathType, FolderPathType
+
+_MAT_V73_HEADER = b"MATLAB 7.3 MAT-file, Platform: GLNXA64, Created on: %s HDF5 schema 1.00 ."
+
+
+def _to_mat_v5_value(value):
+    """Convert a value to what scipy.io.savemat writes as the equivalent MATLAB value."""
+    if isinstance(value, dict):
+        return {name: _to_mat_v5_value(field_value) for name, field_value in value.items()}
+    if isinstance(value, list) and len(value) and all(isinstance(element, dict) for element in value):
+        field_names = list(value[0])
+        struct_array = np.empty((1, len(value)), dtype=[(name, object) for name in field_names])
+        for index, element in enumerate(value):
+            for name in field_names:
+                struct_array[0, index][name] = _to_mat_v5_value(element[name])
+        return struct_array
+    if isinstance(value, list):
+        cell_array = np.empty((1, len(value)), dtype=object)
+        for index, element in enumerate(value):
+            cell_array[0, index] = _to_mat_v5_value(element)
+        return cell_array
+    if isinstance(value, str):
+        return value
+    value = np.asarray(value)
+    # the arrays are given with the h5py convention, MATLAB dimensions are in the reverse order
+    return value.T if value.ndim > 1 else value
+
+
+def _write_mat_v73_value(file: h5py.File, group: h5py.Group, name: str, value, reference_ids: Iterator[int]) -> None:
+    """Write a value in a MATLAB v7.3 file, cells and struct arrays referencing datasets in the '#refs#' group."""
+    references_group = file.require_group("#refs#")
+
+    def write_reference(element) -> h5py.Reference:
+        # the name is reserved before writing the element, whose own cells are written first
+        reference_name = str(next(reference_ids))
+        _write_mat_v73_value(
+            file=file, group=references_group, name=reference_name, value=element, reference_ids=reference_ids
+        )
+        return references_group[reference_name].ref
+
+    if isinstance(value, dict):
+        struct_group = group.create_group(name)
+        struct_group.attrs["MATLAB_class"] = np.bytes_("struct")
+        for field_name, field_value in value.items():
+            _write_mat_v73_value(
+                file=file, group=struct_group, name=field_name, value=field_value, reference_ids=reference_ids
+            )
+    elif isinstance(value, list) and len(value) and all(isinstance(element, dict) for element in value):
+        struct_group = group.create_group(name)
+        struct_group.attrs["MATLAB_class"] = np.bytes_("struct")
+        for field_name in value[0]:
+            references = [[write_reference(element[field_name])] for element in value]
+            struct_group.create_dataset(field_name, data=references, dtype=h5py.ref_dtype)
+    elif isinstance(value, list):
+        references = [[write_reference(element)] for element in value]
+        dataset = group.create_dataset(name, data=references, dtype=h5py.ref_dtype)
+        dataset.attrs["MATLAB_class"] = np.bytes_("cell")
+    elif isinstance(value, str):
+        dataset = group.create_dataset(name, data=np.frombuffer(value.encode("utf-16-le"), dtype="<u2")[:, None])
+        dataset.attrs["MATLAB_class"] = np.bytes_("char")
+    else:
+        value = np.asarray(value)
+        # MATLAB stores scalars and vectors as 2D matrices, a (1 x n) row vector has the (n, 1) h5py shape
+        if value.ndim < 2:
+            value = value.reshape(-1, 1)
+        dataset = group.create_dataset(name, data=value)
+        dataset.attrs["MATLAB_class"] = np.bytes_("double" if value.dtype == np.float64 else value.dtype.name)
+
+
+def write_mat_file(
+    file_path: FilePathType,
+    variables: Dict[str, object],
+    mat_version: Literal["5", "7.3"] = "7.3",
+    do_compression: bool = False,
+) -> Path:
+    """Write variables to a MATLAB file.
+
+    Dicts are written as structs, lists of dicts as 1 x n struct arrays, other lists as 1 x n cells and arrays as
+    numeric matrices. Arrays are given with the h5py convention, i.e. a MATLAB (rois x frames) matrix is given as a
+    (frames, rois) array, and vectors are written as MATLAB row vectors.
+
+    Parameters
+    ----------
+    file_path: str or Path
+        The path to the .mat file to write.
+    variables: dict
+        The variables by name.
+    mat_version: "5" or "7.3", default: "7.3"
+        The version of the MAT file, v7.3 files are HDF5 files.
+    do_compression: bool, default: False
+        Whether to compress the variables of a v5 file (v7.3 datasets are written uncompressed, as MATLAB does for
+        small variables).
+
+    Returns
+    -------
+    file_path: Path
+        The path to the written file.
+    """
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    if mat_version == "5":
+        scipy.io.savemat(
+            file_path,
+            {name: _to_mat_v5_value(value) for name, value in variables.items()},
+            do_compression=do_compression,
+            oned_as="row",
+        )
+        return file_path
+
+    reference_ids = itertools.count()
+    with h5py.File(file_path, "w", userblock_size=512) as file:
+        for name, value in variables.items():
+            _write_mat_v73_value(file=file, group=file, name=name, value=value, reference_ids=reference_ids)
+    # the MATLAB header is written in the user block, before the HDF5 superblock
+    header = _MAT_V73_HEADER % datetime.now().strftime("%a %b %d %H:%M:%S %Y").encode()
+    with open(file_path, "r+b") as file:
+        file.write(header.ljust(116, b" ") + b"\x00" * 8 + b"\x00\x02IM")
+    return file_path
+
+
+def _generate_video(
+    num_frames: int,
+    num_rows: int,
+    num_columns: int,
+    dtype: str = "uint16",
+    seed: int = 0,
+) -> np.ndarray:
+    """Generate a (frames, rows, columns) video: smooth background with slow temporal modulation and noise."""
+    rng = np.random.default_rng(seed)
+    rows = np.linspace(-1, 1, num_rows)[:, None]
+    columns = np.linspace(-1, 1, num_columns)[None, :]
+    background = np.exp(-(rows**2 + columns**2) * 1.5)
+    modulation = 1 + 0.1 * np.sin(np.arange(num_frames) * 2 * np.pi / 50)
+    video = modulation[:, None, None] * background[None] + rng.normal(scale=0.02, size=(num_frames, 1, 1))
+    video = video + rng.normal(scale=0.01, size=(num_frames, num_rows, num_columns))
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        return np.clip(video * 2000 + 500, 0, np.iinfo(dtype).max).astype(dtype)
+    return video.astype(dtype)
+
+
+def _generate_brain_mask(num_rows: int, num_columns: int) -> np.ndarray:
+    """Return a (rows, columns) boolean mask of an ellipse covering most of the frame."""
+    rows = np.linspace(-1, 1, num_rows)[:, None]
+    columns = np.linspace(-1, 1, num_columns)[None, :]
+    return (rows / 0.9) ** 2 + (columns / 0.95) ** 2 <= 1
+
+
+def write_round_robin_tiff_stacks(
+    folder_path: FolderPathType,
+    num_files: int = 2,
+    frames_per_file: int = 200,
+    num_rows: int = 256,
+    num_columns: int = 256,
+    number_of_channels: int = 2,
+    file_prefix: str = "widefield",
+    seed: int = 0,
+) -> List[Path]:
+    """Write multi-page TIFF stacks where the channels alternate frame by frame.
+
+    This is the layout read by MesoscopicImagingMultiTiffStackExtractor, e.g. blue and violet excitation frames
+    alternating in the Benisty 2024 widefield imaging.
+
+    Parameters
+    ----------
+    folder_path: str or Path
+        The folder where the stacks are written, as "{file_prefix}_{index}.tif".
+    num_files: int, default: 2
+        The number of TIFF stacks.
+    frames_per_file: int, default: 200
+        The number of frames in each stack, all channels included.
+    num_rows, num_columns: int, default: 256
+        The frame dimension.
+    number_of_channels: int, default: 2
+        The number of channels alternating in the acquisition cycle.
+    file_prefix: str, default: "widefield"
+        The prefix of the file names, use f"{file_prefix}*.tif" as file pattern to read them.
+    seed: int, default: 0
+        The seed of the random noise.
+
+    Returns
+    -------
+    file_paths: list of Path
+        The paths to the written stacks.
+    """
+    folder_path = Path(folder_path)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    file_paths = []
+    for file_index in range(num_files):
+        video = _generate_video(frames_per_file, num_rows, num_columns, seed=seed + file_index)
+        # each channel has its own baseline, so that a channel mix-up shows in the data
+        video += (np.arange(frames_per_file) % number_of_channels * 100).astype(video.dtype)[:, None, None]
+        file_path = folder_path / f"{file_prefix}_{file_index}.tif"
+        tifffile.imwrite(file_path, video, bigtiff=video.nbytes > 2**31)
+        file_paths.append(file_path)
+    return file_paths
+
+
+def write_single_frame_tiff_folder(
+    folder_path: FolderPathType,
+    session_id: str,
+    num_frames: int = 300,
+    num_rows: int = 512,
+    num_columns: int = 1024,
+    session_start_time: Optional[datetime] = None,
+    seed: int = 0,
+) -> List[Path]:
+    """Write a folder of single-frame TIFF files, with the channels alternating file by file.
+
+    This is the layout read by MesoscopicImagingMultiTiffSingleFrameExtractor (Lohani 2022): each file holds a
+    (rows, columns) frame whose left and right halves are two optical channels. The first file has the acquisition
+    date in its ImageDescription tag, as read by `read_session_start_time`.
+
+    Parameters
+    ----------
+    folder_path: str or Path
+        The folder where the frames are written, as "{session_id}_{index:06d}.tif".
+    session_id: str
+        The session id, used as file pattern by the converter.
+    num_frames: int, default: 300
+        The number of frames, all channels included.
+    num_rows, num_columns: int, default: 512, 1024
+        The frame dimension, the extractor splits the frame in halves at column 512.
+    session_start_time: datetime, optional
+        The acquisition date written in the description of the first frame, defaults to now.
+    seed: int, default: 0
+        The seed of the random noise.
+
+    Returns
+    -------
+    file_paths: list of Path
+        The paths to the written frames.
+    """
+    folder_path = Path(folder_path)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    session_start_time = session_start_time or datetime.now()
+    description = "\r\n".join(
+        ["Synthetic mesoscope frame", session_start_time.strftime("%a, %d %b %Y %H:%M:%S") + " Eastern Standard Time"]
+    )
+
+    file_paths = []
+    for start_frame in range(0, num_frames, 100):
+        frames = _generate_video(min(100, num_frames - start_frame), num_rows, num_columns, seed=seed + start_frame)
+        for frame_index, frame in enumerate(frames, start=start_frame):
+            file_path = folder_path / f"{session_id}_{frame_index:06d}.tif"
+            tifffile.imwrite(file_path, frame, description=description)
+            file_paths.append(file_path)
+    return file_paths
+
+
+def write_processed_imaging_mat(
+    file_path: FilePathType,
+    num_frames: int = 500,
+    num_rows: int = 256,
+    num_columns: int = 256,
+    configuration: Literal["1p", "dual"] = "1p",
+    process_types: Sequence[str] = ("blue", "uv", "green"),
+    mat_version: Literal["5", "7.3"] = "7.3",
+    seed: int = 0,
+) -> Path:
+    """Write a dF/F pixel matrix MAT file, as read by ProcessedImagingExtractor.
+
+    In the "1p" configuration (Lohani 2022 final_dFoF.mat) the full (frames, rows * columns) matrices are stored in
+    the "dFoF" struct, with NaNs outside of the brain mask, along with the frame dimension "R" and "C".
+    In the "dual" configuration (Benisty 2024 FIR_dff_*.mat) each variable holds the (frames, masked pixels) matrix
+    of the pixels inside the brain "mask".
+
+    Parameters
+    ----------
+    file_path: str or Path
+        The path to the .mat file to write.
+    num_frames: int, default: 500
+        The number of frames.
+    num_rows, num_columns: int, default: 256
+        The frame dimension.
+    configuration: "1p" or "dual", default: "1p"
+        The layout of the file.
+    process_types: list of str, default: ("blue", "uv", "green")
+        The processed series to write, e.g. ("dff_blue", "dff_uv", "dff_final") in the "dual" configuration.
+    mat_version: "5" or "7.3", default: "7.3"
+        The version of the MAT file.
+    seed: int, default: 0
+        The seed of the random noise.
+
+    Returns
+    -------
+    file_path: Path
+        The path to the written file.
+    """
+    mask = _generate_brain_mask(num_rows, num_columns)
+    pixel_matrices = dict()
+    for process_index, process_type in enumerate(process_types):
+        video = _generate_video(num_frames, num_rows, num_columns, dtype="float64", seed=seed + process_index) - 1
+        if configuration == "dual":
+            pixel_matrices[process_type] = video[:, mask]
+        else:
+            video[:, ~mask] = np.nan
+            pixel_matrices[process_type] = video.reshape(num_frames, -1)
+
+    if configuration == "dual":
+        variables = dict(pixel_matrices, mask=mask.astype("float64"))
+    else:
+        variables = dict(dFoF=pixel_matrices, R=float(num_rows), C=float(num_columns))
+    return write_mat_file(file_path=file_path, variables=variables, mat_version=mat_version)
+
+
+def _generate_parcels(num_rows: int, num_columns: int, num_rois: int) -> np.ndarray:
+    """Return a (rows, columns) label image with the brain mask split in about `num_rois` parcels, 0 outside."""
+    grid_size = int(np.ceil(np.sqrt(num_rois)))
+    row_labels = np.arange(num_rows) * grid_size // num_rows
+    column_labels = np.arange(num_columns) * grid_size // num_columns
+    labels = row_labels[:, None] * grid_size + column_labels[None, :] + 1
+    labels[~_generate_brain_mask(num_rows, num_columns)] = 0
+    return labels
+
+
+def write_parcellation_mat(
+    file_path: FilePathType,
+    num_frames: int = 500,
+    num_rois: int = 50,
+    image_size: Sequence[int] = (256, 256),
+    mat_version: Literal["5", "7.3"] = "5",
+    seed: int = 0,
+) -> Path:
+    """Write a LSSC parcellation MAT file, as read by ParcellsSegmentationExtractor.
+
+    The file holds "parcels_gal", a struct whose "ROI_list" struct array has the 1-based linear "pixel_list" of each
+    parcel, and "parcels_time_trace", the (rois x frames) MATLAB matrix of the parcel traces.
+
+    Parameters
+    ----------
+    file_path: str or Path
+        The path to the .mat file to write.
+    num_frames: int, default: 500
+        The number of frames of the traces.
+    num_rois: int, default: 50
+        The number of parcels.
+    image_size: list, default: (256, 256)
+        The frame dimension.
+    mat_version: "5" or "7.3", default: "5"
+        The version of the MAT file.
+    seed: int, default: 0
+        The seed of the random traces.
+
+    Returns
+    -------
+    file_path: Path
+        The path to the written file.
+    """
+    num_rows, num_columns = image_size
+    labels = _generate_parcels(num_rows=num_rows, num_columns=num_columns, num_rois=num_rois)
+    # the 1-based linear indices of the pixels, as decoded by `_get_pixel_coordinates` of the extractor
+    rows, columns = np.indices((num_rows, num_columns))
+    linear_indices = (num_columns - columns) * num_columns + (num_rows - rows) + 1
+    # pixels whose flipped row index doesn't fit in a column of the index grid can't be encoded
+    labels[num_rows - rows >= num_columns] = 0
+    roi_list = [
+        dict(pixel_list=linear_indices[labels == label].astype("float64"))
+        for label in np.unique(labels[labels > 0])[:num_rois]
+    ]
+    rng = np.random.default_rng(seed)
+    parcels_time_trace = rng.normal(size=(num_frames, len(roi_list))).cumsum(axis=0) * 0.01
+    variables = dict(parcels_gal=dict(ROI_list=roi_list), parcels_time_trace=parcels_time_trace)
+    return write_mat_file(file_path=file_path, variables=variables, mat_version=mat_version)
+
+
+def write_cidan_output(
+    folder_path: FolderPathType,
+    num_frames: int = 500,
+    num_rois: int = 50,
+    image_size: Sequence[int] = (256, 256),
+    roi_radius: int = 5,
+    mat_version: Literal["5", "7.3"] = "5",
+    seed: int = 0,
+) -> Dict[str, Path]:
+    """Write the output of a CIDAN segmentation, as read by CidanSegmentationExtractor.
+
+    Parameters
+    ----------
+    folder_path: str or Path
+        The folder where "parameters.json", "roi_list.json" and "timetraces.mat" are written.
+    num_frames: int, default: 500
+        The number of frames of the traces.
+    num_rois: int, default: 50
+        The number of ROIs.
+    image_size: list, default: (256, 256)
+        The frame dimension.
+    roi_radius: int, default: 5
+        The radius of the disk shaped ROIs, in pixels.
+    mat_version: "5" or "7.3", default: "5"
+        The version of the MAT file.
+    seed: int, default: 0
+        The seed of the random ROI centers and traces.
+
+    Returns
+    -------
+    file_paths: dict
+        The "parameters_file_path", "roi_list_file_path" and "mat_file_path" to pass to CidanSegmentationInterface.
+    """
+    folder_path = Path(folder_path)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    num_rows, num_columns = image_size
+
+    offsets = np.array(
+        [
+            (row, column)
+            for row in range(-roi_radius, roi_radius + 1)
+            for column in range(-roi_radius, roi_radius + 1)
+            if row**2 + column**2 <= roi_radius**2
+        ]
+    )
+    centers = rng.integers(roi_radius, (num_rows - roi_radius, num_columns - roi_radius), size=(num_rois, 2))
+    roi_list = [dict(id=roi_index, coordinates=(center + offsets).tolist()) for roi_index, center in enumerate(centers)]
+    parameters = dict(
+        dataset_params=dict(dataset_folder_path=str(folder_path), trials_loaded=["synthetic.tif"]),
+        global_params=dict(num_threads=1, save_intermediate_steps=False),
+        filter_params=dict(median_filter=True, median_filter_size=3, z_score=False),
+        box_params=dict(total_num_spatial_boxes=4, spatial_overlap=60, total_num_time_steps=1),
+        roi_extraction_params=dict(eigen_threshold_value=0.9, num_eigen_vector_select=10, roi_circularity_filter=0),
+    )
+
+    file_paths = dict(
+        parameters_file_path=folder_path / "parameters.json",
+        roi_list_file_path=folder_path / "roi_list.json",
+        mat_file_path=folder_path / "timetraces.mat",
+    )
+    with open(file_paths["parameters_file_path"], "w") as file:
+        json.dump(parameters, file, indent=2)
+    with open(file_paths["roi_list_file_path"], "w") as file:
+        json.dump(roi_list, file)
+    deltafoverf = rng.normal(size=(num_frames, num_rois)).cumsum(axis=0) * 0.01
+    write_mat_file(
+        file_path=file_paths["mat_file_path"], variables=dict(deltafoverf=deltafoverf), mat_version=mat_version
+    )
+    return file_paths
+
+
+def write_facemap_proc_mat(
+    file_path: FilePathType,
+    num_frames: int = 1000,
+    num_components: int = 50,
+    face_size: Tuple[int, int] = (80, 120),
+    roi_sizes: Sequence[Tuple[int, int]] = ((30, 40),),
+    downsampling_factor: int = 4,
+    seed: int = 0,
+) -> Path:
+    """Write a Facemap _proc.mat file (MATLAB implementation, v7.3), as read by FacemapInterface.
+
+    The "proc" struct holds the pupil center of mass and areas, the face ROI and the motion ROIs ("locROI"), and for
+    the face and each ROI the motion masks ("uMotMask") and the motion SVD components ("motSVD").
+
+    Parameters
+    ----------
+    file_path: str or Path
+        The path to the .mat file to write.
+    num_frames: int, default: 1000
+        The number of video frames.
+    num_components: int, default: 50
+        The number of SVD components of each ROI.
+    face_size: tuple, default: (80, 120)
+        The (height, width) of the face ROI, in processed (downsampled) pixels.
+    roi_sizes: list of tuple, default: ((30, 40),)
+        The (height, width) of each motion ROI after the face, e.g. the whiskers.
+    downsampling_factor: int, default: 4
+        The spatial downsampling of the processed frame.
+    seed: int, default: 0
+        The seed of the random data.
+
+    Returns
+    -------
+    file_path: Path
+        The path to the written file.
+    """
+    rng = np.random.default_rng(seed)
+    face_height, face_width = face_size
+    processed_frame = rng.random((face_height * 2, face_width * 2))
+
+    def get_motion_svd() -> np.ndarray:
+        return rng.normal(size=(num_components, num_frames)).cumsum(axis=1)
+
+    face_location = np.array([1.0, 1.0, face_height, face_width])
+    roi_locations = [np.array([1.0, 1.0, height, width]) for height, width in roi_sizes]
+    pupil = dict(
+        com=rng.normal(size=(2, num_frames)).cumsum(axis=1),
+        area=np.abs(rng.normal(size=(1, num_frames)).cumsum(axis=1)),
+        area_raw=np.abs(rng.normal(size=(1, num_frames)).cumsum(axis=1)),
+    )
+    proc = dict(
+        nframes=np.uint32(num_frames),
+        sc=float(downsampling_factor),
+        wpix=[processed_frame],
+        pupil=pupil,
+        ROI=[[face_location]],
+        locROI=[face_location] + roi_locations,
+        uMotMask=[rng.normal(size=(num_components, face_height * face_width))]
+        + [rng.normal(size=(num_components, height, width)) for height, width in roi_sizes],
+        motSVD=[get_motion_svd() for _ in range(1 + len(roi_sizes))],
+    )
+    return write_mat_file(file_path=file_path, variables=dict(proc=proc), mat_version="7.3")
+
+
+def generate_ttl_trace(
+    duration: float = 60.0,
+    sampling_frequency: float = 5000.0,
+    pulse_rate: float = 10.0,
+    pulse_duration: float = 0.01,
+    start_time: float = 1.0,
+    amplitude: float = 5.0,
+    noise: float = 0.05,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Generate a Spike2-like analog TTL trace with regular pulses, e.g. the LED or camera triggers.
+
+    Parameters
+    ----------
+    duration: float, default: 60.0
+        The duration of the trace, in seconds.
+    sampling_frequency: float, default: 5000.0
+        The sampling frequency of the trace, in Hz.
+    pulse_rate: float, default: 10.0
+        The number of pulses per second.
+    pulse_duration: float, default: 0.01
+        The duration of each pulse, in seconds.
+    start_time: float, default: 1.0
+        The time of the first pulse, in seconds.
+    amplitude: float, default: 5.0
+        The amplitude of the pulses, in Volts.
+    noise: float, default: 0.05
+        The standard deviation of the additive noise, in Volts.
+    seed: int, default: 0
+        The seed of the noise.
+
+    Returns
+    -------
+    times: np.ndarray
+        The time of each sample, in seconds.
+    trace: np.ndarray
+        The float32 voltage trace.
+    """
+    rng = np.random.default_rng(seed)
+    times = np.arange(int(duration * sampling_frequency)) / sampling_frequency
+    time_since_start = times - start_time
+    is_high = (time_since_start >= 0) & (np.mod(time_since_start, 1 / pulse_rate) < pulse_duration)
+    trace = is_high * amplitude + rng.normal(scale=noise, size=len(times))
+    return times, trace.astype("float32")
+
+
+def write_smrx_signals_mat(
+    file_path: FilePathType,
+    duration: float = 60.0,
+    sampling_frequency: float = 5000.0,
+    event_names: Sequence[str] = ("wheel", "stim", "airpuff"),
+    mat_version: Literal["5", "7.3"] = "7.3",
+    seed: int = 0,
+) -> Path:
+    """Write a smrx_signals.mat file, as read by `get_channel_trace_from_mat` and `get_event_times_from_mat`.
+
+    The file holds the Spike2 sampling frequency in "params", the wheel speed trace in "channels_data" and, for each
+    event, the onset and offset times in "timing" (e.g. "wheelOn"/"wheelOff", "stimstart"/"stimend").
+
+    Parameters
+    ----------
+    file_path: str or Path
+        The path to the .mat file to write.
+    duration: float, default: 60.0
+        The duration of the recording, in seconds.
+    sampling_frequency: float, default: 5000.0
+        The sampling frequency of the Spike2 signals, in Hz.
+    event_names: list of str, default: ("wheel", "stim", "airpuff")
+        The events whose times are written.
+    mat_version: "5" or "7.3", default: "7.3"
+        The version of the MAT file.
+    seed: int, default: 0
+        The seed of the random data.
+
+    Returns
+    -------
+    file_path: Path
+        The path to the written file.
+    """
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration * sampling_frequency)
+    wheel_speed = np.abs(rng.normal(size=num_samples).cumsum()) * 1e-3
+    event_time_names = dict(
+        wheel=("wheelOn", "wheelOff"), stim=("stimstart", "stimend"), airpuff=("airpuffstart", "airpuffend")
+    )
+    timing = dict()
+    for event_name in event_names:
+        start_times = np.sort(rng.uniform(0, duration - 2, size=max(2, int(duration / 10))))
+        start_name, end_name = event_time_names[event_name]
+        timing[start_name] = start_times
+        timing[end_name] = start_times + rng.uniform(0.2, 1.5, size=len(start_times))
+
+    variables = dict(
+        params=dict(fsspike2=float(sampling_frequency)),
+        channels_data=dict(wheelspeed=wheel_speed),
+        timing=timing,
+    )
+    return write_mat_file(file_path=file_path, variables=variables, mat_version=mat_version)